@@ -1,28 +1,106 @@
+import asyncio
 import logging
+from typing import Any
 
-from telegram.ext import ApplicationBuilder, CallbackQueryHandler, CommandHandler
+from telegram.ext import (
+    Application,
+    ApplicationBuilder,
+    CallbackQueryHandler,
+    CommandHandler,
+    InlineQueryHandler,
+    MessageHandler,
+)
 
 from bot.enums import Command
 from bot.handlers import button_handler
+from bot.handlers.bulk import BULK_DOCUMENT_FILTER, handle_bulk_tracking
 from bot.handlers.error import handle_error
+from bot.handlers.inline import handle_inline_query
 from bot.handlers.start import handle_start
 from bot.handlers.tracking import tracking_conversation_handler
+from bot.handlers.watch import (
+    handle_unwatch,
+    handle_watch,
+    handle_watchlist,
+    poll_watched_parcels,
+)
+from bot.utils.persistence import BotPersistence, SQLiteStateStore
+from bot.utils.ratelimit import ChatRateLimiter
 
 from .config import settings
+from .services import (
+    compact_history,
+    flush_error_reports,
+    start_services,
+    stop_services,
+)
 
 logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-def main() -> None:
-    application = ApplicationBuilder().token(settings.telegram_token).connect_timeout(15).build()
+def build_application() -> Application[Any, Any, Any, Any, Any, Any]:
+    builder = (
+        ApplicationBuilder()
+        .token(settings.telegram_token)
+        .base_url(settings.telegram_base_url)
+        .connect_timeout(15)
+        .concurrent_updates(settings.concurrent_updates)
+        .post_init(start_services)
+        .post_stop(flush_error_reports)
+        .post_shutdown(stop_services)
+        .persistence(BotPersistence(SQLiteStateStore(settings.database_path), update_interval=settings.persistence_interval))
+        .rate_limiter(
+            ChatRateLimiter(
+                overall_max_rate=settings.rate_limit_overall,
+                chat_max_rate=settings.rate_limit_chat,
+                group_max_rate=settings.rate_limit_group,
+                max_retries=settings.rate_limit_max_retries,
+            )
+        )
+    )
+    if settings.update_queue_size > 0:
+        builder = builder.update_queue(asyncio.Queue(maxsize=settings.update_queue_size))
+    application = builder.build()
 
     application.add_handler(tracking_conversation_handler)
     application.add_handler(CommandHandler(Command.START, handle_start))
+    application.add_handler(CommandHandler(Command.WATCH, handle_watch))
+    application.add_handler(CommandHandler(Command.UNWATCH, handle_unwatch))
+    application.add_handler(CommandHandler(Command.WATCHLIST, handle_watchlist))
     application.add_handler(CallbackQueryHandler(button_handler))
+    # The handlers waiting for the debounce delay or in the tracking queue don't block, so that they don't hold one of
+    # the `CONCURRENT_UPDATES` updates processed at once and the other updates are processed meanwhile
+    application.add_handler(InlineQueryHandler(handle_inline_query, block=False))
+    application.add_handler(MessageHandler(BULK_DOCUMENT_FILTER, handle_bulk_tracking, block=False))
     application.add_error_handler(handle_error)
 
-    application.run_polling()
+    if application.job_queue:
+        application.job_queue.run_repeating(
+            poll_watched_parcels, interval=settings.watch_poll_interval, first=settings.watch_poll_interval, name="watch"
+        )
+        application.job_queue.run_repeating(
+            compact_history, interval=settings.history_compaction_interval, first=60, name="history"
+        )
+
+    return application
+
+
+def main() -> None:
+    application = build_application()
+
+    # Both modes stop on SIGINT/SIGTERM and wait for the updates being processed (and their scrapes) to finish
+    if settings.webhook_url:
+        application.run_webhook(
+            listen=settings.webhook_listen,
+            port=settings.webhook_port,
+            url_path=settings.webhook_path,
+            webhook_url=settings.webhook_url,
+            secret_token=settings.webhook_secret_token,
+            max_connections=settings.webhook_max_connections,
+        )
+    else:
+        application.run_polling()
 
 
 if __name__ == "__main__":
@@ -1,21 +1,251 @@
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic_settings import BaseSettings
 
+from bot.utils.resources import SCREENSHOT_RESOURCE_TYPES, TEXT_RESOURCE_TYPES
+
 
 class Settings(BaseSettings):
     telegram_token: str
     """Telegram bot token."""
 
+    telegram_base_url: str = "https://api.telegram.org/bot"
+    """Base URL of the Bot API requests, followed by the bot token, e.g. of a local Bot API server."""
+
     tracking_timeout: int | float = 15
     """Tracking timeout, in seconds."""
 
+    tracking_min_timeout: float = 5
+    """Lower bound of the adaptive tracking timeout, in seconds. `tracking_timeout` is the upper bound."""
+
+    tracking_timeout_factor: float = 2
+    """Multiple of the 95th percentile latency of the tracking website used as tracking timeout."""
+
+    breaker_window: float = 60
+    """Length of the rolling window of tracking outcomes the circuit breaker considers, in seconds."""
+
+    breaker_min_calls: int = 10
+    """Minimum number of tracking requests in the window before the circuit breaker can open."""
+
+    breaker_failure_rate: float = 0.5
+    """Rate of failed tracking requests in the window above which the circuit breaker opens."""
+
+    breaker_open_duration: float = 30
+    """Time the circuit breaker stays open before letting a trial request through, in seconds."""
+
+    tracking_base_url: str = "https://tracking.post.ir/"
+    """URL of the Iran Post tracking website."""
+
+    max_concurrent_trackings: int = 2
+    """Maximum number of tracking requests processed at once."""
+
+    tracking_queue_size: int = 50
+    """Maximum number of tracking requests waiting in the queue."""
+
+    max_concurrent_trackings_per_user: int = 1
+    """Maximum number of tracking requests of a single user processed at once."""
+
+    max_pending_trackings_per_user: int = 2
+    """Maximum number of tracking requests of a single user processed or waiting in the queue."""
+
+    cache_ttl: float = 60
+    """Time to live of cached tracking results, in seconds. Set to 0 to disable caching."""
+
+    cache_screenshot_ttl: float = 30
+    """Time to live of cached screenshots, in seconds. Screenshots are large, so they are kept for less time."""
+
+    cache_text_screenshots: bool = False
+    """Whether text lookups made with the browser also cache a screenshot for the image lookups. Slows down text lookups."""
+
+    cache_negative_ttl: float = 10
+    """Time to live of cached tracking errors (e.g. parcel not found), in seconds."""
+
+    cache_max_mb: float = 64
+    """Maximum total size of cached tracking results, in megabytes."""
+
+    database_path: str = "rahgiri.db"
+    """Path to the SQLite database file."""
+
+    persistence_interval: float = 10
+    """Time between two writes of the changed user data and conversation states to the database, in seconds."""
+
+    file_id_cache_size: int = 10000
+    """Maximum number of Telegram file IDs of uploaded screenshots kept for reuse."""
+
+    history_retention: float = 90 * 24 * 60 * 60
+    """Time the tracking history of a parcel is kept after the parcel was last tracked, in seconds."""
+
+    history_max_parcels: int = 100000
+    """Maximum number of parcels whose tracking history is kept. The least recently tracked unwatched ones are removed first."""
+
+    history_compaction_interval: float = 6 * 60 * 60
+    """Interval between runs of the removal of the expired tracking histories, in seconds."""
+
+    watch_poll_interval: float = 60
+    """Interval between runs of the watched parcels poller, in seconds."""
+
+    watch_batch_size: int = 200
+    """Maximum number of watched parcels checked in a single run of the poller."""
+
+    watch_concurrency: int = 4
+    """Maximum number of watched parcels checked at once, within the `max_concurrent_trackings` of the tracking queue."""
+
+    watch_min_interval: float = 15 * 60
+    """Interval between checks of a watched parcel whose status has just changed, in seconds."""
+
+    watch_max_interval: float = 6 * 60 * 60
+    """Maximum interval between checks of a watched parcel whose status doesn't change, in seconds."""
+
+    watch_delivered_interval: float = 24 * 60 * 60
+    """Interval between checks of a delivered watched parcel, in seconds."""
+
+    watch_backoff_factor: float = 1.5
+    """Factor the check interval of a watched parcel grows by every time its status doesn't change."""
+
+    watch_jitter: float = 0.1
+    """Random fraction added to or subtracted from check intervals to spread the checks over time."""
+
+    watch_max_per_chat: int = 20
+    """Maximum number of parcels a chat can watch."""
+
+    inline_cache_time: float = 60
+    """Time Telegram may cache the answers to inline queries with tracking results for, in seconds."""
+
+    inline_debounce: float = 0.5
+    """Time an inline query without a cached result waits for a newer query of the same user, in seconds."""
+
+    inline_wait: float = 3
+    """Maximum time an inline query waits for the scrape it started before a placeholder is answered, in seconds."""
+
+    bulk_max_numbers: int = 100
+    """Maximum number of tracking numbers tracked from a single message or file."""
+
+    bulk_concurrency: int = 2
+    """Maximum number of parcels of a bulk request tracked at once, within the `max_concurrent_trackings` of the queue."""
+
+    bulk_digest_max_parcels: int = 20
+    """Maximum number of parcels in a bulk tracking digest message, above which the digest is sent as a CSV file."""
+
     proxy_url: Optional[str] = None
     """Proxy URL to use for opening the tracking website."""
 
+    proxy_urls: list[str] = []
+    """Proxy URLs to spread the requests to the tracking website over, used instead of `proxy_url` if set."""
+
+    proxy_max_failures: int = 3
+    """Number of consecutive failed requests after which a proxy is temporarily ejected."""
+
+    proxy_ejection_duration: float = 60
+    """Time a failing proxy is ejected for, in seconds, doubled every time it keeps failing."""
+
+    http_backend: bool = True
+    """Fetch text results over plain HTTP, using the browser only for images or as a fallback."""
+
+    http_max_connections: int = 20
+    """Maximum number of concurrent connections of the HTTP tracking backend."""
+
+    browser_pool_size: int = 2
+    """Number of warm browsers kept open for tracking requests. Set to 0 to launch a browser per request."""
+
+    browser_max_uses: Optional[int] = 100
+    """Number of tracking requests after which a pooled browser is relaunched."""
+
+    browser_max_memory_mb: Optional[float] = None
+    """Memory ceiling of a pooled browser, in megabytes, above which it is relaunched."""
+
+    block_resources: bool = True
+    """Whether to abort the requests of the tracking website that aren't needed for a lookup."""
+
+    text_resource_types: list[str] = sorted(TEXT_RESOURCE_TYPES)
+    """Resource types the tracking website may load when fetching text results."""
+
+    screenshot_resource_types: list[str] = sorted(SCREENSHOT_RESOURCE_TYPES)
+    """Resource types the tracking website may load when taking a screenshot."""
+
+    screenshot_allowed_hosts: list[str] = []
+    """Third-party hosts the tracking website may load resources from when taking a screenshot."""
+
+    screenshot_width: int = 1280
+    """Viewport width of the tracking website when taking a screenshot, in CSS pixels."""
+
+    screenshot_scale: float = 1
+    """Device scale factor of the browsers, i.e. the number of screenshot pixels per CSS pixel."""
+
+    screenshot_format: Literal["jpeg", "webp", "png"] = "jpeg"
+    """Image format of the screenshots. PNG screenshots are palette-quantized."""
+
+    screenshot_quality: int = 80
+    """Quality of JPEG and WebP screenshots, from 1 to 100."""
+
+    screenshot_colors: int = 256
+    """Palette size of PNG screenshots, from 2 to 256."""
+
+    screenshot_max_kb: Optional[int] = 500
+    """Size budget of a screenshot, in kilobytes. Larger screenshots are downscaled until they fit."""
+
+    tracking_workers: int = 0
+    """Number of worker processes running the tracking jobs. If 0, tracking jobs run in the bot process."""
+
+    worker_max_jobs: Optional[int] = 1000
+    """Number of tracking jobs after which a worker process is replaced."""
+
+    worker_max_memory_mb: Optional[float] = None
+    """Memory ceiling of a worker process, in megabytes, above which it is replaced."""
+
+    concurrent_updates: int = 16
+    """Maximum number of updates processed concurrently."""
+
+    update_queue_size: int = 0
+    """Maximum number of received updates waiting to be processed. Set to 0 for no limit."""
+
+    rate_limit_overall: float = 30
+    """Maximum number of messages sent per second to all chats. Set to 0 for no global limit."""
+
+    rate_limit_chat: float = 5
+    """Maximum number of messages sent to a private chat in 5 seconds. Set to 0 for no limit per chat."""
+
+    rate_limit_group: float = 20
+    """Maximum number of messages sent per minute to a group or a channel. Set to 0 for no limit per group."""
+
+    rate_limit_max_retries: int = 3
+    """Maximum number of retries of a request Telegram asks to retry later because of flood limits."""
+
+    webhook_url: Optional[str] = None
+    """Public URL Telegram sends updates to. If set, updates are received by a webhook server instead of polling."""
+
+    webhook_listen: str = "0.0.0.0"
+    """Address the webhook server listens on."""
+
+    webhook_port: int = 8443
+    """Port the webhook server listens on."""
+
+    webhook_path: str = ""
+    """URL path the webhook server receives updates on."""
+
+    webhook_secret_token: Optional[str] = None
+    """Secret token sent by Telegram with every webhook request. Requests without it are rejected."""
+
+    webhook_max_connections: int = 40
+    """Maximum number of simultaneous connections Telegram opens to the webhook server."""
+
+    metrics_port: Optional[int] = None
+    """Port of the HTTP endpoint exposing Prometheus metrics. If None, the metrics aren't exposed."""
+
+    metrics_address: str = "127.0.0.1"
+    """Address the metrics endpoint listens on."""
+
+    slow_request_threshold: Optional[float] = None
+    """Duration of a tracking request, in seconds, above which it's logged with its stage timings."""
+
     developer_chat_id: Optional[str] = None
     """Developer chat ID for error notifications."""
 
+    error_summary_interval: float = 300
+    """Time between two summaries of repeated errors sent to the developer, in seconds."""
+
+    error_queue_size: int = 100
+    """Maximum number of errors waiting to be reported to the developer, above which they are only counted."""
+
     class Config:
         env_file = ".env"
         frozen = True
@@ -6,4 +6,8 @@ class Command(str, Enum):
     TRACK = "track"
     TRACK_OUTPUT_TEXT = "text"
     TRACK_OUTPUT_IMAGE = "image"
+    TRACK_OUTPUT_BOTH = "both"
     HELP = "help"
+    WATCH = "watch"
+    UNWATCH = "unwatch"
+    WATCHLIST = "watchlist"
@@ -0,0 +1,152 @@
+import asyncio
+import csv
+import io
+import logging
+import time
+from contextlib import suppress
+from functools import partial
+from typing import NamedTuple, Optional
+
+from telegram import Message, Update
+from telegram.constants import MessageLimit, ParseMode
+from telegram.error import TelegramError
+from telegram.ext import ContextTypes, filters
+from telegram.helpers import escape_markdown
+
+from bot.config import settings
+from bot.models import TrackingRecord
+from bot.services import create_tracker, tracking_cache, tracking_scheduler
+from bot.utils.exceptions import QueueFullError, TrackingError
+from bot.utils.text import error_msg, warning_msg
+from bot.utils.tracking import extract_tracking_numbers
+
+__all__ = ("BULK_DOCUMENT_FILTER", "handle_bulk_tracking")
+
+logger = logging.getLogger(__name__)
+
+BULK_DOCUMENT_FILTER = filters.Document.FileExtension("txt") | filters.Document.FileExtension("csv")
+MAX_DOCUMENT_SIZE = 1024 * 1024
+PROGRESS_EDIT_INTERVAL = 2
+
+
+class _BulkResult(NamedTuple):
+    tracking_number: str
+    record: Optional[TrackingRecord] = None
+    error: Optional[str] = None
+
+
+async def _read_message_text(message: Message) -> Optional[str]:
+    if not message.document:
+        return message.text
+    if message.document.file_size and message.document.file_size > MAX_DOCUMENT_SIZE:
+        return None
+    file = await message.document.get_file()
+    return (await file.download_as_bytearray()).decode("utf-8-sig", errors="ignore")
+
+
+async def _track(tracking_number: str, user_id: int) -> _BulkResult:
+    tracker = create_tracker()
+    job = partial(tracker.track_as_text, tracking_number, timeout=settings.tracking_timeout)
+    try:
+        # The lookups run `BULK_CONCURRENCY` at a time, and wait for the other requests of the user instead of being
+        # turned down
+        queue = partial(tracking_scheduler.run, user_id, wait=True, limit=settings.bulk_concurrency)
+        records = await tracking_cache.get_or_track(tracking_number, "text", job, queue=queue)
+    except TrackingError as e:
+        return _BulkResult(tracking_number, error=str(e))
+    except QueueFullError:
+        return _BulkResult(tracking_number, error="صف رهگیری پر است")
+    except Exception as e:
+        logger.warning(f"Failed to track parcel {tracking_number} of a bulk request: {e!r}")
+        return _BulkResult(tracking_number, error="خطا در رهگیری")
+    if not isinstance(records, list) or not records:
+        return _BulkResult(tracking_number, error="نتیجه ای یافت نشد")
+    return _BulkResult(tracking_number, record=max(records, key=lambda record: record.id))
+
+
+def _format_digest_line(result: _BulkResult) -> str:
+    # The tracking details come from the tracking website, so they're escaped
+    if result.record is None:
+        return f"❌ `{result.tracking_number}`\n{escape_markdown(result.error or '')}"
+    record = result.record
+    location = f" ({record.location})" if record.location else ""
+    date = f"{record.date} - " if record.date else ""
+    details = escape_markdown(f"{record.description}{location}\n{date}{record.time}")
+    return f"✅ `{result.tracking_number}`\n{details}"
+
+
+def _digest_csv(results: list[_BulkResult]) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["tracking_number", "description", "location", "date", "time", "error"])
+    for result in results:
+        record = result.record
+        writer.writerow(
+            [
+                result.tracking_number,
+                record.description if record else "",
+                record.location or "" if record else "",
+                record.date or "" if record else "",
+                record.time if record else "",
+                result.error or "",
+            ]
+        )
+    # Excel needs the BOM to open UTF-8 (Persian) content correctly
+    return buffer.getvalue().encode("utf-8-sig")
+
+
+async def handle_bulk_tracking(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Handler for tracking all the tracking numbers in a message or an uploaded .txt/.csv file at once.
+    The latest status of every parcel is sent back in a single digest message, or as a CSV file if it is too long.
+    """
+    message = update.message
+    if not message or not update.effective_chat:
+        return
+
+    text = await _read_message_text(message)
+    if text is None:
+        await message.reply_text(error_msg("حجم فایل ارسال شده بیش از حد مجاز است."))
+        return
+
+    tracking_numbers = extract_tracking_numbers(text)
+    if not tracking_numbers:
+        await message.reply_text(error_msg("شماره رهگیری معتبری یافت نشد."))
+        return
+    if len(tracking_numbers) > settings.bulk_max_numbers:
+        await message.reply_text(warning_msg(f"حداکثر {settings.bulk_max_numbers} شماره رهگیری به صورت همزمان قابل رهگیری است."))
+        return
+
+    total = len(tracking_numbers)
+    status_text = f"🔄 در حال رهگیری *{total}* مرسوله..."
+    status_message = await message.reply_text(status_text, parse_mode=ParseMode.MARKDOWN)
+    user_id = update.effective_user.id if update.effective_user else update.effective_chat.id
+
+    semaphore = asyncio.Semaphore(max(1, settings.bulk_concurrency))
+    done = 0
+    last_progress_edit = time.monotonic()
+
+    async def track(tracking_number: str) -> _BulkResult:
+        nonlocal done, last_progress_edit
+        async with semaphore:
+            result = await _track(tracking_number, user_id)
+        done += 1
+        if done < total and time.monotonic() - last_progress_edit >= PROGRESS_EDIT_INTERVAL:
+            last_progress_edit = time.monotonic()
+            with suppress(TelegramError):
+                await status_message.edit_text(f"{status_text}\n\n⏳ *{done}* از *{total}*", parse_mode=ParseMode.MARKDOWN)
+        return result
+
+    results = await asyncio.gather(*(track(tracking_number) for tracking_number in tracking_numbers))
+
+    succeeded = sum(result.record is not None for result in results)
+    summary = f"📦 نتیجه رهگیری *{total}* مرسوله ({succeeded} موفق، {total - succeeded} ناموفق)"
+    digest = "\n\n".join([summary] + [_format_digest_line(result) for result in results])
+    if total <= settings.bulk_digest_max_parcels and len(digest) <= MessageLimit.MAX_TEXT_LENGTH:
+        with suppress(TelegramError):
+            await status_message.delete()
+        await message.reply_text(digest, parse_mode=ParseMode.MARKDOWN)
+    else:
+        with suppress(TelegramError):
+            await status_message.edit_text(summary, parse_mode=ParseMode.MARKDOWN)
+        await message.reply_document(document=_digest_csv(results), filename="tracking.csv")
@@ -1,39 +1,34 @@
 import html
 import json
 import logging
-import traceback
+from typing import Any, Optional
 
 from telegram import Update
-from telegram.constants import ParseMode
 from telegram.ext import ContextTypes
 
-from bot.config import settings
+from bot.services import error_reporter
+
+
+def _format_details(update: object, chat_data: Optional[dict[Any, Any]], user_data: Optional[dict[Any, Any]]) -> str:
+    update_str = update.to_dict() if isinstance(update, Update) else str(update)
+    return (
+        f"<pre>update = {html.escape(json.dumps(update_str, indent=2, ensure_ascii=False))}"
+        "</pre>\n\n"
+        f"<pre>context.chat_data = {html.escape(str(chat_data))}</pre>\n\n"
+        f"<pre>context.user_data = {html.escape(str(user_data))}</pre>\n\n"
+    )
 
 
 async def handle_error(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
     """
-    Log the error and optionally send a telegram message to notify the developer.
+    Log the error and optionally report it to the developer.
     """
     logging.error("Exception while handling an update:", exc_info=context.error)
 
-    if not context.error:
+    if not context.error or error_reporter is None:
         return
 
-    tb_list = traceback.format_exception(None, context.error, context.error.__traceback__)
-    tb_string = "".join(tb_list)
-
-    update_str = update.to_dict() if isinstance(update, Update) else str(update)
-    message = (
-        "خطا: \n\n"
-        f"<pre>update = {html.escape(json.dumps(update_str, indent=2, ensure_ascii=False))}"
-        "</pre>\n\n"
-        f"<pre>context.chat_data = {html.escape(str(context.chat_data))}</pre>\n\n"
-        f"<pre>context.user_data = {html.escape(str(context.user_data))}</pre>\n\n"
-        f"<pre>{html.escape(tb_string)}</pre>"
-    )
-
-    if settings.developer_chat_id:
-        try:
-            await context.bot.send_message(chat_id=settings.developer_chat_id, text=message, parse_mode=ParseMode.HTML)
-        except Exception as e:
-            logging.error(f"Failed to send error message to developer chat: {e}")
+    # The details are formatted in the background, from copies taken now
+    chat_data = dict(context.chat_data) if context.chat_data is not None else None
+    user_data = dict(context.user_data) if context.user_data is not None else None
+    error_reporter.report(context.error, lambda: _format_details(update, chat_data, user_data))
@@ -21,6 +21,9 @@ async def handle_help(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
             "شما می‌توانید با وارد کردن شماره رهگیری مرسوله، وضعیت ارسال آن را پیگیری کنید.\n",
             "- اطلاعات مربوط به جابجایی مرسولات پستی به صورت لحظه ای در سامانه رهگیری پست ثبت می گردد",
             "- اطلاعات مربوط به مرسولات پستی حداکثر 6 ماه در سامانه رهگیری پست نگهداری و قابل رهگیری می باشد\n",
+            "برای رهگیری همزمان چند مرسوله، شماره‌های رهگیری را در یک پیام یا در قالب فایل txt یا csv ارسال کنید.\n",
+            "با دستور /watch و شماره رهگیری، تغییرات وضعیت مرسوله به صورت خودکار به شما اطلاع داده می‌شود.",
+            "فهرست مرسولات در حال پیگیری با /watchlist نمایش داده می‌شود و با /unwatch می‌توانید پیگیری را متوقف کنید.\n",
             "اگر سوالی دارید یا به کمک نیاز دارید، با پشتیبانی تماس بگیرید.",
         ]
     )
@@ -0,0 +1,150 @@
+import asyncio
+import logging
+from functools import partial
+from typing import Any, Sequence
+
+from telegram import (
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    InlineQueryResultArticle,
+    InlineQueryResultsButton,
+    InputTextMessageContent,
+    Update,
+)
+from telegram.constants import ParseMode
+from telegram.error import BadRequest
+from telegram.ext import ContextTypes
+
+from bot.config import settings
+from bot.models import TrackingRecord
+from bot.services import create_tracker, tracking_cache, tracking_scheduler
+from bot.utils.cache import TrackingResult
+from bot.utils.exceptions import QueueFullError, TrackingError
+from bot.utils.text import error_msg
+from bot.utils.tracking import extract_tracking_numbers
+
+from .tracking import format_records
+
+__all__ = ("handle_inline_query",)
+
+logger = logging.getLogger(__name__)
+
+# The ID of the latest inline query of every user, to drop the queries superseded while the user is typing
+_latest_queries: dict[int, str] = {}
+# The scrapes started by inline queries, which outlive the queries that started them
+_background_tasks: set["asyncio.Task[TrackingResult]"] = set()
+
+_HINT_BUTTON = InlineQueryResultsButton(text="شماره رهگیری ۲۴ رقمی مرسوله را وارد کنید", start_parameter="inline")
+
+
+def _records_result(tracking_number: str, records: list[TrackingRecord]) -> InlineQueryResultArticle:
+    text, parse_mode = format_records(tracking_number, records)
+    latest = max(records, key=lambda record: record.id) if records else None
+    return InlineQueryResultArticle(
+        id=tracking_number,
+        title=f"📦 {tracking_number}",
+        description=f"{latest.description}\n{latest.date or ''} {latest.time}".strip() if latest else "نتیجه ای یافت نشد!",
+        input_message_content=InputTextMessageContent(text, parse_mode=parse_mode),
+    )
+
+
+def _error_result(tracking_number: str, message: str) -> InlineQueryResultArticle:
+    return InlineQueryResultArticle(
+        id=tracking_number,
+        title=f"📦 {tracking_number}",
+        description=message,
+        input_message_content=InputTextMessageContent(error_msg(f"{tracking_number}: {message}")),
+    )
+
+
+def _pending_result(tracking_number: str) -> InlineQueryResultArticle:
+    # The button of the sent message queries the bot again, once the result is cached
+    return InlineQueryResultArticle(
+        id=f"{tracking_number}-pending",
+        title="🔄 در حال رهگیری...",
+        description="نتیجه تا لحظاتی دیگر آماده می‌شود. برای مشاهده آن مجددا تلاش کنید.",
+        input_message_content=InputTextMessageContent(
+            f"🔄 در حال رهگیری مرسوله *{tracking_number}*...", parse_mode=ParseMode.MARKDOWN
+        ),
+        reply_markup=InlineKeyboardMarkup(
+            [[InlineKeyboardButton("نمایش نتیجه", switch_inline_query_current_chat=tracking_number)]]
+        ),
+    )
+
+
+def _track_in_background(tracking_number: str, user_id: int) -> "asyncio.Task[TrackingResult]":
+    tracker = create_tracker()
+    job = partial(tracker.track_as_text, tracking_number, timeout=settings.tracking_timeout)
+    task = asyncio.create_task(
+        tracking_cache.get_or_track(tracking_number, "text", job, queue=partial(tracking_scheduler.run, user_id))
+    )
+    _background_tasks.add(task)
+
+    def forget(task: "asyncio.Task[TrackingResult]") -> None:
+        _background_tasks.discard(task)
+        if not task.cancelled() and (exc := task.exception()) and not isinstance(exc, (TrackingError, QueueFullError)):
+            logger.warning(f"Failed to track parcel {tracking_number} for an inline query: {exc!r}")
+
+    task.add_done_callback(forget)
+    return task
+
+
+async def handle_inline_query(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Handler for inline queries, i.e. `@bot <tracking number>` typed in any chat. A cached result is answered right
+    away. Otherwise, the query is answered once the user stops typing: with a hint if it isn't a tracking number, or
+    with the result of a scrape if it's done within `INLINE_WAIT` seconds, and with a placeholder if it isn't or if it
+    couldn't be queued.
+    """
+    query = update.inline_query
+    if not query:
+        return
+
+    user_id = query.from_user.id
+    _latest_queries[user_id] = query.id
+    tracking_numbers = extract_tracking_numbers(query.query)
+    tracking_number = tracking_numbers[0] if len(tracking_numbers) == 1 else None
+
+    async def answer(results: Sequence[InlineQueryResultArticle], cache_time: float, **kwargs: Any) -> None:
+        if _latest_queries.get(user_id) == query.id:
+            del _latest_queries[user_id]
+        try:
+            await query.answer(results, cache_time=int(cache_time), is_personal=False, **kwargs)
+        except BadRequest as e:
+            # The query expired, e.g. while the bot was busy
+            logger.debug(f"Failed to answer inline query {query.id}: {e}")
+
+    if tracking_number is not None:
+        try:
+            result = tracking_cache.get(tracking_number, "text")
+        except TrackingError as e:
+            await answer([_error_result(tracking_number, str(e))], settings.cache_negative_ttl)
+            return
+        if isinstance(result, list):
+            await answer([_records_result(tracking_number, result)], settings.inline_cache_time)
+            return
+
+    await asyncio.sleep(settings.inline_debounce)
+    if _latest_queries.get(user_id) != query.id:
+        # Superseded by a newer query of the user
+        return
+
+    if tracking_number is None:
+        await answer([], settings.inline_cache_time, button=_HINT_BUTTON)
+        return
+
+    task = _track_in_background(tracking_number, user_id)
+    await asyncio.wait([task], timeout=settings.inline_wait)
+    if not task.done():
+        await answer([_pending_result(tracking_number)], 0)
+        return
+    error = asyncio.CancelledError() if task.cancelled() else task.exception()
+    if isinstance(error, QueueFullError):
+        # The queue is full, or the user has too many requests in it, the placeholder lets the user retry later
+        await answer([_pending_result(tracking_number)], 0)
+    elif isinstance(error, TrackingError):
+        await answer([_error_result(tracking_number, str(error))], settings.cache_negative_ttl)
+    elif error is not None:
+        await answer([_error_result(tracking_number, "عملیات با خطا مواجه شد. لطفا دقایقی دیگر مجددا تلاش کنید.")], 0)
+    elif isinstance(records := task.result(), list):
+        await answer([_records_result(tracking_number, records)], settings.inline_cache_time)
@@ -1,8 +1,12 @@
+import asyncio
+import time
+from contextlib import suppress
+from functools import partial
 from typing import Optional
 
-from playwright.async_api import ProxySettings
-from telegram import Message, Update
+from telegram import InlineKeyboardMarkup, Message, Update
 from telegram.constants import ParseMode
+from telegram.error import BadRequest, TelegramError
 from telegram.ext import (
     CallbackQueryHandler,
     ContextTypes,
@@ -16,21 +20,31 @@ from bot.enums import Command
 from bot.keyboards.markups import (
     OUTPUT_TYPE_CALLBACK_MAP,
     keyboard_markup_back,
+    keyboard_markup_start,
     keyboard_markup_tracking_output_type,
 )
-from bot.models import TrackingRecord
-from bot.utils.exceptions import TrackingError
+from bot.models import Screenshot, TrackingRecord, TrackingSnapshot
+from bot.services import (
+    create_tracker,
+    file_id_store,
+    tracking_cache,
+    tracking_scheduler,
+)
+from bot.utils.cache import TrackingResult
+from bot.utils.exceptions import QueueFullError, TrackingError, UserQueueFullError
+from bot.utils.files import content_hash
+from bot.utils.metrics import observe_stage, timed, traced
 from bot.utils.text import (
     error_msg,
     format_tracking_record,
-    normalize_text,
     warning_msg,
 )
-from bot.utils.tracking import ParcelTracker, validate_tracking_number
+from bot.utils.tracking import extract_tracking_numbers, validate_tracking_number
 
+from .bulk import BULK_DOCUMENT_FILTER, handle_bulk_tracking
 from .start import REDIRECT_FROM_TRACKING_KEY, handle_start
 
-__all__ = ("tracking_conversation_handler",)
+__all__ = ("format_records", "tracking_conversation_handler")
 
 
 WAITING_FOR_TRACKING_NUMBER = 0
@@ -50,6 +64,60 @@ async def _remove_keyboard_markup(update: Update, context: ContextTypes.DEFAULT_
         await context.bot.edit_message_reply_markup(chat_id=chat_id, message_id=last_message_id, reply_markup=None)
 
 
+async def _send_photo(
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    photo: bytes,
+    caption: str,
+    reply_markup: Optional[InlineKeyboardMarkup] = None,
+) -> None:
+    # Reuse the file ID of a screenshot of the same tracking state uploaded before instead of uploading it again. The
+    # bytes of two renders of the same state may differ, so screenshots are keyed by the state they show.
+    photo_hash = photo.state_key if isinstance(photo, Screenshot) else content_hash(photo)
+    if file_id := await asyncio.to_thread(file_id_store.get, photo_hash):
+        try:
+            await context.bot.send_photo(
+                chat_id=chat_id, photo=file_id, caption=caption, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup
+            )
+            return
+        except BadRequest:
+            await asyncio.to_thread(file_id_store.delete, photo_hash)
+
+    message = await context.bot.send_photo(
+        chat_id=chat_id, photo=photo, caption=caption, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup
+    )
+    if message.photo:
+        await asyncio.to_thread(file_id_store.set, photo_hash, message.photo[-1].file_id)
+
+
+async def _edit_or_send(
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    message_id: int,
+    text: str,
+    reply_markup: Optional[InlineKeyboardMarkup],
+    parse_mode: Optional[str] = ParseMode.MARKDOWN,
+) -> Message:
+    try:
+        message = await context.bot.edit_message_text(
+            text, chat_id=chat_id, message_id=message_id, reply_markup=reply_markup, parse_mode=parse_mode
+        )
+        if isinstance(message, Message):
+            return message
+    except BadRequest:
+        # The message can't be edited anymore, e.g. it was deleted by the user
+        pass
+    return await context.bot.send_message(chat_id=chat_id, text=text, reply_markup=reply_markup, parse_mode=parse_mode)
+
+
+def format_records(tracking_number: str, records: list[TrackingRecord]) -> tuple[str, Optional[str]]:
+    """Format the tracking records of a parcel as the text of a message and its parse mode."""
+    if not records:
+        return warning_msg("نتیجه ای یافت نشد!"), None
+    text = "\n\n".join([f"✅ شماره رهگیری: *{tracking_number}*"] + [format_tracking_record(record) for record in records])
+    return text, ParseMode.MARKDOWN
+
+
 def _end_conversation(context: ContextTypes.DEFAULT_TYPE) -> int:
     if context.user_data is not None:
         context.user_data.clear()
@@ -87,6 +155,8 @@ async def handle_tracking_result_type(update: Update, context: ContextTypes.DEFA
     await _remove_keyboard_markup(update, context)
 
     tracking_number = str(update.message.text).strip()
+    if len(extract_tracking_numbers(tracking_number)) > 1:
+        return await handle_bulk_tracking_input(update, context)
     if not validate_tracking_number(tracking_number):
         await update.message.reply_text(error_msg("شماره رهگیری مرسوله معتبر نیست."))
         await handle_tracking_number(update, context)
@@ -103,6 +173,19 @@ async def handle_tracking_result_type(update: Update, context: ContextTypes.DEFA
     return WAITING_FOR_RESULT_TYPE
 
 
+async def handle_bulk_tracking_input(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """
+    Handler for a message or a file with several tracking numbers.
+    """
+    await _remove_keyboard_markup(update, context)
+    await handle_bulk_tracking(update, context)
+
+    if context.user_data is not None:
+        context.user_data[REDIRECT_FROM_TRACKING_KEY] = True
+    await handle_start(update, context)
+    return ConversationHandler.END
+
+
 async def handle_tracking_process(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """
     Handler for parcel tracking process.
@@ -120,60 +203,94 @@ async def handle_tracking_process(update: Update, context: ContextTypes.DEFAULT_
     tracking_number = str(context.user_data.get("tracking_number")).strip()
 
     context.user_data.pop(IS_TRACKING_FLAG_KEY, None)
-    await _remove_keyboard_markup(update, context)
     result_type_fa = OUTPUT_TYPE_CALLBACK_MAP.get(result_type, "تصویر")
-    await context.bot.send_message(
-        chat_id=query.message.chat.id,
-        text="\n\n".join(["🔄 در حال رهگیری...", f"(نوع نمایش: *{result_type_fa}*)"]),
-        parse_mode=ParseMode.MARKDOWN,
-    )
-
-    tracking_result: Optional[list[TrackingRecord] | bytes] = None
-    try:
-        proxy = None
-        if settings.proxy_url:
-            proxy = ProxySettings(server=settings.proxy_url)
-
-        return_type = result_type if result_type in ("text", "image") else "image"
+    status_text = "\n\n".join(["🔄 در حال رهگیری...", f"(نوع نمایش: *{result_type_fa}*)"])
+    # The output type message becomes the status message, and then the result, instead of sending new messages
+    status_message = await _edit_or_send(context, query.message.chat.id, query.message.message_id, status_text, reply_markup=None)
+
+    async def report_queue_position(position: int) -> None:
+        with suppress(TelegramError):
+            await status_message.edit_text(
+                "\n\n".join([status_text, f"⏳ جایگاه شما در صف: *{position}*"]), parse_mode=ParseMode.MARKDOWN
+            )
 
-        tracker = ParcelTracker(normalizer=normalize_text, proxy=proxy)
-        if return_type == "image":
-            tracking_result = await tracker.track_as_image(tracking_number, timeout=settings.tracking_timeout)
-        else:
-            tracking_result = await tracker.track_as_text(tracking_number, timeout=settings.tracking_timeout)
-    except TrackingError as e:
-        await context.bot.send_message(chat_id=query.message.chat.id, text=error_msg(str(e)))
-    except Exception:
-        await context.bot.send_message(
-            chat_id=query.message.chat.id, text=error_msg("عملیات با خطا مواجه شد. لطفا دقایقی دیگر مجددا تلاش کنید.")
+    async def reply(text: str, parse_mode: Optional[str] = None) -> None:
+        await _edit_or_send(
+            context,
+            status_message.chat_id,
+            status_message.message_id,
+            text,
+            reply_markup=keyboard_markup_start,
+            parse_mode=parse_mode,
         )
-        context.user_data[REDIRECT_FROM_TRACKING_KEY] = True
-        await handle_start(update, context)
-        raise
 
-    if tracking_result is not None:
-        if isinstance(tracking_result, bytes):
-            await context.bot.send_photo(
-                chat_id=query.message.chat.id,
-                photo=tracking_result,
-                caption=f"✅ شماره رهگیری: *{tracking_number}*",
-                parse_mode=ParseMode.MARKDOWN,
+    return_type = result_type if result_type in ("text", "image", "both") else "image"
+    with traced(tracking_number, return_type, settings.slow_request_threshold) as trace:
+        tracking_result: Optional[TrackingResult] = None
+        try:
+            tracker = create_tracker()
+            user_id = update.effective_user.id if update.effective_user else query.message.chat.id
+            queued_at = time.perf_counter()
+
+            async def track() -> TrackingResult:
+                observe_stage("queue", time.perf_counter() - queued_at)
+                if return_type == "image":
+                    return await tracker.track_as_image(tracking_number, timeout=settings.tracking_timeout)
+                if return_type == "both":
+                    return await tracker.track_as_text_and_image(tracking_number, timeout=settings.tracking_timeout)
+                return await tracker.track_as_text(tracking_number, timeout=settings.tracking_timeout)
+
+            # Every user waits in the queue in their own turn, even when their lookup is served by another user's scrape
+            tracking_result = await tracking_cache.get_or_track(
+                tracking_number,
+                return_type,
+                track,
+                queue=partial(tracking_scheduler.run, user_id, on_position=report_queue_position),
             )
-        else:
-            if tracking_result:
-                reply_text = "\n\n".join(
-                    [
-                        f"✅ شماره رهگیری: *{tracking_number}*",
-                    ]
-                    + [format_tracking_record(record) for record in tracking_result]
-                )
-                await context.bot.send_message(chat_id=query.message.chat.id, text=reply_text, parse_mode=ParseMode.MARKDOWN)
-            else:
-                await context.bot.send_message(chat_id=query.message.chat.id, text=warning_msg("نتیجه ای یافت نشد!"))
-
-    context.user_data[REDIRECT_FROM_TRACKING_KEY] = True
-    await handle_start(update, context)
-    return ConversationHandler.END
+        except TrackingError as e:
+            trace.outcome = "tracking_error"
+            await reply(error_msg(str(e)))
+        except UserQueueFullError:
+            trace.outcome = "rejected"
+            await reply(warning_msg("درخواست قبلی شما در حال انجام است. لطفا پس از دریافت نتیجه آن مجددا تلاش کنید."))
+        except QueueFullError:
+            trace.outcome = "rejected"
+            await reply(warning_msg("در حال حاضر درخواست‌های زیادی در صف رهگیری هستند. لطفا چند دقیقه دیگر مجددا تلاش کنید."))
+        except Exception:
+            await reply(error_msg("عملیات با خطا مواجه شد. لطفا دقایقی دیگر مجددا تلاش کنید."))
+            _end_conversation(context)
+            raise
+
+        if tracking_result is not None:
+            with timed("telegram"):
+                if isinstance(tracking_result, TrackingSnapshot):
+                    # The records replace the status message and the photo follows them, with the start menu
+                    text, parse_mode = format_records(tracking_number, tracking_result.records)
+                    await _edit_or_send(
+                        context, status_message.chat_id, status_message.message_id, text, reply_markup=None, parse_mode=parse_mode
+                    )
+                    await _send_photo(
+                        context,
+                        status_message.chat_id,
+                        tracking_result.screenshot,
+                        caption=f"✅ شماره رهگیری: *{tracking_number}*",
+                        reply_markup=keyboard_markup_start,
+                    )
+                elif isinstance(tracking_result, bytes):
+                    # A text message can't be edited into a photo, so the photo is sent and the status message removed
+                    await _send_photo(
+                        context,
+                        status_message.chat_id,
+                        tracking_result,
+                        caption=f"✅ شماره رهگیری: *{tracking_number}*",
+                        reply_markup=keyboard_markup_start,
+                    )
+                    with suppress(TelegramError):
+                        await status_message.delete()
+                else:
+                    await reply(*format_records(tracking_number, tracking_result))
+
+    return _end_conversation(context)
 
 
 tracking_conversation_handler = ConversationHandler(
@@ -183,15 +300,17 @@ tracking_conversation_handler = ConversationHandler(
     states={
         WAITING_FOR_TRACKING_NUMBER: [
             MessageHandler(filters.TEXT & ~filters.COMMAND, handle_tracking_result_type),
+            # The lookups wait in the tracking queue, without holding one of the updates processed concurrently
+            MessageHandler(BULK_DOCUMENT_FILTER, handle_bulk_tracking_input, block=False),
         ],
         WAITING_FOR_RESULT_TYPE: [
-            CallbackQueryHandler(
-                handle_tracking_process, pattern=f"^(?:{Command.TRACK_OUTPUT_TEXT.value}|{Command.TRACK_OUTPUT_IMAGE.value})$"
-            ),
+            CallbackQueryHandler(handle_tracking_process, pattern=f"^(?:{'|'.join(OUTPUT_TYPE_CALLBACK_MAP)})$", block=False),
         ],
     },
     fallbacks=[
         CallbackQueryHandler(handle_start, pattern=Command.START),
     ],
     allow_reentry=True,
+    name="tracking",
+    persistent=True,
 )
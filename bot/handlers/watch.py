@@ -0,0 +1,198 @@
+import asyncio
+import logging
+import random
+import time
+from functools import partial
+from typing import Optional
+
+from telegram import Update
+from telegram.constants import ParseMode
+from telegram.error import Forbidden, TelegramError
+from telegram.ext import ContextTypes
+
+from bot.config import settings
+from bot.models import TrackingRecord
+from bot.services import (
+    create_tracker,
+    history_store,
+    tracking_cache,
+    tracking_scheduler,
+    watch_store,
+)
+from bot.utils.exceptions import QueueFullError, TrackingError
+from bot.utils.text import error_msg, format_tracking_record, success_msg, warning_msg
+from bot.utils.tracking import validate_tracking_number
+from bot.utils.watch import WATCH_USER_ID, WatchedParcel
+
+__all__ = ("handle_watch", "handle_unwatch", "handle_watchlist", "poll_watched_parcels")
+
+logger = logging.getLogger(__name__)
+
+DELIVERED_KEYWORDS = ("تحویل", "گیرنده")
+
+
+def _is_delivered(records: list[TrackingRecord]) -> bool:
+    return any(all(keyword in record.description for keyword in DELIVERED_KEYWORDS) for record in records)
+
+
+def _next_check_at(interval: float) -> float:
+    jitter = random.uniform(-settings.watch_jitter, settings.watch_jitter)
+    return time.time() + interval * (1 + jitter)
+
+
+async def handle_watch(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Handler for /watch command.
+    """
+    if not update.message or not update.effective_chat:
+        return
+
+    tracking_number = " ".join(context.args or []).strip()
+    if not validate_tracking_number(tracking_number):
+        await update.message.reply_text(
+            error_msg("شماره رهگیری را پس از دستور وارد کنید. مثال:\n/watch 123456789012345678901234")
+        )
+        return
+
+    chat_id = update.effective_chat.id
+    watched = await asyncio.to_thread(watch_store.watched_by, chat_id)
+    if tracking_number in watched:
+        await update.message.reply_text(warning_msg("این مرسوله در حال پیگیری است."))
+        return
+    if len(watched) >= settings.watch_max_per_chat:
+        await update.message.reply_text(
+            warning_msg(f"حداکثر {settings.watch_max_per_chat} مرسوله را می‌توانید به صورت همزمان پیگیری کنید.")
+        )
+        return
+
+    await asyncio.to_thread(watch_store.add, chat_id, tracking_number, settings.watch_min_interval)
+    await update.message.reply_text(
+        success_msg(f"مرسوله *{tracking_number}* به فهرست پیگیری اضافه شد. تغییرات وضعیت آن به شما اطلاع داده می‌شود."),
+        parse_mode=ParseMode.MARKDOWN,
+    )
+
+
+async def handle_unwatch(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Handler for /unwatch command.
+    """
+    if not update.message or not update.effective_chat:
+        return
+
+    tracking_number = " ".join(context.args or []).strip()
+    if await asyncio.to_thread(watch_store.remove, update.effective_chat.id, tracking_number):
+        await update.message.reply_text(
+            success_msg(f"پیگیری مرسوله *{tracking_number}* متوقف شد."), parse_mode=ParseMode.MARKDOWN
+        )
+    else:
+        await update.message.reply_text(warning_msg("این مرسوله در فهرست پیگیری شما نیست."))
+
+
+async def handle_watchlist(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Handler for /watchlist command.
+    """
+    if not update.message or not update.effective_chat:
+        return
+
+    watched = await asyncio.to_thread(watch_store.watched_by, update.effective_chat.id)
+    if not watched:
+        await update.message.reply_text(warning_msg("مرسوله ای در حال پیگیری نیست."))
+        return
+
+    await update.message.reply_text(
+        "\n".join(["🔔 مرسولات در حال پیگیری:\n"] + [f"`{tracking_number}`" for tracking_number in watched]),
+        parse_mode=ParseMode.MARKDOWN,
+    )
+
+
+async def _check_parcel(parcel: WatchedParcel, semaphore: asyncio.Semaphore) -> Optional[list[TrackingRecord]]:
+    tracker = create_tracker()
+    async with semaphore:
+        try:
+            result = await tracking_cache.get_or_track(
+                parcel.tracking_number,
+                "text",
+                partial(tracker.track_as_text, parcel.tracking_number, timeout=settings.tracking_timeout),
+                queue=partial(tracking_scheduler.run, WATCH_USER_ID),
+            )
+        except TrackingError:
+            return None
+        except QueueFullError:
+            # The bot is busy, the parcel is checked again later
+            return None
+        except Exception as e:
+            logger.warning(f"Failed to check watched parcel {parcel.tracking_number}: {e!r}")
+            return None
+    return result if isinstance(result, list) else None
+
+
+async def _notify(context: ContextTypes.DEFAULT_TYPE, chat_id: int, tracking_number: str, records: list[TrackingRecord]) -> None:
+    text = "\n\n".join([f"🔔 وضعیت جدید مرسوله *{tracking_number}*"] + [format_tracking_record(record) for record in records])
+    try:
+        await context.bot.send_message(chat_id=chat_id, text=text, parse_mode=ParseMode.MARKDOWN)
+    except Forbidden:
+        await asyncio.to_thread(watch_store.remove, chat_id, tracking_number)
+    except TelegramError as e:
+        logger.warning(f"Failed to notify chat {chat_id} about parcel {tracking_number}: {e}")
+
+
+async def poll_watched_parcels(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Job that checks a batch of watched parcels due for a check and notifies their watchers of new tracking events.
+    The check interval of a parcel shrinks when its status changes and grows while it doesn't.
+
+    The tracking records are appended to the tracking history store by the tracker, also when a parcel is tracked
+    by a user, so the new events of a parcel are the ones first seen since its last check.
+    """
+    parcels = await asyncio.to_thread(watch_store.due, time.time(), settings.watch_batch_size)
+    if not parcels:
+        return
+
+    # The checks take turns with the users' requests in the tracking queue, up to `WATCH_CONCURRENCY` at once
+    semaphore = asyncio.Semaphore(settings.watch_concurrency)
+    results = await asyncio.gather(*(_check_parcel(parcel, semaphore) for parcel in parcels))
+    # Events first seen after this point are left to the next check
+    checked_at = time.time()
+
+    def events_since_last_check() -> dict[str, list[TrackingRecord]]:
+        new_events: dict[str, list[TrackingRecord]] = {}
+        for parcel, records in zip(parcels, results):
+            # The first check only records the current status of the parcel
+            if records is None or parcel.checked_at is None:
+                continue
+            if events := history_store.events_since(parcel.tracking_number, parcel.checked_at, until=checked_at):
+                new_events[parcel.tracking_number] = [history_event.event.to_record() for history_event in events]
+        return new_events
+
+    new_events = await asyncio.to_thread(events_since_last_check)
+
+    updates: list[tuple[WatchedParcel, float]] = []
+    for parcel, records in zip(parcels, results):
+        if records is None:
+            interval = min(parcel.interval * settings.watch_backoff_factor, settings.watch_max_interval)
+            updates.append((parcel._replace(interval=interval), _next_check_at(interval)))
+            continue
+
+        delivered = _is_delivered(records)
+        if delivered:
+            interval = settings.watch_delivered_interval
+        elif parcel.tracking_number in new_events or parcel.checked_at is None:
+            interval = settings.watch_min_interval
+        else:
+            interval = min(parcel.interval * settings.watch_backoff_factor, settings.watch_max_interval)
+
+        parcel = parcel._replace(checked_at=checked_at, interval=interval, delivered=delivered)
+        updates.append((parcel, _next_check_at(interval)))
+
+    await asyncio.to_thread(watch_store.update, updates)
+
+    if new_events:
+        subscribers = await asyncio.to_thread(watch_store.subscribers, list(new_events))
+        await asyncio.gather(
+            *(
+                _notify(context, chat_id, tracking_number, records)
+                for tracking_number, records in new_events.items()
+                for chat_id in subscribers.get(tracking_number, [])
+            )
+        )
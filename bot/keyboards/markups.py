@@ -5,6 +5,7 @@ from bot.enums import Command
 OUTPUT_TYPE_CALLBACK_MAP: dict[str | Command, str] = {
     Command.TRACK_OUTPUT_TEXT: "متن",
     Command.TRACK_OUTPUT_IMAGE: "عکس",
+    Command.TRACK_OUTPUT_BOTH: "متن و عکس",
 }
 
 
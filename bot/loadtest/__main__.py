@@ -0,0 +1,177 @@
+"""
+Load test of the bot's handlers, without Telegram nor the tracking website.
+
+The application is built as in production, against a local stand-in of the Bot API, with the parcel tracker pointed
+at a local stand-in of the tracking website. Sessions of virtual users are replayed through its handlers at a target
+rate, and the latency percentiles of every handler and the lag of the event loop are reported. The run can be
+profiled with cProfile, yappi (if installed) or tracemalloc. Settings not related to the stand-ins are read from the
+environment as usual, e.g. `CACHE_TTL=0` to scrape every tracking number.
+
+Usage:
+    python -m bot.loadtest --rate 10 --duration 60 --profile cprofile --profile-output loadtest.prof
+"""
+
+import argparse
+import asyncio
+import cProfile
+import importlib
+import importlib.util
+import logging
+import os
+import pstats
+import sys
+import tempfile
+import tracemalloc
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from .botapi import FakeBotAPIServer
+from .site import (
+    TRACKING_NUMBER_MULTIPLE_DATES,
+    TRACKING_NUMBER_NOT_FOUND,
+    TRACKING_NUMBER_WITH_DATE,
+    TRACKING_NUMBER_WITHOUT_DATE,
+    TrackingSiteServer,
+)
+
+TOKEN = "123456:loadtest"
+PROFILERS = ("cprofile", "yappi", "tracemalloc")
+TOP_ENTRIES = 25
+
+
+def _parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    from .runner import FLOWS
+
+    parser = argparse.ArgumentParser(prog="python -m bot.loadtest", description="Load test the bot's handlers.")
+    parser.add_argument("--rate", type=float, default=5, help="sessions started per second (default: 5)")
+    parser.add_argument("--duration", type=float, default=30, help="time during which sessions are started, in seconds")
+    parser.add_argument("--flow", choices=FLOWS, default="track", help="session of a user (default: track)")
+    parser.add_argument("--output", choices=("text", "image", "both"), default="text", help="output type of the results")
+    parser.add_argument(
+        "--tracking-numbers",
+        nargs="+",
+        default=[
+            TRACKING_NUMBER_WITH_DATE,
+            TRACKING_NUMBER_WITHOUT_DATE,
+            TRACKING_NUMBER_MULTIPLE_DATES,
+            TRACKING_NUMBER_NOT_FOUND,
+        ],
+        help="tracking numbers tracked by the sessions, in turn (default: the recorded scenarios)",
+    )
+    parser.add_argument("--site-latency", type=float, default=0.2, help="delay of the tracking website stand-in, in seconds")
+    parser.add_argument("--api-latency", type=float, default=0.02, help="delay of the Bot API stand-in, in seconds")
+    parser.add_argument("--step-timeout", type=float, default=60, help="time after which a session is abandoned, in seconds")
+    parser.add_argument("--no-rate-limit", action="store_true", help="disable the rate limits of the messages to chats")
+    parser.add_argument("--profile", choices=PROFILERS, help="profile the run with cProfile, yappi or tracemalloc")
+    parser.add_argument("--profile-output", help="file to save the profile to, e.g. for snakeviz or pstats")
+    parser.add_argument("-v", "--verbose", action="store_true", help="show the logs of the bot")
+    args = parser.parse_args(argv)
+    if args.profile == "yappi" and importlib.util.find_spec("yappi") is None:
+        parser.error("yappi isn't installed, install it with `pip install yappi`.")
+    return args
+
+
+@contextmanager
+def _profiled(profiler: Optional[str], output: Optional[str]) -> Iterator[None]:
+    if profiler == "cprofile":
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            if output:
+                profile.dump_stats(output)
+            pstats.Stats(profile, stream=sys.stdout).sort_stats("cumulative").print_stats(TOP_ENTRIES)
+    elif profiler == "yappi":
+        yappi = importlib.import_module("yappi")
+        # Wall time, so that the time coroutines spend awaiting is accounted for
+        yappi.set_clock_type("wall")
+        yappi.start()
+        try:
+            yield
+        finally:
+            yappi.stop()
+            stats = yappi.get_func_stats().sort("ttot")
+            if output:
+                stats.save(output, type="pstat")
+            stats.print_all(out=sys.stdout, columns={0: ("name", 80), 1: ("ncall", 10), 2: ("ttot", 10), 3: ("tsub", 10)})
+    elif profiler == "tracemalloc":
+        tracemalloc.start(TOP_ENTRIES)
+        try:
+            yield
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            if output:
+                snapshot.dump(output)
+            print(f"Traced memory: current {current / 1024 / 1024:.1f} MB, peak {peak / 1024 / 1024:.1f} MB")
+            for statistic in snapshot.statistics("lineno")[:TOP_ENTRIES]:
+                print(statistic)
+    else:
+        yield
+
+
+async def _run(args: argparse.Namespace, bot_api: FakeBotAPIServer) -> None:
+    # The settings are read when the bot's modules are imported, once the stand-ins are configured
+    from bot.__main__ import build_application
+
+    from .runner import run_load_test
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    application = build_application()
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    await application.start()
+    try:
+        with _profiled(args.profile, args.profile_output):
+            report = await run_load_test(
+                application,
+                bot_api,
+                args.tracking_numbers,
+                rate=args.rate,
+                duration=args.duration,
+                flow=args.flow,
+                output=args.output,
+                step_timeout=args.step_timeout,
+            )
+    finally:
+        await application.stop()
+        if application.post_stop:
+            await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+    print(report.format())
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    args = _parse_args(argv)
+    delays = {tracking_number: args.site_latency for tracking_number in args.tracking_numbers}
+    with (
+        tempfile.TemporaryDirectory() as directory,
+        TrackingSiteServer(delays) as site,
+        FakeBotAPIServer(latency=args.api_latency) as bot_api,
+    ):
+        os.environ.update(
+            TELEGRAM_TOKEN=TOKEN,
+            TELEGRAM_BASE_URL=bot_api.base_url,
+            TRACKING_BASE_URL=site.base_url,
+            DATABASE_PATH=os.path.join(directory, "loadtest.db"),
+            # The errors are logged instead of reported to the developer
+            DEVELOPER_CHAT_ID="",
+            METRICS_PORT="0",
+        )
+        # Text results don't need the browsers, unless they're asked for
+        os.environ.setdefault("BROWSER_POOL_SIZE", "0" if args.output == "text" else "1")
+        if args.no_rate_limit:
+            os.environ.update(RATE_LIMIT_OVERALL="0", RATE_LIMIT_CHAT="0", RATE_LIMIT_GROUP="0")
+        asyncio.run(_run(args, bot_api))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+A local stand-in for the Telegram Bot API, used by the startup benchmarks and load tests.
+
+Every method is answered successfully: the methods sending or editing a message get a message in the chat of the
+request, the others get `true`. Updates pushed to the server are delivered by `getUpdates`.
+"""
+
+import itertools
+import json
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import suppress
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+
+__all__ = ("BOT_USER", "message_update", "callback_query_update", "FakeBotAPIServer")
+
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "Rahgiri", "username": "rahgiri_bot"}
+
+_MESSAGE_METHODS = {"sendMessage", "editMessageText", "sendPhoto", "sendDocument", "editMessageCaption"}
+_CHAT_ID_FIELD = re.compile(rb'name="chat_id"\r\n\r\n(-?\d+)')
+
+
+def _user(user_id: int) -> dict[str, Any]:
+    return {"id": user_id, "is_bot": False, "first_name": f"User {user_id}"}
+
+
+def _chat(chat_id: int) -> dict[str, Any]:
+    return {"id": chat_id, "type": "private", "first_name": f"User {chat_id}"}
+
+
+def message_update(update_id: int, user_id: int, text: str, message_id: int = 1) -> dict[str, Any]:
+    """Build an update with a text message a user sent in their private chat with the bot."""
+    message: dict[str, Any] = {
+        "message_id": message_id,
+        "date": int(time.time()),
+        "chat": _chat(user_id),
+        "from": _user(user_id),
+        "text": text,
+    }
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return {"update_id": update_id, "message": message}
+
+
+def callback_query_update(update_id: int, user_id: int, data: str, message_id: int = 1) -> dict[str, Any]:
+    """Build an update with a press of an inline keyboard button of a message of the bot, in a private chat."""
+    message = {"message_id": message_id, "date": int(time.time()), "chat": _chat(user_id), "from": BOT_USER, "text": "…"}
+    callback_query = {
+        "id": str(update_id),
+        "from": _user(user_id),
+        "chat_instance": str(user_id),
+        "data": data,
+        "message": message,
+    }
+    return {"update_id": update_id, "callback_query": callback_query}
+
+
+class _BotAPIHandler(BaseHTTPRequestHandler):
+    server: "_BotAPIHTTPServer"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send_result(self, result: Any) -> None:
+        body = json.dumps({"ok": True, "result": result}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        with suppress(ConnectionError):
+            self.wfile.write(body)
+
+    def _chat_id(self, body: bytes) -> int:
+        chat_id: Any = None
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            with suppress(ValueError):
+                chat_id = json.loads(body).get("chat_id")
+        elif match := _CHAT_ID_FIELD.search(body):
+            chat_id = match.group(1)
+        with suppress(TypeError, ValueError):
+            return int(chat_id)
+        return 0
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        method = self.path.rsplit("/", 1)[-1]
+        if method == "getUpdates":
+            self._send_result(self.server.owner._pop_updates())
+            return
+
+        self.server.owner._record(method)
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if method == "getMe":
+            self._send_result(BOT_USER)
+        elif method in _MESSAGE_METHODS:
+            chat_id = self._chat_id(body)
+            message: dict[str, Any] = {
+                "message_id": self.server.owner._next_message_id(chat_id),
+                "date": int(time.time()),
+                "chat": _chat(chat_id),
+                "from": BOT_USER,
+                "text": "…",
+            }
+            if method == "sendPhoto":
+                message["photo"] = [{"file_id": "photo", "file_unique_id": "photo", "width": 1, "height": 1}]
+            self._send_result(message)
+        else:
+            self._send_result(True)
+
+
+class _BotAPIHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, owner: "FakeBotAPIServer", latency: float) -> None:
+        super().__init__(("127.0.0.1", 0), _BotAPIHandler)
+        self.owner = owner
+        self.latency = latency
+
+
+class FakeBotAPIServer:
+    """
+    A local HTTP server standing in for the Telegram Bot API, running in a background thread.
+
+    Args:
+        latency (float): Delay of the answers to the bot's requests, except `getUpdates`, in seconds. Defaults to 0.
+    """
+
+    def __init__(self, latency: float = 0) -> None:
+        self.latency = latency
+        self.calls: Counter[str] = Counter()
+        self._server = _BotAPIHTTPServer(self, latency)
+        self._thread: Optional[threading.Thread] = None
+        self._condition = threading.Condition()
+        self._updates: list[dict[str, Any]] = []
+        self._first_call_at: dict[str, float] = {}
+        self._message_ids = itertools.count(1000)
+        self._last_message_ids: dict[int, int] = {}
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host!s}:{port}/bot"
+
+    def _record(self, method: str) -> None:
+        with self._condition:
+            self.calls[method] += 1
+            self._first_call_at.setdefault(method, time.perf_counter())
+            self._condition.notify_all()
+
+    def _next_message_id(self, chat_id: int) -> int:
+        with self._condition:
+            message_id = self._last_message_ids[chat_id] = next(self._message_ids)
+        return message_id
+
+    def _pop_updates(self) -> list[dict[str, Any]]:
+        with self._condition:
+            if not self._updates:
+                # A short long-polling
+                self._condition.wait(0.1)
+            updates, self._updates = self._updates, []
+        return updates
+
+    def push_update(self, update: dict[str, Any]) -> None:
+        """Queue an update, to be delivered by the next `getUpdates` request."""
+        with self._condition:
+            self._updates.append(update)
+            self._condition.notify_all()
+
+    def last_message_id(self, chat_id: int) -> Optional[int]:
+        """Get the ID of the last message the bot sent to a chat."""
+        return self._last_message_ids.get(chat_id)
+
+    def wait_for(self, method: str, timeout: float) -> Optional[float]:
+        """
+        Wait for a call of a method since the last reset.
+
+        Returns:
+            Optional[float]: The `time.perf_counter()` of the first call, or None if the method wasn't called in time.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: method in self._first_call_at, timeout)
+            return self._first_call_at.get(method)
+
+    def reset(self) -> None:
+        """Forget the calls and the queued updates."""
+        with self._condition:
+            self.calls.clear()
+            self._first_call_at.clear()
+            self._updates.clear()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> "FakeBotAPIServer":
+        self.start()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop()
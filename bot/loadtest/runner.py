@@ -0,0 +1,227 @@
+import asyncio
+import itertools
+import statistics
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Sequence
+
+from telegram import Update
+from telegram.ext import (
+    Application,
+    BaseHandler,
+    ContextTypes,
+    ConversationHandler,
+    TypeHandler,
+)
+
+from bot.enums import Command
+
+from .botapi import FakeBotAPIServer, callback_query_update, message_update
+
+__all__ = ("FLOWS", "LoadTestReport", "run_load_test")
+
+FLOWS = ("start", "track")
+"""The sessions a virtual user can replay: `/start` only, or the whole tracking conversation."""
+
+# Runs after the handlers of the other groups, once the update is processed
+_DONE_GROUP = 1000
+
+
+def _percentiles(values: Sequence[float]) -> tuple[float, float, float, float]:
+    if len(values) < 2:
+        value = values[0] if values else 0.0
+        return value, value, value, value
+    quantiles = statistics.quantiles(values, n=100, method="inclusive")
+    return quantiles[49], quantiles[94], quantiles[98], max(values)
+
+
+@dataclass
+class LoadTestReport:
+    """
+    The outcome of a load test: the latencies of the handlers, from the time their update was queued to the time they
+    returned, the lag of the event loop and the requests the bot sent to the Bot API.
+    """
+
+    flow: str
+    sessions: int = 0
+    updates: int = 0
+    timeouts: int = 0
+    duration: float = 0.0
+    latencies: dict[str, list[float]] = field(default_factory=dict)
+    errors: Counter[str] = field(default_factory=Counter)
+    loop_lags: list[float] = field(default_factory=list)
+    api_calls: Counter[str] = field(default_factory=Counter)
+
+    def format(self) -> str:
+        lines = [
+            f"Sessions: {self.sessions} ({self.flow}), updates: {self.updates} in {self.duration:.1f}s "
+            f"({self.updates / self.duration if self.duration else 0:.1f}/s), timed out: {self.timeouts}",
+            "",
+            f"{'Handler':<32}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'errors':>8}",
+        ]
+        for name, latencies in sorted(self.latencies.items()):
+            p50, p95, p99, maximum = (value * 1000 for value in _percentiles(latencies))
+            lines.append(
+                f"{name:<32}{len(latencies):>8}{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}{maximum:>10.1f}{self.errors[name]:>8}"
+            )
+        p50, p95, p99, maximum = (value * 1000 for value in _percentiles(self.loop_lags))
+        lines += [
+            "",
+            f"Event loop lag: p50 {p50:.1f} ms, p95 {p95:.1f} ms, p99 {p99:.1f} ms, max {maximum:.1f} ms",
+            "Bot API calls: " + ", ".join(f"{method}={count}" for method, count in self.api_calls.most_common()),
+        ]
+        return "\n".join(lines)
+
+
+class _LoadTest:
+    def __init__(
+        self,
+        application: Application[Any, Any, Any, Any, Any, Any],
+        bot_api: FakeBotAPIServer,
+        flow: str,
+        output: str,
+        step_timeout: float,
+    ) -> None:
+        self.application = application
+        self.bot_api = bot_api
+        self.flow = flow
+        self.output = output
+        self.step_timeout = step_timeout
+        self.report = LoadTestReport(flow=flow)
+        self._update_ids = itertools.count(1)
+        self._queued_at: dict[int, float] = {}
+        self._processed: dict[int, asyncio.Future[None]] = {}
+        self._handling = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def _instrument(self, handler: BaseHandler[Any, Any, Any]) -> None:
+        callback = handler.callback
+        name = getattr(callback, "__name__", repr(callback))
+
+        async def timed(update: object, context: Any) -> Any:
+            queued_at = self._queued_at.get(update.update_id) if isinstance(update, Update) else None
+            self._handling += 1
+            self._idle.clear()
+            try:
+                return await callback(update, context)
+            except Exception:
+                self.report.errors[name] += 1
+                raise
+            finally:
+                if queued_at is not None:
+                    self.report.latencies.setdefault(name, []).append(time.perf_counter() - queued_at)
+                self._handling -= 1
+                if not self._handling:
+                    self._idle.set()
+
+        handler.callback = timed
+
+    async def _processed_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        future = self._processed.pop(update.update_id, None)
+        if future is not None and not future.done():
+            future.set_result(None)
+
+    async def wait_idle(self) -> None:
+        """Wait for the handlers still running, e.g. the non-blocking ones, once the updates are processed."""
+        # Lets the tasks of the non-blocking handlers of the last updates start
+        await asyncio.sleep(0)
+        await self._idle.wait()
+
+    def install(self) -> None:
+        for handlers in list(self.application.handlers.values()):
+            for handler in handlers:
+                if isinstance(handler, ConversationHandler):
+                    states = itertools.chain.from_iterable(handler.states.values())
+                    for nested in itertools.chain(handler.entry_points, states, handler.fallbacks):
+                        self._instrument(nested)
+                else:
+                    self._instrument(handler)
+        self.application.add_handler(TypeHandler(Update, self._processed_callback), group=_DONE_GROUP)
+
+    async def _send(self, user_id: int, data: str, callback: bool) -> bool:
+        update_id = next(self._update_ids)
+        message_id = self.bot_api.last_message_id(user_id) or 1
+        payload = (callback_query_update if callback else message_update)(update_id, user_id, data, message_id)
+        update = Update.de_json(payload, self.application.bot)
+
+        processed = self._processed[update_id] = asyncio.get_running_loop().create_future()
+        self._queued_at[update_id] = time.perf_counter()
+        self.report.updates += 1
+        await self.application.update_queue.put(update)
+        try:
+            await asyncio.wait_for(processed, self.step_timeout)
+        except asyncio.TimeoutError:
+            self._processed.pop(update_id, None)
+            self.report.timeouts += 1
+            return False
+        return True
+
+    async def session(self, user_id: int, tracking_number: str) -> None:
+        steps = [("/start", False)]
+        if self.flow == "track":
+            steps += [(Command.TRACK.value, True), (tracking_number, False), (self.output, True)]
+        for data, callback in steps:
+            if not await self._send(user_id, data, callback):
+                return
+
+
+async def _monitor_loop_lag(interval: float, lags: list[float]) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        started_at = loop.time()
+        await asyncio.sleep(interval)
+        lags.append(max(loop.time() - started_at - interval, 0.0))
+
+
+async def run_load_test(
+    application: Application[Any, Any, Any, Any, Any, Any],
+    bot_api: FakeBotAPIServer,
+    tracking_numbers: Sequence[str],
+    rate: float = 5,
+    duration: float = 30,
+    flow: str = "track",
+    output: str = "text",
+    step_timeout: float = 60,
+    lag_interval: float = 0.01,
+) -> LoadTestReport:
+    """
+    Replay sessions of virtual users through the handlers of a started application. The sessions start at a steady
+    rate, each as a new user, and send their updates one after the other, as soon as the previous one is processed.
+
+    Args:
+        application (Application): The application, initialized and started, sending its requests to `bot_api`.
+        bot_api (FakeBotAPIServer): The local stand-in of the Bot API the application sends its requests to.
+        tracking_numbers (Sequence[str]): The tracking numbers the sessions track, in turn.
+        rate (float): Number of sessions started per second. Defaults to 5.
+        duration (float): Time during which sessions are started, in seconds. Defaults to 30.
+        flow (str): The session of a user, one of `FLOWS`. Defaults to "track".
+        output (str): The output type of the tracking results, i.e. "text", "image" or "both". Defaults to "text".
+        step_timeout (float): Maximum time an update may take to be processed before its session is abandoned,
+            in seconds. Defaults to 60.
+        lag_interval (float): Interval of the measurements of the event loop lag, in seconds. Defaults to 0.01.
+
+    Returns:
+        LoadTestReport: The latencies of the handlers, the event loop lag and the requests to the Bot API.
+    """
+    load_test = _LoadTest(application, bot_api, flow, output, step_timeout)
+    load_test.install()
+    bot_api.reset()
+    monitor = asyncio.create_task(_monitor_loop_lag(lag_interval, load_test.report.loop_lags))
+
+    sessions: list[asyncio.Task[None]] = []
+    started_at = time.perf_counter()
+    for index in range(max(int(rate * duration), 1)):
+        if (delay := started_at + index / rate - time.perf_counter()) > 0:
+            await asyncio.sleep(delay)
+        tracking_number = tracking_numbers[index % len(tracking_numbers)]
+        sessions.append(asyncio.create_task(load_test.session(1_000_000 + index, tracking_number)))
+    await asyncio.gather(*sessions)
+    await load_test.wait_idle()
+
+    load_test.report.duration = time.perf_counter() - started_at
+    load_test.report.sessions = len(sessions)
+    load_test.report.api_calls = bot_api.calls.copy()
+    monitor.cancel()
+    return load_test.report
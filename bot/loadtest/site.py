@@ -0,0 +1,131 @@
+"""
+A local stand-in for the Iran Post tracking website that serves recorded pages, used by the tests and load tests.
+
+A GET request renders the search form for the tracking number in the `id` query parameter. Submitting the
+form (an ASP.NET postback) renders the result panel of the scenario the tracking number is mapped to in
+`SCENARIOS`; unknown tracking numbers get the "not found" alert.
+"""
+
+import threading
+import time
+from contextlib import suppress
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from string import Template
+from typing import Any, Optional
+from urllib.parse import parse_qs, urlsplit
+
+__all__ = (
+    "TRACKING_NUMBER_WITH_DATE",
+    "TRACKING_NUMBER_WITHOUT_DATE",
+    "TRACKING_NUMBER_MULTIPLE_DATES",
+    "TRACKING_NUMBER_SLOW",
+    "TRACKING_NUMBER_NOT_FOUND",
+    "SCENARIOS",
+    "PAGES_DIR",
+    "TrackingSiteServer",
+)
+
+PAGES_DIR = Path(__file__).parent / "pages"
+VIEWSTATE = "/wEPDwUKMTI2NzU0NzY5MA9kFgICAw9kFgICAQ8PFgIeB1Zpc2libGVoZGRk"
+
+TRACKING_NUMBER_WITH_DATE = "111111111111111111111111"
+TRACKING_NUMBER_WITHOUT_DATE = "222222222222222222222222"
+TRACKING_NUMBER_MULTIPLE_DATES = "333333333333333333333333"
+TRACKING_NUMBER_SLOW = "444444444444444444444444"
+TRACKING_NUMBER_NOT_FOUND = "999999999999999999999999"
+
+SCENARIOS: dict[str, str] = {
+    TRACKING_NUMBER_WITH_DATE: "with_date",
+    TRACKING_NUMBER_WITHOUT_DATE: "without_date",
+    TRACKING_NUMBER_MULTIPLE_DATES: "multiple_dates",
+    TRACKING_NUMBER_SLOW: "with_date",
+}
+
+
+def _load_page(name: str) -> str:
+    return (PAGES_DIR / f"{name}.html").read_text(encoding="utf-8")
+
+
+class _TrackingSiteHandler(BaseHTTPRequestHandler):
+    server: "_TrackingSiteHTTPServer"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send_page(self, tracking_number: str, panel: str = "") -> None:
+        body = self.server.layout.substitute(tracking_number=tracking_number, viewstate=VIEWSTATE, panel=panel).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Set-Cookie", "ASP.NET_SessionId=fixture; path=/; HttpOnly")
+        self.end_headers()
+        with suppress(ConnectionError):
+            self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        if url.path != "/":
+            self.send_error(404)
+            return
+        tracking_number = parse_qs(url.query).get("id", [""])[0]
+        self._send_page(tracking_number)
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length", 0))
+        form = parse_qs(self.rfile.read(length).decode())
+        if form.get("__VIEWSTATE") != [VIEWSTATE] or "btnSearch" not in form:
+            self.send_error(400, "Invalid postback")
+            return
+
+        tracking_number = form.get("txtbSearch", [""])[0]
+        if delay := self.server.delays.get(tracking_number):
+            time.sleep(delay)
+        scenario = SCENARIOS.get(tracking_number, "not_found")
+        self._send_page(tracking_number, self.server.panels[scenario])
+
+
+class _TrackingSiteHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, delays: dict[str, float]) -> None:
+        super().__init__(("127.0.0.1", 0), _TrackingSiteHandler)
+        self.delays = delays
+        self.layout = Template(_load_page("layout"))
+        self.panels = {name: _load_page(name) for name in {*SCENARIOS.values(), "not_found"}}
+
+
+class TrackingSiteServer:
+    """
+    A local HTTP server standing in for the tracking website, running in a background thread.
+
+    Args:
+        delays (Optional[dict[str, float]]): Delay of the search response for some tracking numbers, in seconds.
+            Defaults to a 1 second delay for `TRACKING_NUMBER_SLOW`.
+    """
+
+    def __init__(self, delays: Optional[dict[str, float]] = None) -> None:
+        self._server = _TrackingSiteHTTPServer({TRACKING_NUMBER_SLOW: 1.0} if delays is None else delays)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host!s}:{port}/"
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> "TrackingSiteServer":
+        self.start()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop()
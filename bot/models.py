@@ -1,4 +1,5 @@
-from typing import Optional
+from dataclasses import dataclass
+from typing import Any, NamedTuple, Optional
 
 from pydantic import BaseModel
 
@@ -9,3 +10,51 @@ class TrackingRecord(BaseModel):
     time: str
     description: str
     location: Optional[str] = None
+
+
+@dataclass(slots=True)
+class TrackingEvent:
+    """
+    A tracking event, as parsed from the tracking website. Lighter to build in bulk than `TrackingRecord`, which it's
+    converted to when it leaves the parser.
+    """
+
+    id: int
+    time: str
+    description: str
+    date: Optional[str] = None
+    location: Optional[str] = None
+
+    def to_record(self) -> TrackingRecord:
+        return TrackingRecord(id=self.id, date=self.date, time=self.time, description=self.description, location=self.location)
+
+    @classmethod
+    def from_record(cls, record: TrackingRecord) -> "TrackingEvent":
+        return cls(id=record.id, time=record.time, description=record.description, date=record.date, location=record.location)
+
+
+class Screenshot(bytes):
+    """
+    The encoded screenshot of a tracking result, with a key of the tracking state it shows: the tracking number and
+    a hash of the rows of the result. Two screenshots of the same state share the key, even if their bytes differ.
+    """
+
+    state_key: str
+
+    def __new__(cls, data: bytes, state_key: str) -> "Screenshot":
+        screenshot = super().__new__(cls, data)
+        screenshot.state_key = state_key
+        return screenshot
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        # Sent to the bot by the tracking worker processes
+        return Screenshot, (bytes(self), self.state_key)
+
+
+class TrackingSnapshot(NamedTuple):
+    """
+    The records and the screenshot of a tracking result, taken from a single visit of the tracking website.
+    """
+
+    records: list[TrackingRecord]
+    screenshot: bytes
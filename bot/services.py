@@ -0,0 +1,268 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Any, AsyncGenerator, Callable, Optional
+
+import httpx
+
+from bot.config import settings
+from bot.utils.breaker import CircuitBreaker, CircuitBreakerTracker
+from bot.utils.browser import BrowserPool
+from bot.utils.cache import TrackingCache
+from bot.utils.files import FileIdStore
+from bot.utils.history import HistoryStore, HistoryTracker
+from bot.utils.image import ScreenshotOptions
+from bot.utils.metrics import QUEUE_DEPTH, TRACKINGS_IN_FLIGHT, MetricsServer
+from bot.utils.proxies import ProxyPool
+from bot.utils.reporting import ErrorReporter
+from bot.utils.resources import ResourcePolicy
+from bot.utils.scheduler import TrackingScheduler
+from bot.utils.text import normalize_text
+from bot.utils.tracking import ParcelTracker, Tracker, create_http_client
+from bot.utils.useragents import UserAgentPool
+from bot.utils.watch import WATCH_USER_ID, WatchStore
+from bot.utils.workers import TrackingWorkerPool
+
+if TYPE_CHECKING:
+    # The tracking worker processes import this module, but never the Telegram library
+    from telegram.ext import Application, CallbackContext
+
+__all__ = (
+    "proxy_pool",
+    "user_agents",
+    "browser_pool",
+    "http_client",
+    "tracking_cache",
+    "tracking_scheduler",
+    "watch_store",
+    "history_store",
+    "file_id_store",
+    "tracking_workers",
+    "tracking_breaker",
+    "metrics_server",
+    "error_reporter",
+    "serve_tracker",
+    "create_tracker",
+    "start_services",
+    "stop_services",
+    "flush_error_reports",
+    "compact_history",
+)
+
+logger = logging.getLogger(__name__)
+
+
+_proxy_urls = settings.proxy_urls or ([settings.proxy_url] if settings.proxy_url else [])
+
+proxy_pool: Optional[ProxyPool] = (
+    ProxyPool(
+        _proxy_urls,
+        max_failures=settings.proxy_max_failures,
+        ejection_duration=settings.proxy_ejection_duration,
+    )
+    if _proxy_urls
+    else None
+)
+
+user_agents = UserAgentPool()
+
+browser_pool: Optional[BrowserPool] = (
+    BrowserPool(
+        size=settings.browser_pool_size,
+        max_uses=settings.browser_max_uses,
+        max_memory_mb=settings.browser_max_memory_mb,
+        device_scale_factor=settings.screenshot_scale,
+        proxy_pool=proxy_pool,
+    )
+    if settings.browser_pool_size > 0
+    else None
+)
+
+http_client: Optional[httpx.AsyncClient | dict[str, httpx.AsyncClient]] = None
+if settings.http_backend and proxy_pool is not None:
+    http_client = {url: create_http_client(proxy=url, max_connections=settings.http_max_connections) for url in proxy_pool.urls}
+elif settings.http_backend:
+    http_client = create_http_client(max_connections=settings.http_max_connections)
+
+tracking_cache = TrackingCache(
+    ttl=settings.cache_ttl,
+    negative_ttl=settings.cache_negative_ttl,
+    max_bytes=int(settings.cache_max_mb * 1024 * 1024),
+    screenshot_ttl=settings.cache_screenshot_ttl,
+)
+
+tracking_scheduler = TrackingScheduler(
+    max_workers=settings.max_concurrent_trackings,
+    max_queue_size=settings.tracking_queue_size,
+    per_user_limit=settings.max_concurrent_trackings_per_user,
+    max_pending_per_user=settings.max_pending_trackings_per_user,
+    user_limits={WATCH_USER_ID: settings.watch_concurrency},
+)
+QUEUE_DEPTH.set_function(lambda: tracking_scheduler.queued)
+TRACKINGS_IN_FLIGHT.set_function(lambda: tracking_cache.fetching)
+
+watch_store = WatchStore(settings.database_path)
+
+history_store = HistoryStore(settings.database_path)
+
+file_id_store = FileIdStore(settings.database_path, max_entries=settings.file_id_cache_size)
+
+
+def _cache_screenshot(tracking_number: str, screenshot: bytes) -> None:
+    tracking_cache.set(tracking_number, "image", screenshot)
+
+
+def _create_parcel_tracker(on_screenshot: Optional[Callable[[str, bytes], None]] = None) -> ParcelTracker:
+    return ParcelTracker(
+        normalizer=normalize_text,
+        proxy_pool=proxy_pool,
+        browser_pool=browser_pool,
+        user_agents=user_agents,
+        http_client=http_client,
+        base_url=settings.tracking_base_url,
+        text_resources=ResourcePolicy.create(settings.text_resource_types) if settings.block_resources else None,
+        image_resources=(
+            ResourcePolicy.create(settings.screenshot_resource_types, settings.screenshot_allowed_hosts)
+            if settings.block_resources
+            else None
+        ),
+        screenshot_options=ScreenshotOptions(
+            width=settings.screenshot_width,
+            device_scale_factor=settings.screenshot_scale,
+            format=settings.screenshot_format,
+            quality=settings.screenshot_quality,
+            colors=settings.screenshot_colors,
+            max_bytes=settings.screenshot_max_kb * 1024 if settings.screenshot_max_kb else None,
+        ),
+        on_screenshot=on_screenshot,
+    )
+
+
+async def _close_http_client() -> None:
+    if isinstance(http_client, httpx.AsyncClient):
+        await http_client.aclose()
+    elif http_client is not None:
+        for client in http_client.values():
+            await client.aclose()
+
+
+@asynccontextmanager
+async def serve_tracker() -> AsyncGenerator[Tracker, None]:
+    """
+    Run the browser pool and HTTP client of a tracking worker process and yield its parcel tracker.
+    """
+    if browser_pool is not None:
+        await browser_pool.start(wait=False)
+    await asyncio.to_thread(user_agents.load)
+    try:
+        yield _create_parcel_tracker()
+    finally:
+        if browser_pool is not None:
+            await browser_pool.stop()
+        await _close_http_client()
+
+
+tracking_workers: Optional[TrackingWorkerPool] = (
+    TrackingWorkerPool(
+        serve_tracker,
+        processes=settings.tracking_workers,
+        max_jobs=settings.worker_max_jobs,
+        max_memory_mb=settings.worker_max_memory_mb,
+    )
+    if settings.tracking_workers > 0
+    else None
+)
+
+
+tracking_breaker = CircuitBreaker(
+    window=settings.breaker_window,
+    min_calls=settings.breaker_min_calls,
+    failure_rate=settings.breaker_failure_rate,
+    open_duration=settings.breaker_open_duration,
+    timeout_factor=settings.tracking_timeout_factor,
+    min_timeout=settings.tracking_min_timeout,
+)
+
+
+metrics_server: Optional[MetricsServer] = (
+    MetricsServer(settings.metrics_port, address=settings.metrics_address) if settings.metrics_port else None
+)
+
+error_reporter: Optional[ErrorReporter] = (
+    ErrorReporter(summary_interval=settings.error_summary_interval, max_queue_size=settings.error_queue_size)
+    if settings.developer_chat_id
+    else None
+)
+
+
+def create_tracker() -> Tracker:
+    """
+    Create a parcel tracker backed by the shared browser pool and HTTP client, or by the tracking worker
+    processes if they are enabled, guarded by the circuit breaker of the tracking website. The tracking records
+    it returns are appended to the tracking history store, and the screenshots taken along text lookups made with
+    the browser are cached for the image lookups that follow them, if `CACHE_TEXT_SCREENSHOTS` is enabled.
+    """
+    on_screenshot = _cache_screenshot if settings.cache_text_screenshots else None
+    tracker = tracking_workers if tracking_workers is not None else _create_parcel_tracker(on_screenshot=on_screenshot)
+    return HistoryTracker(CircuitBreakerTracker(tracker, tracking_breaker), history_store)
+
+
+async def start_services(application: "Application[Any, Any, Any, Any, Any, Any]") -> None:
+    """
+    Start the long-lived services shared by the handlers. Runs once after the application is initialized.
+    """
+    if metrics_server is not None:
+        metrics_server.start()
+    if error_reporter is not None:
+
+        async def send_to_developer(text: str) -> None:
+            await application.bot.send_message(chat_id=settings.developer_chat_id, text=text, parse_mode="HTML")
+
+        error_reporter.start(send_to_developer)
+    # The browsers are launched in the background, so that the bot starts handling updates right away
+    if tracking_workers is not None:
+        await tracking_workers.start()
+    else:
+        if browser_pool is not None:
+            await browser_pool.start(wait=False)
+        await asyncio.to_thread(user_agents.load)
+
+
+async def stop_services(application: "Application[Any, Any, Any, Any, Any, Any]") -> None:
+    """
+    Stop the long-lived services shared by the handlers. Runs once after the application is shut down.
+    """
+    if tracking_workers is not None:
+        await tracking_workers.stop()
+    if browser_pool is not None:
+        await browser_pool.stop()
+    await _close_http_client()
+    watch_store.close()
+    history_store.close()
+    file_id_store.close()
+    if metrics_server is not None:
+        metrics_server.stop()
+
+
+async def flush_error_reports(application: "Application[Any, Any, Any, Any, Any, Any]") -> None:
+    """
+    Send the summary of the errors not reported yet. Runs once after the application is stopped, while the bot
+    can still send messages.
+    """
+    if error_reporter is not None:
+        await error_reporter.stop()
+
+
+async def compact_history(context: "CallbackContext[Any, Any, Any, Any]") -> None:
+    """
+    Job that removes the tracking histories of the parcels not tracked for longer than the retention period, and of
+    the least recently tracked parcels beyond the maximum number of parcels. The histories of the watched parcels are
+    kept, as they're needed to tell the new events of the parcels apart.
+    """
+
+    def compact() -> int:
+        return history_store.compact(settings.history_retention, settings.history_max_parcels, keep=watch_store.watched())
+
+    removed = await asyncio.to_thread(compact)
+    if removed:
+        logger.info(f"Removed the tracking history of {removed} parcels")
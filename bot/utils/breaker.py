@@ -0,0 +1,196 @@
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Awaitable, Callable, Literal, Optional, TypeVar
+
+from bot.models import TrackingRecord, TrackingSnapshot
+
+from .exceptions import ServiceUnavailableError, TrackingError
+from .tracking import Tracker
+
+__all__ = ("CircuitBreaker", "CircuitBreakerTracker")
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CircuitState = Literal["closed", "open", "half_open"]
+
+
+class CircuitBreaker:
+    """
+    A circuit breaker for calls to an upstream service. It opens when the rate of failed calls in a rolling
+    time window exceeds a threshold, failing calls fast while open. After a cool-down, it lets a few trial
+    calls through (half-open) and closes again once one of them succeeds.
+
+    It also adapts the timeout of the calls to the observed latency of the service: the timeout is a multiple
+    of the 95th percentile of the latency of recent successful calls, within bounds.
+
+    Args:
+        window (float): Length of the rolling window of call outcomes, in seconds. Defaults to 60.
+        min_calls (int): Minimum number of calls in the window before the circuit can open. Defaults to 10.
+        failure_rate (float): Rate of failed calls in the window above which the circuit opens. Defaults to 0.5.
+        open_duration (float): Time the circuit stays open before trial calls are let through, in seconds. Defaults to 30.
+        half_open_calls (int): Maximum number of trial calls running at once while half-open. Defaults to 1.
+        timeout_factor (float): Multiple of the 95th percentile latency used as timeout. Defaults to 2.
+        min_timeout (float): Lower bound of the adaptive timeout, in seconds. Defaults to 5.
+        latency_samples (int): Number of recent latencies the percentile is computed over. Defaults to 200.
+    """
+
+    def __init__(
+        self,
+        window: float = 60,
+        min_calls: int = 10,
+        failure_rate: float = 0.5,
+        open_duration: float = 30,
+        half_open_calls: int = 1,
+        timeout_factor: float = 2,
+        min_timeout: float = 5,
+        latency_samples: int = 200,
+    ) -> None:
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.open_duration = open_duration
+        self.half_open_calls = half_open_calls
+        self.timeout_factor = timeout_factor
+        self.min_timeout = min_timeout
+        self.latency_samples = latency_samples
+        self._state: CircuitState = "closed"
+        self._opened_at = 0.0
+        self._trials = 0
+        self._outcomes: deque[tuple[float, bool]] = deque()
+        self._latencies: dict[str, deque[float]] = {}
+
+    @property
+    def state(self) -> CircuitState:
+        if self._state == "open" and time.monotonic() - self._opened_at >= self.open_duration:
+            return "half_open"
+        return self._state
+
+    def p95(self, operation: str) -> Optional[float]:
+        """95th percentile latency of recent successful calls of an operation, in seconds."""
+        latencies = self._latencies.get(operation)
+        if not latencies or len(latencies) < self.min_calls:
+            return None
+        ordered = sorted(latencies)
+        return ordered[math.ceil(0.95 * len(ordered)) - 1]
+
+    def timeout(self, operation: str, max_timeout: Optional[float]) -> Optional[float]:
+        """The adaptive timeout of an operation, at most `max_timeout` seconds."""
+        if (p95 := self.p95(operation)) is None:
+            return max_timeout
+        timeout = max(p95 * self.timeout_factor, self.min_timeout)
+        return min(timeout, max_timeout) if max_timeout else timeout
+
+    def _prune(self, now: float) -> None:
+        while self._outcomes and self._outcomes[0][0] < now - self.window:
+            self._outcomes.popleft()
+
+    def _open(self, now: float) -> None:
+        if self._state != "open":
+            logger.warning("Circuit breaker opened, the tracking service is failing")
+        self._state = "open"
+        self._opened_at = now
+
+    def _close(self) -> None:
+        logger.info("Circuit breaker closed, the tracking service recovered")
+        self._state = "closed"
+        self._outcomes.clear()
+
+    def _record(self, operation: str, failed: bool, latency: float, trial: bool) -> None:
+        now = time.monotonic()
+        if not failed:
+            self._latencies.setdefault(operation, deque(maxlen=self.latency_samples)).append(latency)
+
+        if trial:
+            if failed:
+                self._open(now)
+            else:
+                self._close()
+            return
+        if self._state != "closed":
+            return
+
+        self._outcomes.append((now, failed))
+        self._prune(now)
+        failures = sum(failed for _, failed in self._outcomes)
+        if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) > self.failure_rate:
+            self._open(now)
+
+    async def call(self, operation: str, func: Callable[[Optional[float]], Awaitable[T]], max_timeout: Optional[float]) -> T:
+        """Call the upstream service through the breaker.
+
+        Args:
+            operation (str): Name of the operation, used to keep the latencies of different calls apart.
+            func (Callable[[Optional[float]], Awaitable[T]]): A function calling the service with the given timeout.
+            max_timeout (Optional[float]): Upper bound of the timeout, in seconds.
+
+        Returns:
+            T: The result of the call.
+
+        Raises:
+            ServiceUnavailableError: Raised when the circuit is open.
+        """
+        state = self.state
+        if state == "open" or (state == "half_open" and self._trials >= self.half_open_calls):
+            raise ServiceUnavailableError("سامانه رهگیری پست در حال حاضر در دسترس نیست. لطفا دقایقی دیگر مجددا تلاش کنید.")
+
+        trial = state == "half_open"
+        if trial:
+            self._trials += 1
+        started_at = time.monotonic()
+        try:
+            result = await func(self.timeout(operation, max_timeout))
+        except TrackingError:
+            # The service answered, just not with tracking details
+            self._record(operation, failed=False, latency=time.monotonic() - started_at, trial=trial)
+            raise
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self._record(operation, failed=True, latency=time.monotonic() - started_at, trial=trial)
+            raise
+        else:
+            self._record(operation, failed=False, latency=time.monotonic() - started_at, trial=trial)
+            return result
+        finally:
+            if trial:
+                self._trials -= 1
+
+    def __repr__(self) -> str:
+        return (
+            f"CircuitBreaker<(window={self.window}, min_calls={self.min_calls}, failure_rate={self.failure_rate}, "
+            f"open_duration={self.open_duration}, half_open_calls={self.half_open_calls})>"
+        )
+
+
+class CircuitBreakerTracker:
+    """
+    A parcel tracker calling another tracker through a circuit breaker. The timeout passed to its methods is
+    the upper bound of the adaptive timeout.
+
+    Args:
+        tracker (Tracker): The tracker to call.
+        breaker (CircuitBreaker): The circuit breaker of the tracking service.
+    """
+
+    def __init__(self, tracker: Tracker, breaker: CircuitBreaker) -> None:
+        self.tracker = tracker
+        self.breaker = breaker
+
+    async def track_as_text(self, tracking_number: str, timeout: Optional[float] = None) -> list[TrackingRecord]:
+        return await self.breaker.call("text", lambda timeout: self.tracker.track_as_text(tracking_number, timeout), timeout)
+
+    async def track_as_image(self, tracking_number: str, timeout: Optional[float] = None) -> bytes:
+        return await self.breaker.call("image", lambda timeout: self.tracker.track_as_image(tracking_number, timeout), timeout)
+
+    async def track_as_text_and_image(self, tracking_number: str, timeout: Optional[float] = None) -> TrackingSnapshot:
+        return await self.breaker.call(
+            "both", lambda timeout: self.tracker.track_as_text_and_image(tracking_number, timeout), timeout
+        )
+
+    def __repr__(self) -> str:
+        return f"CircuitBreakerTracker<(tracker={self.tracker}, breaker={self.breaker})>"
@@ -0,0 +1,244 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager, suppress
+from typing import TYPE_CHECKING, AsyncGenerator, Optional
+
+from .proxies import ProxyPool
+
+if TYPE_CHECKING:
+    from playwright.async_api import (
+        Browser,
+        BrowserContext,
+        Page,
+        Playwright,
+        ProxySettings,
+    )
+
+__all__ = ("BrowserPool",)
+
+logger = logging.getLogger(__name__)
+
+LAUNCH_ARGS = ["--no-sandbox", "--disable-setuid-sandbox"]
+
+
+def _read_rss_mb(pid: int) -> float:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+class _PooledBrowser:
+    def __init__(self) -> None:
+        self.browser: Optional["Browser"] = None
+        self.context: Optional["BrowserContext"] = None
+        self.proxy: Optional[str] = None
+        self.uses = 0
+
+
+class BrowserPool:
+    """
+    A pool of long-lived headless Chromium browsers shared by all tracking requests. Each lease gets exclusive
+    access to one warm browser and a fresh page in a reusable browser context. Browsers are health-checked
+    on checkout and relaunched after a number of uses or when their memory usage exceeds a ceiling.
+
+    With a proxy pool, each browser sticks to the proxy of its warm context until the proxy is ejected from the
+    pool, and the outcome of every lease is recorded in the pool.
+
+    Args:
+        size (int): Number of warm browsers kept in the pool. Defaults to 2.
+        max_uses (Optional[int]): Number of leases after which a browser is relaunched. Defaults to 100.
+        max_memory_mb (Optional[float]): Resident memory ceiling of a browser and its child processes, in megabytes,
+            above which the browser is relaunched. Defaults to None.
+        device_scale_factor (float): Device scale factor of the browser contexts, i.e. the number of screenshot
+            pixels per CSS pixel. Defaults to 1.
+        proxy_pool (Optional[ProxyPool]): A pool of proxies to open the pages through, unless a lease asks for a
+            specific proxy. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        max_uses: Optional[int] = 100,
+        max_memory_mb: Optional[float] = None,
+        device_scale_factor: float = 1,
+        proxy_pool: Optional[ProxyPool] = None,
+    ) -> None:
+        if size < 1:
+            raise ValueError("Browser pool size must be at least 1.")
+        self.size = size
+        self.max_uses = max_uses
+        self.max_memory_mb = max_memory_mb
+        self.device_scale_factor = device_scale_factor
+        self.proxy_pool = proxy_pool
+        self._playwright: Optional["Playwright"] = None
+        self._slots = [_PooledBrowser() for _ in range(size)]
+        self._idle: asyncio.Queue[_PooledBrowser] = asyncio.Queue()
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    @property
+    def started(self) -> bool:
+        return self._playwright is not None
+
+    async def _launch_idle(self, slot: _PooledBrowser) -> None:
+        try:
+            await self._launch(slot)
+        except Exception as e:
+            logger.warning(f"Failed to launch browser, retrying on first checkout: {e}")
+        finally:
+            self._idle.put_nowait(slot)
+
+    async def start(self, wait: bool = True) -> None:
+        """Start the Playwright driver and launch the warm browsers, all at once.
+
+        Args:
+            wait (bool): Whether to wait for the browsers to be launched. If False, they are launched in the
+                background, and leases wait for the first browser to be up. Defaults to True.
+        """
+        if self._playwright is not None:
+            return
+        from playwright.async_api import async_playwright
+
+        self._playwright = await async_playwright().start()
+        if wait:
+            await asyncio.gather(*(self._launch_idle(slot) for slot in self._slots))
+            logger.info(f"Browser pool started with {sum(slot.browser is not None for slot in self._slots)} browsers")
+            return
+        for slot in self._slots:
+            task = asyncio.create_task(self._launch_idle(slot))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        logger.info(f"Browser pool started, launching {self.size} browsers in the background")
+
+    async def stop(self) -> None:
+        """Close all browsers and stop the Playwright driver."""
+        if self._playwright is None:
+            return
+        for task in list(self._tasks):
+            task.cancel()
+        for slot in self._slots:
+            await self._close(slot)
+        await self._playwright.stop()
+        self._playwright = None
+        self._idle = asyncio.Queue()
+        logger.info("Browser pool stopped")
+
+    async def _launch(self, slot: _PooledBrowser) -> "Browser":
+        if self._playwright is None:
+            raise RuntimeError("Browser pool is not started.")
+        slot.browser = await self._playwright.chromium.launch(args=LAUNCH_ARGS, headless=True)
+        slot.uses = 0
+        return slot.browser
+
+    async def _close(self, slot: _PooledBrowser) -> None:
+        browser, slot.browser = slot.browser, None
+        slot.context, slot.proxy = None, None
+        if browser is not None:
+            with suppress(Exception):
+                await browser.close()
+
+    async def _recycle(self, slot: _PooledBrowser) -> None:
+        await self._close(slot)
+        try:
+            await self._launch(slot)
+        except Exception as e:
+            logger.warning(f"Failed to relaunch browser, retrying on next checkout: {e}")
+        finally:
+            self._idle.put_nowait(slot)
+
+    async def _memory_mb(self, browser: "Browser") -> float:
+        session = await browser.new_browser_cdp_session()
+        try:
+            info = await session.send("SystemInfo.getProcessInfo")
+        finally:
+            await session.detach()
+        return sum(_read_rss_mb(process["id"]) for process in info.get("processInfo", []))
+
+    async def _needs_recycling(self, slot: _PooledBrowser) -> bool:
+        if slot.browser is None or not slot.browser.is_connected():
+            return True
+        if self.max_uses and slot.uses >= self.max_uses:
+            return True
+        if self.max_memory_mb:
+            with suppress(Exception):
+                return await self._memory_mb(slot.browser) > self.max_memory_mb
+        return False
+
+    async def _get_context(
+        self, slot: _PooledBrowser, key: Optional[str], proxy: Optional["ProxySettings"], user_agent: Optional[str]
+    ) -> "BrowserContext":
+        if slot.browser is None or not slot.browser.is_connected():
+            await self._close(slot)
+            await self._launch(slot)
+        assert slot.browser is not None
+
+        # A browser keeps a single warm context, replaced when it's leased through another proxy
+        if slot.context is not None and slot.proxy == key:
+            await slot.context.clear_cookies()
+            return slot.context
+        if slot.context is not None:
+            with suppress(Exception):
+                await slot.context.close()
+        slot.context = await slot.browser.new_context(
+            user_agent=user_agent, proxy=proxy, device_scale_factor=self.device_scale_factor
+        )
+        slot.proxy = key
+        return slot.context
+
+    @asynccontextmanager
+    async def _page(
+        self, slot: _PooledBrowser, key: Optional[str], proxy: Optional["ProxySettings"], user_agent: Optional[str]
+    ) -> AsyncGenerator["Page", None]:
+        context = await self._get_context(slot, key, proxy, user_agent)
+        page = await context.new_page()
+        try:
+            yield page
+        finally:
+            with suppress(Exception):
+                await page.close()
+
+    @asynccontextmanager
+    async def page(
+        self, proxy: Optional["ProxySettings"] = None, user_agent: Optional[str] = None
+    ) -> AsyncGenerator["Page", None]:
+        """Lease a fresh page from a warm browser.
+
+        Args:
+            proxy (Optional[ProxySettings]): Proxy settings of the browser context to open the page in. If not
+                provided, a proxy of the proxy pool is used, if any. Defaults to None.
+            user_agent (Optional[str]): User agent to use when a new browser context has to be created. Defaults to None.
+
+        Yields:
+            Page: A new page, closed when the lease ends.
+        """
+        if self._playwright is None:
+            raise RuntimeError("Browser pool is not started.")
+
+        slot = await self._idle.get()
+        try:
+            if proxy is None and self.proxy_pool is not None:
+                with self.proxy_pool.use(sticky=slot.proxy) as url:
+                    async with self._page(slot, url, self.proxy_pool.browser_proxy(url), user_agent) as page:
+                        yield page
+            else:
+                key = f"{proxy.get('username')}@{proxy['server']}" if proxy else None
+                async with self._page(slot, key, proxy, user_agent) as page:
+                    yield page
+        finally:
+            slot.uses += 1
+            if await self._needs_recycling(slot):
+                task = asyncio.create_task(self._recycle(slot))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            else:
+                self._idle.put_nowait(slot)
+
+    def __repr__(self) -> str:
+        return (
+            f"BrowserPool<(size={self.size}, max_uses={self.max_uses}, max_memory_mb={self.max_memory_mb}, "
+            f"device_scale_factor={self.device_scale_factor}, proxy_pool={self.proxy_pool})>"
+        )
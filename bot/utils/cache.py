@@ -0,0 +1,278 @@
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import suppress
+from typing import Awaitable, Callable, NamedTuple, Optional
+
+from bot.models import TrackingRecord, TrackingSnapshot
+
+from .exceptions import TrackingError
+from .metrics import CACHE_LOOKUPS
+
+__all__ = ("TrackingResult", "TrackingCache")
+
+TrackingResult = list[TrackingRecord] | bytes | TrackingSnapshot
+CacheKey = tuple[str, str]
+
+TEXT = "text"
+IMAGE = "image"
+TEXT_AND_IMAGE = "both"
+
+
+class _CacheEntry(NamedTuple):
+    value: TrackingResult | TrackingError
+    size: int
+    expires_at: float
+
+
+def _result_size(value: TrackingResult | TrackingError) -> int:
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, TrackingError):
+        return len(str(value).encode())
+    if isinstance(value, TrackingSnapshot):
+        return _result_size(value.records) + len(value.screenshot)
+    return sum(len(record.model_dump_json().encode()) for record in value)
+
+
+def _copy_result(value: TrackingResult) -> TrackingResult:
+    # The lists of records are shared by the cache and the callers, which get their own list to sort or filter
+    if isinstance(value, list):
+        return list(value)
+    if isinstance(value, TrackingSnapshot):
+        return value._replace(records=list(value.records))
+    return value
+
+
+class _FetchInFlight(Exception):
+    """Raised by a queued lookup when another caller started fetching the result while it was waiting."""
+
+
+class TrackingCache:
+    """
+    An in-memory cache of tracking results keyed by tracking number and output type. Entries expire after a TTL
+    and the least recently used ones are evicted once the total size of the cached results exceeds a bound.
+    Tracking errors are cached with their own, usually shorter, TTL. Concurrent lookups of the same key share
+    a single in-flight fetch. The lists of records are copied in and out of the cache, the records themselves
+    aren't.
+
+    The results of the "both" output type are stored as a "text" and an "image" result, so that a lookup of
+    either output type after it, or while it's in flight, doesn't fetch the result again.
+
+    Args:
+        ttl (float): Time to live of cached results, in seconds. Defaults to 60.
+        negative_ttl (float): Time to live of cached tracking errors, in seconds. Defaults to 10.
+        max_bytes (int): Maximum total size of the cached results, in bytes. Defaults to 64 MiB.
+        screenshot_ttl (Optional[float]): Time to live of cached screenshots, in seconds. If None, `ttl` is used.
+            Defaults to None.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 60,
+        negative_ttl: float = 10,
+        max_bytes: int = 64 * 1024 * 1024,
+        screenshot_ttl: Optional[float] = None,
+    ) -> None:
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_bytes = max_bytes
+        self.screenshot_ttl = screenshot_ttl
+        self._entries: OrderedDict[CacheKey, _CacheEntry] = OrderedDict()
+        self._size = 0
+        self._inflight: dict[CacheKey, asyncio.Task[TrackingResult]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        """Total size of the cached results, in bytes."""
+        return self._size
+
+    @property
+    def fetching(self) -> int:
+        """Number of results being fetched. Lookups joining a fetch in flight aren't counted."""
+        return len(self._inflight)
+
+    def _pop(self, key: CacheKey) -> None:
+        if entry := self._entries.pop(key, None):
+            self._size -= entry.size
+
+    def _lookup(self, key: CacheKey) -> Optional[_CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._pop(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(self, tracking_number: str, output_type: str) -> Optional[TrackingResult]:
+        """Get a cached tracking result.
+
+        Args:
+            tracking_number (str): The tracking number of the parcel.
+            output_type (str): The output type of the tracking result.
+
+        Returns:
+            Optional[TrackingResult]: The cached result, or None if there is no fresh entry for the key.
+
+        Raises:
+            TrackingError: Raised when a tracking error is cached for the key.
+        """
+        entry = self._lookup((tracking_number, output_type))
+        if entry is None and output_type == TEXT_AND_IMAGE:
+            records, screenshot = self._lookup((tracking_number, TEXT)), self._lookup((tracking_number, IMAGE))
+            if records is None or screenshot is None:
+                return None
+            if isinstance(records.value, list) and isinstance(screenshot.value, bytes):
+                return TrackingSnapshot(list(records.value), screenshot.value)
+            # A tracking error is cached for one of them
+            entry = records if isinstance(records.value, TrackingError) else screenshot
+        if entry is None:
+            return None
+        if isinstance(entry.value, TrackingError):
+            raise entry.value
+        return _copy_result(entry.value)
+
+    def set(self, tracking_number: str, output_type: str, value: TrackingResult | TrackingError) -> None:
+        """Store a tracking result or a tracking error in the cache.
+
+        Args:
+            tracking_number (str): The tracking number of the parcel.
+            output_type (str): The output type of the tracking result.
+            value (TrackingResult | TrackingError): The tracking result, or the error raised by the tracking service.
+        """
+        if isinstance(value, TrackingSnapshot):
+            self.set(tracking_number, TEXT, value.records)
+            self.set(tracking_number, IMAGE, value.screenshot)
+            return
+
+        key = (tracking_number, output_type)
+        self._pop(key)
+        if not isinstance(value, TrackingError):
+            value = _copy_result(value)
+
+        if isinstance(value, TrackingError):
+            ttl = self.negative_ttl
+        elif isinstance(value, bytes) and self.screenshot_ttl is not None:
+            ttl = self.screenshot_ttl
+        else:
+            ttl = self.ttl
+        size = _result_size(value)
+        if ttl <= 0 or size > self.max_bytes:
+            return
+
+        self._entries[key] = _CacheEntry(value=value, size=size, expires_at=time.monotonic() + ttl)
+        self._size += size
+        while self._size > self.max_bytes:
+            self._pop(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        """Remove all cached results."""
+        self._entries.clear()
+        self._size = 0
+
+    def _store(self, key: CacheKey, task: "asyncio.Task[TrackingResult]") -> None:
+        self._inflight.pop(key, None)
+        if task.cancelled():
+            return
+        if (exc := task.exception()) is None:
+            self.set(*key, task.result())
+        elif isinstance(exc, TrackingError):
+            self.set(*key, exc)
+
+    def _cached(self, tracking_number: str, output_type: str) -> Optional[TrackingResult]:
+        try:
+            result = self.get(tracking_number, output_type)
+        except TrackingError:
+            CACHE_LOOKUPS.labels("hit").inc()
+            raise
+        if result is not None:
+            CACHE_LOOKUPS.labels("hit").inc()
+        return result
+
+    async def get_or_track(
+        self,
+        tracking_number: str,
+        output_type: str,
+        fetch: Callable[[], Awaitable[TrackingResult]],
+        queue: Optional[Callable[[Callable[[], Awaitable[TrackingResult]]], Awaitable[TrackingResult]]] = None,
+    ) -> TrackingResult:
+        """Get a cached tracking result, fetching and caching it on a miss.
+
+        Concurrent calls for the same key wait for the same fetch. The fetch keeps running if the caller
+        that started it is cancelled, so that the other callers still get its result.
+
+        Args:
+            tracking_number (str): The tracking number of the parcel.
+            output_type (str): The output type of the tracking result.
+            fetch (Callable[[], Awaitable[TrackingResult]]): A function that fetches the tracking result.
+            queue (Optional[Callable[[Callable[[], Awaitable[TrackingResult]]], Awaitable[TrackingResult]]]): A function
+                running the fetch, e.g. in the tracking queue of the caller's user, so that every caller starting a
+                fetch is admitted, and reports its position in the queue, on its own. The callers waiting for a fetch
+                in flight don't go through it. Defaults to None.
+
+        Returns:
+            TrackingResult: The tracking result.
+
+        Raises:
+            TrackingError: Raised when the tracking service returns an error, or when such an error is cached for the key.
+        """
+        if queue is None:
+            return await self._get_or_fetch(tracking_number, output_type, fetch)
+        result = self._cached(tracking_number, output_type)
+        if result is not None:
+            return result
+
+        async def lookup() -> TrackingResult:
+            if self._inflight_task(tracking_number, output_type) is not None:
+                raise _FetchInFlight
+            return await self._get_or_fetch(tracking_number, output_type, fetch)
+
+        if self._inflight_task(tracking_number, output_type) is None:
+            with suppress(_FetchInFlight):
+                return await queue(lookup)
+        # Waiting for the fetch of another caller doesn't take a worker of the queue
+        return await self._get_or_fetch(tracking_number, output_type, fetch)
+
+    def _inflight_task(self, tracking_number: str, output_type: str) -> Optional["asyncio.Task[TrackingResult]"]:
+        task = self._inflight.get((tracking_number, output_type))
+        if task is None and output_type in (TEXT, IMAGE):
+            task = self._inflight.get((tracking_number, TEXT_AND_IMAGE))
+        return task
+
+    async def _get_or_fetch(
+        self, tracking_number: str, output_type: str, fetch: Callable[[], Awaitable[TrackingResult]]
+    ) -> TrackingResult:
+        result = self._cached(tracking_number, output_type)
+        if result is not None:
+            return result
+
+        key = (tracking_number, output_type)
+        task = self._inflight.get(key)
+        if task is None and output_type in (TEXT, IMAGE) and (both := self._inflight.get((tracking_number, TEXT_AND_IMAGE))):
+            CACHE_LOOKUPS.labels("shared").inc()
+            snapshot = await asyncio.shield(both)
+            if isinstance(snapshot, TrackingSnapshot):
+                return list(snapshot.records) if output_type == TEXT else snapshot.screenshot
+
+        CACHE_LOOKUPS.labels("miss" if task is None else "shared").inc()
+        if task is None:
+
+            async def run() -> TrackingResult:
+                return await fetch()
+
+            task = asyncio.create_task(run())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._store(key, t))
+
+        return _copy_result(await asyncio.shield(task))
+
+    def __repr__(self) -> str:
+        return (
+            f"TrackingCache<(ttl={self.ttl}, negative_ttl={self.negative_ttl}, max_bytes={self.max_bytes}, "
+            f"screenshot_ttl={self.screenshot_ttl})>"
+        )
@@ -4,3 +4,35 @@ class TrackingError(Exception):
     """
 
     pass
+
+
+class ServiceUnavailableError(TrackingError):
+    """
+    Exception raised when the tracking service is known to be unavailable, without calling it.
+    """
+
+    pass
+
+
+class QueueFullError(Exception):
+    """
+    Exception raised when the tracking queue can't accept more requests.
+    """
+
+    pass
+
+
+class UserQueueFullError(QueueFullError):
+    """
+    Exception raised when a user has too many tracking requests running or waiting in the queue.
+    """
+
+    pass
+
+
+class WorkerCrashedError(Exception):
+    """
+    Exception raised when a tracking worker process exits while running a job.
+    """
+
+    pass
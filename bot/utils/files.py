@@ -0,0 +1,65 @@
+import hashlib
+import time
+from typing import Optional
+
+from .sqlite import SQLiteStore
+
+__all__ = ("content_hash", "FileIdStore")
+
+
+def content_hash(data: bytes) -> str:
+    """Get the SHA-256 hex digest of a file content."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class FileIdStore(SQLiteStore):
+    """
+    A bounded SQLite store mapping the content hash of files uploaded to Telegram (or another key of their content,
+    such as the tracking state a screenshot shows) to their `file_id`, so that identical files can be sent again
+    without re-uploading them. The least recently used entries are evicted
+    once the store holds more than `max_entries` files.
+
+    Args:
+        path (str): Path to the SQLite database file.
+        max_entries (int): Maximum number of stored file IDs. Defaults to 10000.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS file_ids (
+            content_hash TEXT PRIMARY KEY,
+            file_id TEXT NOT NULL,
+            used_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS file_ids_used_at ON file_ids (used_at);
+    """
+
+    def __init__(self, path: str, max_entries: int = 10000) -> None:
+        super().__init__(path)
+        self.max_entries = max_entries
+
+    def get(self, content_hash: str) -> Optional[str]:
+        """Get the file ID of an uploaded file by its content hash, or None if it's unknown."""
+        with self._lock, self.connection as connection:
+            row = connection.execute("SELECT file_id FROM file_ids WHERE content_hash = ?", (content_hash,)).fetchone()
+            if row is None:
+                return None
+            connection.execute("UPDATE file_ids SET used_at = ? WHERE content_hash = ?", (time.time(), content_hash))
+        return str(row[0])
+
+    def set(self, content_hash: str, file_id: str) -> None:
+        """Store the file ID of an uploaded file, evicting the least recently used entries beyond the bound."""
+        with self._lock, self.connection as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO file_ids (content_hash, file_id, used_at) VALUES (?, ?, ?)",
+                (content_hash, file_id, time.time()),
+            )
+            connection.execute(
+                "DELETE FROM file_ids WHERE content_hash IN "
+                "(SELECT content_hash FROM file_ids ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def delete(self, content_hash: str) -> None:
+        """Forget the file ID of a file, e.g. when Telegram doesn't accept it anymore."""
+        with self._lock, self.connection as connection:
+            connection.execute("DELETE FROM file_ids WHERE content_hash = ?", (content_hash,))
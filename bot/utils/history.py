@@ -0,0 +1,188 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Collection, NamedTuple, Optional, Sequence
+
+from bot.models import TrackingEvent, TrackingRecord, TrackingSnapshot
+
+from .sqlite import SQLiteStore
+from .tracking import Tracker
+
+__all__ = ("HistoryEvent", "HistoryStore", "HistoryTracker")
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryEvent(NamedTuple):
+    event: TrackingEvent
+    first_seen_at: float
+
+
+class HistoryStore(SQLiteStore):
+    """
+    A SQLite store of the tracking history of parcels. The events of a parcel are appended as they're first seen,
+    along with the time they were first seen at, so that the events seen since a given time can be queried without
+    comparing whole histories. An event whose details changed on the tracking website is stored as a new event.
+
+    The histories of the parcels not tracked for a while are removed by `compact`. The pages freed by the removed
+    events are reused by the new ones, so the database file stops growing once the store is bounded.
+
+    Args:
+        path (str): Path to the SQLite database file.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tracked_parcels (
+            tracking_number TEXT PRIMARY KEY,
+            last_seen_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS tracked_parcels_last_seen_at ON tracked_parcels (last_seen_at);
+        CREATE TABLE IF NOT EXISTS tracking_events (
+            tracking_number TEXT NOT NULL,
+            event_id INTEGER NOT NULL,
+            date TEXT,
+            time TEXT NOT NULL,
+            description TEXT NOT NULL,
+            location TEXT,
+            first_seen_at REAL NOT NULL,
+            PRIMARY KEY (tracking_number, event_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS tracking_events_first_seen_at ON tracking_events (first_seen_at);
+    """
+
+    def append(
+        self, tracking_number: str, events: Sequence[TrackingEvent], seen_at: Optional[float] = None
+    ) -> list[TrackingEvent]:
+        """
+        Store the events of a parcel not seen before.
+
+        Args:
+            tracking_number (str): The tracking number of the parcel.
+            events (Sequence[TrackingEvent]): The current tracking history of the parcel.
+            seen_at (Optional[float]): The time the events were seen at. Defaults to now.
+
+        Returns:
+            list[TrackingEvent]: The events not seen before.
+        """
+        seen_at = time.time() if seen_at is None else seen_at
+        with self._lock, self.connection as connection:
+            known = {
+                event_id: details
+                for event_id, *details in connection.execute(
+                    "SELECT event_id, date, time, description, location FROM tracking_events WHERE tracking_number = ?",
+                    (tracking_number,),
+                )
+            }
+            new_events = [
+                event for event in events if known.get(event.id) != [event.date, event.time, event.description, event.location]
+            ]
+            if new_events:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO tracking_events "
+                    "(tracking_number, event_id, date, time, description, location, first_seen_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (tracking_number, event.id, event.date, event.time, event.description, event.location, seen_at)
+                        for event in new_events
+                    ],
+                )
+            connection.execute(
+                "INSERT OR REPLACE INTO tracked_parcels (tracking_number, last_seen_at) VALUES (?, ?)",
+                (tracking_number, seen_at),
+            )
+        return new_events
+
+    def events_since(self, tracking_number: str, since: float = 0, until: Optional[float] = None) -> list[HistoryEvent]:
+        """
+        Get the events of a parcel first seen after `since` (and up to `until`, if given), ordered by event ID.
+        """
+        query = (
+            "SELECT event_id, date, time, description, location, first_seen_at FROM tracking_events "
+            "WHERE tracking_number = ? AND first_seen_at > ?"
+        )
+        parameters: tuple[str | float, ...] = (tracking_number, since)
+        if until is not None:
+            query += " AND first_seen_at <= ?"
+            parameters += (until,)
+        with self._lock:
+            rows = self.connection.execute(query + " ORDER BY event_id", parameters).fetchall()
+        return [
+            HistoryEvent(
+                event=TrackingEvent(id=event_id, time=time_, description=description, date=date, location=location),
+                first_seen_at=first_seen_at,
+            )
+            for event_id, date, time_, description, location, first_seen_at in rows
+        ]
+
+    def compact(self, max_age: float, max_parcels: Optional[int] = None, keep: Collection[str] = ()) -> int:
+        """
+        Remove the histories of the parcels not seen for `max_age` seconds and, beyond `max_parcels` parcels, of the
+        least recently seen ones.
+
+        Args:
+            max_age (float): Maximum time in seconds since a parcel was last seen.
+            max_parcels (Optional[int]): Maximum number of parcels whose history is kept. Defaults to None.
+            keep (Collection[str]): Tracking numbers of the parcels whose history is never removed, e.g. the watched
+                ones, whose next check would otherwise find their whole history new. They count towards
+                `max_parcels`. Defaults to ().
+
+        Returns:
+            int: The number of removed parcel histories.
+        """
+        kept = json.dumps(list(keep))
+        with self._lock, self.connection as connection:
+            removed = connection.execute(
+                "DELETE FROM tracked_parcels WHERE last_seen_at < ? "
+                "AND tracking_number NOT IN (SELECT value FROM json_each(?))",
+                (time.time() - max_age, kept),
+            ).rowcount
+            if max_parcels is not None:
+                removed += connection.execute(
+                    "DELETE FROM tracked_parcels WHERE tracking_number IN "
+                    "(SELECT tracking_number FROM tracked_parcels ORDER BY last_seen_at DESC LIMIT -1 OFFSET ?) "
+                    "AND tracking_number NOT IN (SELECT value FROM json_each(?))",
+                    (max_parcels, kept),
+                ).rowcount
+            if removed:
+                connection.execute(
+                    "DELETE FROM tracking_events WHERE tracking_number NOT IN (SELECT tracking_number FROM tracked_parcels)"
+                )
+        return removed
+
+
+class HistoryTracker:
+    """
+    A parcel tracker calling another tracker and appending the tracking records it returns to a history store.
+    A failure of the store is logged and doesn't fail the tracking request.
+
+    Args:
+        tracker (Tracker): The tracker to call.
+        store (HistoryStore): The store of the tracking histories.
+    """
+
+    def __init__(self, tracker: Tracker, store: HistoryStore) -> None:
+        self.tracker = tracker
+        self.store = store
+
+    async def _append(self, tracking_number: str, records: list[TrackingRecord]) -> None:
+        try:
+            await asyncio.to_thread(self.store.append, tracking_number, [TrackingEvent.from_record(record) for record in records])
+        except Exception as e:
+            logger.warning(f"Failed to store the tracking history of parcel {tracking_number}: {e!r}")
+
+    async def track_as_text(self, tracking_number: str, timeout: Optional[float] = None) -> list[TrackingRecord]:
+        records = await self.tracker.track_as_text(tracking_number, timeout)
+        await self._append(tracking_number, records)
+        return records
+
+    async def track_as_image(self, tracking_number: str, timeout: Optional[float] = None) -> bytes:
+        return await self.tracker.track_as_image(tracking_number, timeout)
+
+    async def track_as_text_and_image(self, tracking_number: str, timeout: Optional[float] = None) -> TrackingSnapshot:
+        snapshot = await self.tracker.track_as_text_and_image(tracking_number, timeout)
+        await self._append(tracking_number, snapshot.records)
+        return snapshot
+
+    def __repr__(self) -> str:
+        return f"HistoryTracker<(tracker={self.tracker}, store={self.store})>"
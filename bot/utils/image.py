@@ -0,0 +1,75 @@
+import io
+import math
+from typing import TYPE_CHECKING, Literal, NamedTuple, Optional
+
+if TYPE_CHECKING:
+    from PIL.Image import Image
+
+__all__ = ("ScreenshotFormat", "ScreenshotOptions", "encode_screenshot")
+
+ScreenshotFormat = Literal["jpeg", "webp", "png"]
+
+MIN_SCREENSHOT_WIDTH = 320
+MAX_DOWNSCALE_ATTEMPTS = 5
+
+
+class ScreenshotOptions(NamedTuple):
+    """
+    Rendering and encoding options of tracking result screenshots.
+
+    Args:
+        width (int): Viewport width of the page, in CSS pixels. Defaults to 1280.
+        device_scale_factor (float): Number of screenshot pixels per CSS pixel. Defaults to 1.
+        format (ScreenshotFormat): Image format of the screenshot. Defaults to "jpeg".
+        quality (int): Quality of JPEG and WebP screenshots, from 1 to 100. Defaults to 80.
+        colors (int): Palette size of PNG screenshots, from 2 to 256. Defaults to 256.
+        max_bytes (Optional[int]): Size budget of a screenshot, in bytes. Larger screenshots are downscaled until they
+            fit. Defaults to 500 KiB.
+    """
+
+    width: int = 1280
+    device_scale_factor: float = 1
+    format: ScreenshotFormat = "jpeg"
+    quality: int = 80
+    colors: int = 256
+    max_bytes: Optional[int] = 500 * 1024
+
+
+def _encode(image: "Image", options: ScreenshotOptions) -> bytes:
+    from PIL.Image import Quantize
+
+    buffer = io.BytesIO()
+    if options.format == "png":
+        image.quantize(colors=options.colors, method=Quantize.FASTOCTREE).save(buffer, format="PNG", optimize=True)
+    elif options.format == "webp":
+        image.save(buffer, format="WEBP", quality=options.quality, method=4)
+    else:
+        image.save(buffer, format="JPEG", quality=options.quality, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def encode_screenshot(png: bytes, options: ScreenshotOptions) -> bytes:
+    """Re-encode a PNG screenshot in the format of the options, downscaling it until it fits the size budget.
+
+    Args:
+        png (bytes): The screenshot in PNG format.
+        options (ScreenshotOptions): The encoding options.
+
+    Returns:
+        bytes: The encoded screenshot. It may exceed the size budget when it can't be downscaled any further.
+    """
+    # Pillow is imported on first use, the bot process never encodes screenshots when the tracking workers do
+    from PIL import Image
+
+    with Image.open(io.BytesIO(png)) as source:
+        image = source.convert("RGB")
+
+    data = _encode(image, options)
+    for _ in range(MAX_DOWNSCALE_ATTEMPTS):
+        if options.max_bytes is None or len(data) <= options.max_bytes or image.width <= MIN_SCREENSHOT_WIDTH:
+            break
+        # The encoded size is roughly proportional to the number of pixels
+        ratio = max(math.sqrt(options.max_bytes / len(data)) * 0.95, MIN_SCREENSHOT_WIDTH / image.width)
+        image = image.resize((round(image.width * ratio), round(image.height * ratio)), Image.Resampling.LANCZOS)
+        data = _encode(image, options)
+    return data
@@ -0,0 +1,155 @@
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Generator, Optional
+from wsgiref.simple_server import WSGIServer
+
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+__all__ = (
+    "STAGE_SECONDS",
+    "REQUEST_SECONDS",
+    "CACHE_LOOKUPS",
+    "QUEUE_DEPTH",
+    "TRACKINGS_IN_FLIGHT",
+    "RequestTrace",
+    "observe_stage",
+    "timed",
+    "recording",
+    "traced",
+    "MetricsServer",
+)
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+STAGE_SECONDS = Histogram(
+    "rahgiri_stage_duration_seconds", "Duration of the stages of tracking requests.", ["stage"], buckets=BUCKETS
+)
+REQUEST_SECONDS = Histogram(
+    "rahgiri_request_duration_seconds",
+    "Duration of tracking requests, from the choice of the output type to the reply.",
+    ["output_type", "outcome"],
+    buckets=BUCKETS,
+)
+CACHE_LOOKUPS = Counter("rahgiri_cache_lookups", "Lookups of the tracking cache, by result.", ["result"])
+QUEUE_DEPTH = Gauge("rahgiri_tracking_queue_depth", "Number of tracking jobs waiting in the queue.")
+TRACKINGS_IN_FLIGHT = Gauge("rahgiri_trackings_in_flight", "Number of tracking results being fetched.")
+
+_current_trace: ContextVar[Optional["RequestTrace"]] = ContextVar("current_trace", default=None)
+
+
+class RequestTrace:
+    """
+    The stage timings of a tracking request. Stages timed while the trace is current, including in the tasks
+    started from it, are added to the trace.
+
+    Args:
+        name (str): Name of the request in the slow request log, e.g. its tracking number.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.outcome = "ok"
+        self.stages: dict[str, float] = {}
+        self._started_at = time.perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        """Time since the request started, in seconds."""
+        return time.perf_counter() - self._started_at
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def breakdown(self) -> str:
+        return ", ".join(f"{stage}={seconds * 1000:.0f}ms" for stage, seconds in self.stages.items())
+
+    def __repr__(self) -> str:
+        return f"RequestTrace<(name={self.name}, outcome={self.outcome}, stages={self.stages})>"
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    """Record the duration of a stage of the current tracking request."""
+    STAGE_SECONDS.labels(stage).observe(seconds)
+    if (trace := _current_trace.get()) is not None:
+        trace.add(stage, seconds)
+
+
+@contextmanager
+def timed(stage: str) -> Generator[None, None, None]:
+    """Time a stage of the current tracking request, whether it succeeds or not."""
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started_at)
+
+
+@contextmanager
+def recording(trace: RequestTrace) -> Generator[RequestTrace, None, None]:
+    """Make a trace current, so that the stages timed in the block are added to it."""
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def traced(name: str, output_type: str, slow_threshold: Optional[float] = None) -> Generator[RequestTrace, None, None]:
+    """Trace a tracking request, recording its duration and logging its stage breakdown if it's slow.
+
+    Args:
+        name (str): Name of the request in the slow request log.
+        output_type (str): Output type of the request.
+        slow_threshold (Optional[float]): Duration above which the request is logged, in seconds. If None, no
+            request is logged. Defaults to None.
+
+    Yields:
+        RequestTrace: The trace of the request. Its outcome can be set to label the request duration.
+    """
+    trace = RequestTrace(name)
+    try:
+        with recording(trace):
+            yield trace
+    except BaseException:
+        trace.outcome = "error"
+        raise
+    finally:
+        elapsed = trace.elapsed
+        REQUEST_SECONDS.labels(output_type, trace.outcome).observe(elapsed)
+        if slow_threshold is not None and elapsed >= slow_threshold:
+            logger.warning(f"Slow {output_type} tracking request {name} ({trace.outcome}): {elapsed:.2f}s [{trace.breakdown()}]")
+
+
+class MetricsServer:
+    """
+    An HTTP server exposing the metrics in the Prometheus text format, running in a background thread.
+
+    Args:
+        port (int): Port of the server.
+        address (str): Address the server listens on. Defaults to "127.0.0.1".
+    """
+
+    def __init__(self, port: int, address: str = "127.0.0.1") -> None:
+        self.port = port
+        self.address = address
+        self._server: Optional[WSGIServer] = None
+
+    def start(self) -> None:
+        if self._server is not None:
+            return
+        self._server, _ = start_http_server(self.port, addr=self.address)
+        logger.info(f"Serving metrics on http://{self.address}:{self.port}/metrics")
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __repr__(self) -> str:
+        return f"MetricsServer<(port={self.port}, address={self.address})>"
@@ -0,0 +1,254 @@
+import asyncio
+import json
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, NamedTuple, Optional
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from .sqlite import SQLiteStore
+
+__all__ = ("StateBatch", "StateStore", "SQLiteStateStore", "BotPersistence")
+
+logger = logging.getLogger(__name__)
+
+Data = dict[Any, Any]
+ConversationKey = tuple[int | str, ...]
+
+
+class StateBatch(NamedTuple):
+    """
+    A batch of state changes written at once. A None value deletes the stored entry.
+    """
+
+    user_data: dict[int, Optional[Data]]
+    chat_data: dict[int, Optional[Data]]
+    bot_data: Optional[Data]
+    conversations: dict[tuple[str, ConversationKey], Optional[object]]
+
+
+class StateStore(ABC):
+    """
+    Storage backend of `BotPersistence`. The methods may block; they are called from a worker thread.
+    All the stored data is JSON-serializable.
+    """
+
+    @abstractmethod
+    def load_user_data(self, user_id: int) -> Optional[Data]:
+        """Load the data of a user, or None if nothing is stored for it."""
+
+    @abstractmethod
+    def load_chat_data(self, chat_id: int) -> Optional[Data]:
+        """Load the data of a chat, or None if nothing is stored for it."""
+
+    @abstractmethod
+    def load_bot_data(self) -> Optional[Data]:
+        """Load the data of the bot, or None if nothing is stored."""
+
+    @abstractmethod
+    def load_conversations(self, name: str) -> dict[ConversationKey, object]:
+        """Load the states of the conversations of a conversation handler."""
+
+    @abstractmethod
+    def write(self, batch: StateBatch) -> None:
+        """Write a batch of state changes, atomically if the backend supports it."""
+
+    @abstractmethod
+    def close(self) -> None:
+        """Release the resources of the store."""
+
+
+class SQLiteStateStore(SQLiteStore, StateStore):
+    """
+    A state store persisting the data in a local SQLite database.
+
+    Args:
+        path (str): Path to the SQLite database file.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS user_data (user_id INTEGER PRIMARY KEY, data TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS chat_data (chat_id INTEGER PRIMARY KEY, data TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS bot_data (id INTEGER PRIMARY KEY CHECK (id = 0), data TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS conversations (
+            name TEXT NOT NULL,
+            key TEXT NOT NULL,
+            state TEXT NOT NULL,
+            PRIMARY KEY (name, key)
+        );
+    """
+
+    def _load(self, query: str, parameters: tuple[Any, ...] = ()) -> Optional[Data]:
+        with self._lock:
+            row = self.connection.execute(query, parameters).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def load_user_data(self, user_id: int) -> Optional[Data]:
+        return self._load("SELECT data FROM user_data WHERE user_id = ?", (user_id,))
+
+    def load_chat_data(self, chat_id: int) -> Optional[Data]:
+        return self._load("SELECT data FROM chat_data WHERE chat_id = ?", (chat_id,))
+
+    def load_bot_data(self) -> Optional[Data]:
+        return self._load("SELECT data FROM bot_data WHERE id = 0")
+
+    def load_conversations(self, name: str) -> dict[ConversationKey, object]:
+        with self._lock:
+            rows = self.connection.execute("SELECT key, state FROM conversations WHERE name = ?", (name,)).fetchall()
+        return {tuple(json.loads(key)): json.loads(state) for key, state in rows}
+
+    def write(self, batch: StateBatch) -> None:
+        with self._lock, self.connection as connection:
+            for table, column, entries in (
+                ("user_data", "user_id", batch.user_data),
+                ("chat_data", "chat_id", batch.chat_data),
+            ):
+                connection.executemany(
+                    f"INSERT OR REPLACE INTO {table} ({column}, data) VALUES (?, ?)",
+                    [(key, json.dumps(data, ensure_ascii=False)) for key, data in entries.items() if data is not None],
+                )
+                connection.executemany(
+                    f"DELETE FROM {table} WHERE {column} = ?", [(key,) for key, data in entries.items() if data is None]
+                )
+            if batch.bot_data is not None:
+                connection.execute(
+                    "INSERT OR REPLACE INTO bot_data (id, data) VALUES (0, ?)", (json.dumps(batch.bot_data, ensure_ascii=False),)
+                )
+            connection.executemany(
+                "INSERT OR REPLACE INTO conversations (name, key, state) VALUES (?, ?, ?)",
+                [
+                    (name, json.dumps(key), json.dumps(state))
+                    for (name, key), state in batch.conversations.items()
+                    if state is not None
+                ],
+            )
+            connection.executemany(
+                "DELETE FROM conversations WHERE name = ? AND key = ?",
+                [(name, json.dumps(key)) for (name, key), state in batch.conversations.items() if state is None],
+            )
+
+
+class BotPersistence(BasePersistence[Data, Data, Data]):
+    """
+    A persistence of user, chat and bot data and conversation states backed by a `StateStore`.
+
+    User and chat data are loaded lazily, once per process, the first time an update of the user or chat is
+    processed. Changes handed over by the application every `update_interval` seconds are buffered and
+    written to the store in a single batch, so processing an update never waits for the store.
+
+    Args:
+        store (StateStore): The store the data is persisted in.
+        update_interval (float): Time between two writes of the changed data to the store, in seconds. Defaults to 10.
+    """
+
+    def __init__(self, store: StateStore, update_interval: float = 10) -> None:
+        super().__init__(
+            store_data=PersistenceInput(bot_data=True, chat_data=True, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.store = store
+        self._loaded_users: set[int] = set()
+        self._loaded_chats: set[int] = set()
+        self._pending = StateBatch(user_data={}, chat_data={}, bot_data=None, conversations={})
+        self._write_task: Optional[asyncio.Task[None]] = None
+        self._bot_data: Optional[Data] = None
+
+    def _schedule_write(self) -> None:
+        # The application hands over all the changes of a run at once, so writing them in a task started
+        # after the current one batches the whole run into a single write
+        if self._write_task is None or self._write_task.done():
+            self._write_task = asyncio.create_task(self._write())
+
+    def _has_pending(self) -> bool:
+        pending = self._pending
+        return bool(pending.user_data or pending.chat_data or pending.conversations) or pending.bot_data is not None
+
+    async def _write(self) -> None:
+        # Changes handed over while a batch is being written go in the next batch
+        while self._has_pending():
+            batch, self._pending = self._pending, StateBatch(user_data={}, chat_data={}, bot_data=None, conversations={})
+            try:
+                await asyncio.to_thread(self.store.write, batch)
+            except Exception:
+                logger.exception("Failed to write the bot state, retrying with the next batch")
+                # Keep the changes made since the batch was taken, they are newer
+                self._pending = StateBatch(
+                    user_data=batch.user_data | self._pending.user_data,
+                    chat_data=batch.chat_data | self._pending.chat_data,
+                    bot_data=self._pending.bot_data if self._pending.bot_data is not None else batch.bot_data,
+                    conversations=batch.conversations | self._pending.conversations,
+                )
+                return
+
+    async def get_user_data(self) -> dict[int, Data]:
+        return {}
+
+    async def get_chat_data(self) -> dict[int, Data]:
+        return {}
+
+    async def get_bot_data(self) -> Data:
+        self._bot_data = await asyncio.to_thread(self.store.load_bot_data) or {}
+        return dict(self._bot_data)
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    async def get_conversations(self, name: str) -> dict[ConversationKey, object]:
+        return await asyncio.to_thread(self.store.load_conversations, name)
+
+    async def update_conversation(self, name: str, key: ConversationKey, new_state: Optional[object]) -> None:
+        self._pending.conversations[(name, key)] = new_state
+        self._schedule_write()
+
+    async def update_user_data(self, user_id: int, data: Data) -> None:
+        self._pending.user_data[user_id] = data
+        self._schedule_write()
+
+    async def update_chat_data(self, chat_id: int, data: Data) -> None:
+        self._pending.chat_data[chat_id] = data
+        self._schedule_write()
+
+    async def update_bot_data(self, data: Data) -> None:
+        # The application hands over the bot data on every run, changed or not
+        if data == self._bot_data:
+            return
+        self._bot_data = data
+        self._pending = self._pending._replace(bot_data=data)
+        self._schedule_write()
+
+    async def update_callback_data(self, data: Any) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        self._pending.chat_data[chat_id] = None
+        self._schedule_write()
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._pending.user_data[user_id] = None
+        self._schedule_write()
+
+    async def refresh_user_data(self, user_id: int, user_data: Data) -> None:
+        if user_id in self._loaded_users:
+            return
+        self._loaded_users.add(user_id)
+        if user_id not in self._pending.user_data and (data := await asyncio.to_thread(self.store.load_user_data, user_id)):
+            user_data.update({key: value for key, value in data.items() if key not in user_data})
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Data) -> None:
+        if chat_id in self._loaded_chats:
+            return
+        self._loaded_chats.add(chat_id)
+        if chat_id not in self._pending.chat_data and (data := await asyncio.to_thread(self.store.load_chat_data, chat_id)):
+            chat_data.update({key: value for key, value in data.items() if key not in chat_data})
+
+    async def refresh_bot_data(self, bot_data: Data) -> None:
+        pass
+
+    async def flush(self) -> None:
+        if self._write_task is not None:
+            await self._write_task
+        await self._write()
+        await asyncio.to_thread(self.store.close)
+
+    def __repr__(self) -> str:
+        return f"BotPersistence<(store={self.store}, update_interval={self.update_interval})>"
@@ -0,0 +1,140 @@
+import asyncio
+import contextlib
+import logging
+from typing import Any, AsyncContextManager, Callable, Coroutine, Optional
+
+from aiolimiter import AsyncLimiter
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+__all__ = ("ChatRateLimiter",)
+
+logger = logging.getLogger(__name__)
+
+ChatId = int | str
+JSONResult = bool | dict[str, Any] | list[dict[str, Any]]
+
+MAX_IDLE_LIMITERS = 1024
+
+
+class ChatRateLimiter(BaseRateLimiter[int]):
+    """
+    A rate limiter of the requests the bot sends to chats, with a global limit and a limit per chat, tighter for
+    groups and channels than for private chats. Requests not sent to a chat, e.g. answers to callback queries,
+    aren't limited.
+
+    When Telegram asks to retry a request later, the requests to the same chat wait for the given time and the
+    request is retried; a flood wait of a request not sent to a chat holds all requests.
+
+    Args:
+        overall_max_rate (float): Maximum number of requests to chats per `overall_time_period`. Defaults to 30.
+        overall_time_period (float): Time period of the global limit, in seconds. Defaults to 1.
+        chat_max_rate (float): Maximum number of requests to a private chat per `chat_time_period`. Defaults to 5.
+        chat_time_period (float): Time period of the limit of a private chat, in seconds. Defaults to 5.
+        group_max_rate (float): Maximum number of requests to a group or a channel per `group_time_period`.
+            Defaults to 20.
+        group_time_period (float): Time period of the limit of a group or a channel, in seconds. Defaults to 60.
+        max_retries (int): Maximum number of retries of a request Telegram asks to retry later. Can be overridden
+            per request with `rate_limit_args`. Defaults to 3.
+    """
+
+    def __init__(
+        self,
+        overall_max_rate: float = 30,
+        overall_time_period: float = 1,
+        chat_max_rate: float = 5,
+        chat_time_period: float = 5,
+        group_max_rate: float = 20,
+        group_time_period: float = 60,
+        max_retries: int = 3,
+    ) -> None:
+        self.overall_max_rate = overall_max_rate
+        self.overall_time_period = overall_time_period
+        self.chat_max_rate = chat_max_rate
+        self.chat_time_period = chat_time_period
+        self.group_max_rate = group_max_rate
+        self.group_time_period = group_time_period
+        self.max_retries = max_retries
+        self._overall_limiter = AsyncLimiter(overall_max_rate, overall_time_period) if overall_max_rate else None
+        self._chat_limiters: dict[ChatId, AsyncLimiter] = {}
+        self._retry_at: dict[Optional[ChatId], float] = {}
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    @staticmethod
+    def _chat_id(data: dict[str, Any]) -> Optional[ChatId]:
+        chat_id = data.get("chat_id")
+        if chat_id is None:
+            return None
+        with contextlib.suppress(ValueError, TypeError):
+            return int(chat_id)
+        return str(chat_id)
+
+    def _chat_limiter(self, chat_id: ChatId) -> Optional[AsyncLimiter]:
+        group = isinstance(chat_id, str) or chat_id < 0
+        max_rate, time_period = (
+            (self.group_max_rate, self.group_time_period) if group else (self.chat_max_rate, self.chat_time_period)
+        )
+        if not max_rate:
+            return None
+
+        limiter = self._chat_limiters.get(chat_id)
+        if limiter is None:
+            if len(self._chat_limiters) >= MAX_IDLE_LIMITERS:
+                # Forget the limiters of the chats nothing was sent to lately
+                for key, idle in list(self._chat_limiters.items()):
+                    if idle.has_capacity(idle.max_rate):
+                        del self._chat_limiters[key]
+            limiter = self._chat_limiters[chat_id] = AsyncLimiter(max_rate, time_period)
+        return limiter
+
+    async def _wait_retry_after(self, chat_id: Optional[ChatId]) -> None:
+        loop = asyncio.get_running_loop()
+        while (delay := max(self._retry_at.get(None, 0.0), self._retry_at.get(chat_id, 0.0)) - loop.time()) > 0:
+            await asyncio.sleep(delay)
+        if chat_id in self._retry_at and self._retry_at[chat_id] <= loop.time():
+            del self._retry_at[chat_id]
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, JSONResult]],
+        args: Any,
+        kwargs: dict[str, Any],
+        endpoint: str,
+        data: dict[str, Any],
+        rate_limit_args: Optional[int],
+    ) -> JSONResult:
+        max_retries = rate_limit_args if rate_limit_args is not None else self.max_retries
+        chat_id = self._chat_id(data)
+
+        retries = 0
+        while True:
+            await self._wait_retry_after(chat_id)
+            chat_limiter: AsyncContextManager[Any] = contextlib.nullcontext()
+            overall_limiter: AsyncContextManager[Any] = contextlib.nullcontext()
+            if chat_id is not None:
+                chat_limiter = self._chat_limiter(chat_id) or chat_limiter
+                overall_limiter = self._overall_limiter or overall_limiter
+            try:
+                async with chat_limiter, overall_limiter:
+                    return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                if retries >= max_retries:
+                    raise
+                retries += 1
+                retry_after = e.retry_after if isinstance(e.retry_after, (int, float)) else e.retry_after.total_seconds()
+                logger.warning(f"Flood limit hit on {endpoint} for chat {chat_id}, retrying in {retry_after} seconds")
+                loop = asyncio.get_running_loop()
+                self._retry_at[chat_id] = max(self._retry_at.get(chat_id, 0.0), loop.time() + retry_after + 0.1)
+
+    def __repr__(self) -> str:
+        return (
+            f"ChatRateLimiter<(overall_max_rate={self.overall_max_rate}, overall_time_period={self.overall_time_period}, "
+            f"chat_max_rate={self.chat_max_rate}, chat_time_period={self.chat_time_period}, "
+            f"group_max_rate={self.group_max_rate}, group_time_period={self.group_time_period}, "
+            f"max_retries={self.max_retries})>"
+        )
@@ -0,0 +1,213 @@
+import asyncio
+import hashlib
+import html
+import logging
+import time
+import traceback
+from contextlib import suppress
+from typing import Awaitable, Callable, NamedTuple, Optional
+
+__all__ = ("error_fingerprint", "ErrorReporter")
+
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGE_LENGTH = 4096
+MAX_SUMMARY_GROUPS = 20
+
+
+def error_fingerprint(error: BaseException) -> str:
+    """Get a fingerprint of an exception grouping the exceptions of the same type raised from the same place.
+
+    The message of the exception is left out, since it often contains request-specific data.
+
+    Args:
+        error (BaseException): The exception.
+
+    Returns:
+        str: A short hex digest of the type of the exception and the frames of its traceback, including its causes.
+    """
+    digest = hashlib.sha1()
+    seen: set[int] = set()
+    current: Optional[BaseException] = error
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        digest.update(f"{type(current).__module__}.{type(current).__qualname__}\n".encode())
+        for frame in traceback.extract_tb(current.__traceback__):
+            digest.update(f"{frame.filename}:{frame.name}:{frame.lineno}\n".encode())
+        current = current.__cause__ or current.__context__
+    return digest.hexdigest()[:12]
+
+
+class _Report(NamedTuple):
+    error: BaseException
+    details: Optional[Callable[[], str]]
+
+
+class _ErrorGroup:
+    __slots__ = ("title", "last_seen", "suppressed")
+
+    def __init__(self, title: str) -> None:
+        self.title = title
+        self.last_seen = time.monotonic()
+        self.suppressed = 0
+
+
+class ErrorReporter:
+    """
+    A reporter of unhandled errors to the developer, grouping them by traceback fingerprint. The first occurrence
+    of an error is sent right away with its details and traceback, and the following ones are counted and sent
+    as a periodic summary. Errors are queued in a bounded queue and formatted and sent by a background task, so
+    reporting an error never waits for Telegram; errors reported while the queue is full are dropped and counted.
+
+    Args:
+        summary_interval (float): Time between two summaries of the repeated errors, in seconds. Defaults to 300.
+        forget_after (float): Time without occurrences after which an error is sent in full again, in seconds.
+            Defaults to 3600.
+        max_queue_size (int): Maximum number of errors waiting to be reported. Defaults to 100.
+        send_interval (float): Minimum time between two messages, in seconds. Defaults to 1.
+    """
+
+    def __init__(
+        self,
+        summary_interval: float = 300,
+        forget_after: float = 3600,
+        max_queue_size: int = 100,
+        send_interval: float = 1,
+    ) -> None:
+        self.summary_interval = summary_interval
+        self.forget_after = forget_after
+        self.max_queue_size = max_queue_size
+        self.send_interval = send_interval
+        self._queue: asyncio.Queue[_Report] = asyncio.Queue(maxsize=max_queue_size)
+        self._groups: dict[str, _ErrorGroup] = {}
+        self._dropped = 0
+        self._sent_at = 0.0
+        self._task: Optional[asyncio.Task[None]] = None
+        self._send_message: Optional[Callable[[str], Awaitable[None]]] = None
+
+    def report(self, error: BaseException, details: Optional[Callable[[], str]] = None) -> None:
+        """Queue an error to be reported.
+
+        Args:
+            error (BaseException): The error.
+            details (Optional[Callable[[], str]]): A function formatting the context of the error as HTML, called
+                only if the error is sent in full. Defaults to None.
+        """
+        try:
+            self._queue.put_nowait(_Report(error, details))
+        except asyncio.QueueFull:
+            self._dropped += 1
+
+    async def _send(self, text: str) -> None:
+        if (delay := self._sent_at + self.send_interval - time.monotonic()) > 0:
+            await asyncio.sleep(delay)
+        if self._send_message is None:
+            return
+        try:
+            await self._send_message(text)
+        except Exception as e:
+            logger.error(f"Failed to send error report to developer chat: {e}")
+        finally:
+            self._sent_at = time.monotonic()
+
+    def _format_report(self, report: _Report, fingerprint: str) -> str:
+        header = f"خطا ({fingerprint}):\n\n"
+        details = report.details() if report.details else ""
+        tb_string = "".join(traceback.format_exception(None, report.error, report.error.__traceback__))
+        # Keep the end of the traceback, where the error is raised, within the message length limit
+        room = MAX_MESSAGE_LENGTH - len(header) - len(details) - len("<pre></pre>")
+        if room < 200:
+            details = ""
+            room = MAX_MESSAGE_LENGTH - len(header) - len("<pre></pre>")
+        tb_html = html.escape(tb_string)[-room:]
+        return f"{header}{details}<pre>{tb_html}</pre>"
+
+    async def _process(self, report: _Report, send: bool = True) -> None:
+        fingerprint = error_fingerprint(report.error)
+        now = time.monotonic()
+        group = self._groups.get(fingerprint)
+        if group is not None and now - group.last_seen < self.forget_after:
+            group.last_seen = now
+            group.suppressed += 1
+            return
+
+        self._groups[fingerprint] = group = _ErrorGroup(f"{type(report.error).__name__}: {report.error}"[:200])
+        if send:
+            await self._send(self._format_report(report, fingerprint))
+        else:
+            group.suppressed += 1
+
+    def _format_summary(self) -> Optional[str]:
+        repeated = sorted(
+            ((fingerprint, group) for fingerprint, group in self._groups.items() if group.suppressed),
+            key=lambda item: item[1].suppressed,
+            reverse=True,
+        )
+        dropped, self._dropped = self._dropped, 0
+        if not repeated and not dropped:
+            return None
+
+        lines = [f"خلاصه خطاهای {self.summary_interval / 60:.0f} دقیقه اخیر:"]
+        for fingerprint, group in repeated[:MAX_SUMMARY_GROUPS]:
+            lines.append(f"<b>{group.suppressed}×</b> ({fingerprint}) <code>{html.escape(group.title)}</code>")
+        if len(repeated) > MAX_SUMMARY_GROUPS:
+            lines.append(f"و {len(repeated) - MAX_SUMMARY_GROUPS} خطای دیگر")
+        if dropped:
+            lines.append(f"<b>{dropped}</b> خطا به دلیل پر بودن صف گزارش نشد.")
+        for group in self._groups.values():
+            group.suppressed = 0
+        return "\n".join(lines)
+
+    def _forget_groups(self) -> None:
+        now = time.monotonic()
+        for fingerprint, group in list(self._groups.items()):
+            if now - group.last_seen >= self.forget_after and not group.suppressed:
+                del self._groups[fingerprint]
+
+    async def _run(self) -> None:
+        summary_at = time.monotonic() + self.summary_interval
+        while True:
+            try:
+                async with asyncio.timeout(max(summary_at - time.monotonic(), 0)):
+                    report = await self._queue.get()
+            except TimeoutError:
+                pass
+            else:
+                try:
+                    await self._process(report)
+                except Exception:
+                    logger.exception("Failed to report an error")
+            if time.monotonic() >= summary_at:
+                if summary := self._format_summary():
+                    await self._send(summary)
+                self._forget_groups()
+                summary_at = time.monotonic() + self.summary_interval
+
+    def start(self, send: Callable[[str], Awaitable[None]]) -> None:
+        """Start reporting the queued errors in the background.
+
+        Args:
+            send (Callable[[str], Awaitable[None]]): A function sending an HTML message to the developer.
+        """
+        self._send_message = send
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background task, sending a last summary of the errors, including the ones still queued."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+        while not self._queue.empty():
+            await self._process(self._queue.get_nowait(), send=False)
+        if summary := self._format_summary():
+            await self._send(summary)
+
+    def __repr__(self) -> str:
+        return (
+            f"ErrorReporter<(summary_interval={self.summary_interval}, forget_after={self.forget_after}, "
+            f"max_queue_size={self.max_queue_size}, send_interval={self.send_interval})>"
+        )
@@ -0,0 +1,114 @@
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Collection, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+if TYPE_CHECKING:
+    from playwright.async_api import Page, Request, Route
+
+__all__ = ("TEXT_RESOURCE_TYPES", "SCREENSHOT_RESOURCE_TYPES", "ResourcePolicy", "ResourceMonitor")
+
+logger = logging.getLogger(__name__)
+
+TEXT_RESOURCE_TYPES = ("document", "script", "xhr", "fetch")
+"""Resource types needed to submit the tracking form and read the result."""
+
+SCREENSHOT_RESOURCE_TYPES = ("document", "script", "xhr", "fetch", "stylesheet", "image", "font")
+"""Resource types needed for a faithful screenshot of the tracking result."""
+
+
+class ResourcePolicy(NamedTuple):
+    """
+    The requests a page is allowed to make: requests of the given resource types to the first-party host,
+    its subdomains, or one of the given hosts (and their subdomains).
+    """
+
+    resource_types: frozenset[str]
+    hosts: frozenset[str] = frozenset()
+
+    @classmethod
+    def create(cls, resource_types: Collection[str], hosts: Collection[str] = ()) -> "ResourcePolicy":
+        return cls(resource_types=frozenset(resource_types), hosts=frozenset(host.lower() for host in hosts))
+
+    def allows(self, request: "Request", first_party_host: str) -> bool:
+        if request.resource_type not in self.resource_types:
+            return False
+        url = urlsplit(request.url)
+        if url.scheme in ("data", "blob"):
+            return True
+        host = (url.hostname or "").lower()
+        return any(host == allowed or host.endswith(f".{allowed}") for allowed in (first_party_host, *self.hosts))
+
+
+class _ResourceCounter:
+    __slots__ = ("requests", "blocked", "bytes", "ms")
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.blocked = 0
+        self.bytes = 0
+        self.ms = 0.0
+
+
+class ResourceMonitor:
+    """
+    Aborts the requests of a page that a resource policy doesn't allow, and counts the requests, bytes and
+    milliseconds spent on each resource type.
+
+    Args:
+        url (str): URL of the first-party website of the page.
+        policy (Optional[ResourcePolicy]): The requests the page is allowed to make. If not provided, no request is
+            blocked. Defaults to None.
+    """
+
+    def __init__(self, url: str, policy: Optional[ResourcePolicy] = None) -> None:
+        self.first_party_host = (urlsplit(url).hostname or "").lower()
+        self.policy = policy
+        self.counters: dict[str, _ResourceCounter] = {}
+        self._pending: set[asyncio.Task[None]] = set()
+
+    def _counter(self, resource_type: str) -> _ResourceCounter:
+        if (counter := self.counters.get(resource_type)) is None:
+            counter = self.counters[resource_type] = _ResourceCounter()
+        return counter
+
+    async def _route(self, route: "Route") -> None:
+        if self.policy is None or self.policy.allows(route.request, self.first_party_host):
+            await route.continue_()
+        else:
+            self._counter(route.request.resource_type).blocked += 1
+            await route.abort("blockedbyclient")
+
+    async def _record(self, request: "Request") -> None:
+        counter = self._counter(request.resource_type)
+        counter.requests += 1
+        if (elapsed := request.timing["responseEnd"]) > 0:
+            counter.ms += elapsed
+        try:
+            sizes = await request.sizes()
+        except Exception:
+            return
+        counter.bytes += sizes["responseHeadersSize"] + sizes["responseBodySize"]
+
+    def _on_request_finished(self, request: "Request") -> None:
+        task = asyncio.create_task(self._record(request))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def attach(self, page: "Page") -> None:
+        """Start intercepting and counting the requests of a page."""
+        if self.policy is not None:
+            await page.route("**/*", self._route)
+        page.on("requestfinished", self._on_request_finished)
+
+    async def summary(self) -> str:
+        """Summarize the counters as one `type: requests/blocked, KiB, ms` entry per resource type."""
+        if self._pending:
+            await asyncio.wait(self._pending, timeout=1)
+        return ", ".join(
+            f"{resource_type}: {counter.requests}/{counter.blocked} blocked, {counter.bytes / 1024:.1f} KiB, {counter.ms:.0f} ms"
+            for resource_type, counter in sorted(self.counters.items())
+        )
+
+    def __repr__(self) -> str:
+        return f"ResourceMonitor<(first_party_host={self.first_party_host}, policy={self.policy})>"
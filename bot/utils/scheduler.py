@@ -0,0 +1,238 @@
+import asyncio
+from collections import deque
+from typing import Awaitable, Callable, Hashable, Mapping, Optional, TypeVar
+
+from .exceptions import QueueFullError, UserQueueFullError
+
+__all__ = ("TrackingScheduler",)
+
+T = TypeVar("T")
+
+
+class _Ticket:
+    def __init__(self, user_id: Hashable, limit: int) -> None:
+        self.user_id = user_id
+        self.limit = limit
+        self.position = 0
+        self.granted = False
+        self.wakeup: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+
+    def wake(self) -> None:
+        if not self.wakeup.done():
+            self.wakeup.set_result(None)
+
+
+class TrackingScheduler:
+    """
+    A scheduler that bounds the number of tracking jobs running at once. Jobs that can't start right away wait
+    in a queue that is served round-robin across users, so that a single user can't starve the others.
+
+    Args:
+        max_workers (int): Maximum number of jobs running at once. Defaults to 2.
+        max_queue_size (int): Maximum number of jobs waiting in the queue. Defaults to 50.
+        per_user_limit (int): Maximum number of jobs of a single user running at once. Defaults to 1.
+        max_pending_per_user (int): Maximum number of jobs of a single user running or waiting. Defaults to 2.
+        user_limits (Optional[Mapping[Hashable, int]]): Maximum number of jobs running at once of particular users,
+            e.g. of the bot's own background jobs, instead of `per_user_limit`. These users may have that many jobs
+            running or waiting, if it's more than `max_pending_per_user`. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        max_queue_size: int = 50,
+        per_user_limit: int = 1,
+        max_pending_per_user: int = 2,
+        user_limits: Optional[Mapping[Hashable, int]] = None,
+    ) -> None:
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self.per_user_limit = per_user_limit
+        self.max_pending_per_user = max_pending_per_user
+        self.user_limits = dict(user_limits or {})
+        self._running = 0
+        self._running_by_user: dict[Hashable, int] = {}
+        self._waiting: dict[Hashable, deque[_Ticket]] = {}
+        self._rotation: deque[Hashable] = deque()
+        # The callers waiting for a user to have fewer pending jobs, see `run(wait=True)`
+        self._slot_waiters: dict[Hashable, deque[asyncio.Future[None]]] = {}
+
+    @property
+    def running(self) -> int:
+        """Number of jobs currently running."""
+        return self._running
+
+    @property
+    def queued(self) -> int:
+        """Number of jobs waiting in the queue."""
+        return sum(len(tickets) for tickets in self._waiting.values())
+
+    def _pending(self, user_id: Hashable) -> int:
+        return self._running_by_user.get(user_id, 0) + len(self._waiting.get(user_id, ()))
+
+    def _user_limit(self, user_id: Hashable) -> int:
+        return self.user_limits.get(user_id, self.per_user_limit)
+
+    def _pending_limit(self, user_id: Hashable) -> int:
+        if user_id in self.user_limits:
+            return max(self.user_limits[user_id], self.max_pending_per_user)
+        return self.max_pending_per_user
+
+    def _can_start(self, user_id: Hashable, limit: int) -> bool:
+        return self._running < self.max_workers and self._running_by_user.get(user_id, 0) < limit
+
+    def _start(self, user_id: Hashable) -> None:
+        self._running += 1
+        self._running_by_user[user_id] = self._running_by_user.get(user_id, 0) + 1
+
+    def _finish(self, user_id: Hashable) -> None:
+        self._running -= 1
+        if (count := self._running_by_user[user_id] - 1) > 0:
+            self._running_by_user[user_id] = count
+        else:
+            del self._running_by_user[user_id]
+        self._dispatch()
+        self._release_slot(user_id)
+
+    def _remove(self, ticket: _Ticket) -> None:
+        tickets = self._waiting[ticket.user_id]
+        tickets.remove(ticket)
+        if not tickets:
+            del self._waiting[ticket.user_id]
+            self._rotation.remove(ticket.user_id)
+        self._update_positions()
+        self._release_slot(ticket.user_id)
+
+    def _release_slot(self, user_id: Hashable) -> None:
+        waiters = self._slot_waiters.get(user_id)
+        while waiters:
+            waiter = waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                break
+        if waiters is not None and not waiters:
+            del self._slot_waiters[user_id]
+
+    async def _wait_for_slot(self, user_id: Hashable) -> None:
+        waiter = asyncio.get_running_loop().create_future()
+        self._slot_waiters.setdefault(user_id, deque()).append(waiter)
+        try:
+            await waiter
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed to this caller, it goes to the next one
+                self._release_slot(user_id)
+            else:
+                waiters = self._slot_waiters.get(user_id)
+                if waiters is not None and waiter in waiters:
+                    waiters.remove(waiter)
+                    if not waiters:
+                        del self._slot_waiters[user_id]
+            raise
+
+    def _dispatch(self) -> None:
+        # A single pass over the users in rotation order, each starting at most one job. A user whose job starts moves
+        # to the back of the rotation, the others keep their turn.
+        for user_id in list(self._rotation):
+            if self._running >= self.max_workers:
+                break
+            if not self._can_start(user_id, self._waiting[user_id][0].limit):
+                continue
+            tickets = self._waiting[user_id]
+            ticket = tickets.popleft()
+            self._rotation.remove(user_id)
+            if tickets:
+                self._rotation.append(user_id)
+            else:
+                del self._waiting[user_id]
+            self._start(user_id)
+            ticket.granted = True
+            ticket.wake()
+        self._update_positions()
+
+    def _update_positions(self) -> None:
+        # Position of a waiting job if the queue is served one job per user in rotation order
+        queue_lengths = [len(self._waiting[user_id]) for user_id in self._rotation]
+        for rank, user_id in enumerate(self._rotation):
+            for index, ticket in enumerate(self._waiting[user_id]):
+                position = 1 + sum(
+                    min(length, index + (1 if other_rank < rank else 0)) for other_rank, length in enumerate(queue_lengths)
+                )
+                if position != ticket.position:
+                    ticket.position = position
+                    ticket.wake()
+
+    async def run(
+        self,
+        user_id: Hashable,
+        job: Callable[[], Awaitable[T]],
+        on_position: Optional[Callable[[int], Awaitable[None]]] = None,
+        wait: bool = False,
+        limit: Optional[int] = None,
+    ) -> T:
+        """Run a job as soon as a worker is available for the user.
+
+        Args:
+            user_id (Hashable): The user the job belongs to.
+            job (Callable[[], Awaitable[T]]): A function that runs the job.
+            on_position (Optional[Callable[[int], Awaitable[None]]]): A function called with the (1-based) position
+                of the job in the queue whenever it changes while the job is waiting. Defaults to None.
+            wait (bool): Whether to wait for one of the user's jobs to finish when the user has too many jobs
+                running or waiting, instead of raising `UserQueueFullError`. Defaults to False.
+            limit (Optional[int]): Maximum number of jobs of the user running at once for this job, instead of the
+                user's limit, e.g. for the parcels of a bulk request. The user may then have as many jobs running or
+                waiting. Defaults to None.
+
+        Returns:
+            T: The result of the job.
+
+        Raises:
+            UserQueueFullError: Raised when the user has too many jobs running or waiting, unless `wait` is True.
+            QueueFullError: Raised when the queue is full.
+        """
+        if limit is None:
+            limit = self._user_limit(user_id)
+        while self._pending(user_id) >= max(limit, self._pending_limit(user_id)):
+            if not wait:
+                raise UserQueueFullError(f"User {user_id} has too many pending tracking jobs.")
+            await self._wait_for_slot(user_id)
+
+        if not self._rotation and self._can_start(user_id, limit):
+            self._start(user_id)
+        else:
+            if self.queued >= self.max_queue_size:
+                raise QueueFullError("Tracking queue is full.")
+
+            ticket = _Ticket(user_id, limit)
+            if user_id not in self._waiting:
+                self._waiting[user_id] = deque()
+                self._rotation.append(user_id)
+            self._waiting[user_id].append(ticket)
+            self._dispatch()
+
+            reported_position = 0
+            try:
+                while not ticket.granted:
+                    await ticket.wakeup
+                    ticket.wakeup = asyncio.get_running_loop().create_future()
+                    if not ticket.granted and on_position and ticket.position != reported_position:
+                        reported_position = ticket.position
+                        await on_position(reported_position)
+            except BaseException:
+                if ticket.granted:
+                    self._finish(user_id)
+                else:
+                    self._remove(ticket)
+                raise
+
+        try:
+            return await job()
+        finally:
+            self._finish(user_id)
+
+    def __repr__(self) -> str:
+        return (
+            f"TrackingScheduler<(max_workers={self.max_workers}, max_queue_size={self.max_queue_size}, "
+            f"per_user_limit={self.per_user_limit}, max_pending_per_user={self.max_pending_per_user}, "
+            f"user_limits={self.user_limits})>"
+        )
@@ -0,0 +1,44 @@
+import sqlite3
+import threading
+from typing import Optional
+
+__all__ = ("SQLiteStore",)
+
+
+class SQLiteStore:
+    """
+    Base class of the stores persisted in a SQLite database. The connection is opened, and the schema of the
+    store created, on first use. Calls are serialized, so a store can be used from worker threads.
+
+    Args:
+        path (str): Path to the SQLite database file.
+    """
+
+    SCHEMA = ""
+    """SQL script creating the tables of the store, if they don't exist."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.executescript(f"PRAGMA journal_mode = WAL;\n{self.SCHEMA}")
+            with self._connection:
+                self._migrate(self._connection)
+        return self._connection
+
+    def _migrate(self, connection: sqlite3.Connection) -> None:
+        """Upgrade the tables of the store created by an earlier version of the bot, if needed."""
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}<(path={self.path})>"
@@ -2,13 +2,25 @@ import re
 
 from bot.models import TrackingRecord
 
+_DETAILS_LINK_PATTERN = re.compile(r"\s*\(مشاهده.*?\)")
+# A Persian comma without a space after it, or digits stuck between Persian letters. The comma is left out of the
+# letters before the digits, since it's followed by a space once normalized.
+_SPACING_PATTERN = re.compile(r"،(?!\s)|(?<=[\u0600-\u060B\u060D-\u06FF])(\d+)(?=[\u0600-\u06FF])")
+
+
+def _fix_spacing(match: re.Match[str]) -> str:
+    digits = match.group(1)
+    return "، " if digits is None else f" {digits} "
+
 
 def normalize_text(text: str) -> str:
     text = text.strip()
-    text = re.sub(r"\s*\(مشاهده.*?\)", "", text)
-    text = re.sub(r"،(?!\s)", "، ", text)
-    text = re.sub(r"(?<=[\u0600-\u06FF])(\d+)(?=[\u0600-\u06FF])", r" \1 ", text)
-    return text
+    # IDs and times have nothing to normalize
+    if text.isascii():
+        return text
+    if "(مشاهده" in text:
+        text = _DETAILS_LINK_PATTERN.sub("", text)
+    return _SPACING_PATTERN.sub(_fix_spacing, text)
 
 
 def success_msg(msg: str) -> str:
@@ -1,20 +1,82 @@
-from contextlib import asynccontextmanager, suppress
-from typing import AsyncGenerator, Callable, Optional
-
-from fake_useragent import UserAgent
-from playwright.async_api import (
-    ElementHandle,
-    Page,
-    ProxySettings,
-    ViewportSize,
-    async_playwright,
+import asyncio
+import json
+import logging
+import re
+import time
+from contextlib import AsyncExitStack, asynccontextmanager, suppress
+from http.cookiejar import Cookie, CookieJar, DefaultCookiePolicy
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncGenerator,
+    Callable,
+    Mapping,
+    Optional,
+    Protocol,
 )
+from urllib.parse import urljoin
+from urllib.request import Request
 
-from bot.models import TrackingRecord
+import httpx
+from selectolax.lexbor import LexborHTMLParser, LexborNode
 
+from bot.models import Screenshot, TrackingEvent, TrackingRecord, TrackingSnapshot
+
+from .browser import LAUNCH_ARGS, BrowserPool
 from .exceptions import TrackingError
+from .files import content_hash
+from .image import ScreenshotOptions, encode_screenshot
+from .metrics import timed
+from .proxies import ProxyPool
+from .resources import (
+    SCREENSHOT_RESOURCE_TYPES,
+    TEXT_RESOURCE_TYPES,
+    ResourceMonitor,
+    ResourcePolicy,
+)
+from .useragents import UserAgentPool
+
+if TYPE_CHECKING:
+    # Playwright is imported when a browser is launched, it's slow to import and not needed by the HTTP backend
+    from playwright.async_api import Page, ProxySettings
+
+__all__ = (
+    "TRACKING_BASE_URL",
+    "validate_tracking_number",
+    "extract_tracking_numbers",
+    "parse_tracking_rows",
+    "create_http_client",
+    "Tracker",
+    "ParcelTracker",
+)
+
+logger = logging.getLogger(__name__)
+
+_default_user_agents = UserAgentPool()
+
+# The screenshots encoded after text lookups, which outlive the trackers that took them
+_background_tasks: set["asyncio.Task[None]"] = set()
+
+TRACKING_BASE_URL = "https://tracking.post.ir/"
+
+_EXTRACT_ROWS_SCRIPT = """
+() => {
+    const rows = Array.from(document.querySelectorAll("#pnlResult div.row"), (row) => {
+        let columns = row.querySelectorAll("div.newtddata");
+        if (!columns.length) {
+            columns = row.querySelectorAll("div.newtdheader");
+        }
+        return Array.from(columns, (column) => column.textContent);
+    });
+    const alert = rows.length ? null : document.querySelector("#pnlResult div.alert");
+    return { rows: rows, alert: alert ? alert.textContent : null };
+}
+"""
+
+_TRACKING_NUMBER_PATTERN = re.compile(r"(?<!\d)\d{24}(?!\d)")
+_DIGITS_TRANSLATION = str.maketrans("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩", "01234567890123456789")
 
-__all__ = ("validate_tracking_number", "ParcelTracker")
+_POSTBACK_PATTERN = re.compile(r"__doPostBack\(\s*'([^']*)'\s*,\s*'([^']*)'\s*\)")
 
 
 def validate_tracking_number(tracking_number: str) -> bool:
@@ -32,6 +94,91 @@ def validate_tracking_number(tracking_number: str) -> bool:
     return len(tracking_number) == 24 and tracking_number.isdigit()
 
 
+def extract_tracking_numbers(text: str) -> list[str]:
+    """Extract the distinct tracking numbers from a text.
+
+    A tracking number is a run of exactly 24 digits. Persian and Arabic digits are converted to ASCII digits.
+
+    Args:
+        text (str): The text to extract the tracking numbers from, e.g. a message or the content of a CSV file.
+
+    Returns:
+        list[str]: The tracking numbers, in order of first appearance.
+    """
+    return list(dict.fromkeys(_TRACKING_NUMBER_PATTERN.findall(text.translate(_DIGITS_TRANSLATION))))
+
+
+def parse_tracking_rows(
+    rows: list[list[Optional[str]]], normalizer: Optional[Callable[[str], str]] = None
+) -> list[TrackingEvent]:
+    """Parse the cells of the rows of a tracking result into tracking events.
+
+    A header row (with "موقعیت" and "ساعت" columns) sets the date of the events below it. Event rows have an ID,
+    a description, an optional location and a time, in that order. Empty cells are skipped and other rows ignored.
+
+    Args:
+        rows (list[list[Optional[str]]]): The cells of the rows of the result panel.
+        normalizer (Optional[Callable[[str], str]]): A function to normalize the text of each cell. Defaults to None.
+
+    Returns:
+        list[TrackingEvent]: The tracking events, in the order of the rows.
+    """
+    events: list[TrackingEvent] = []
+    date: Optional[str] = None
+    for row in rows:
+        if normalizer is not None:
+            cells = [normalizer(cell).strip() for cell in row if cell]
+        else:
+            cells = [cell.strip() for cell in row if cell]
+
+        text = "\n".join(cells)
+        if "موقعیت" in text and "ساعت" in text:
+            date = cells[0] or None
+        elif len(cells) == 3:
+            events.append(TrackingEvent(id=int(cells[0]), time=cells[2], description=cells[1], date=date))
+        elif len(cells) == 4:
+            events.append(TrackingEvent(id=int(cells[0]), time=cells[3], description=cells[1], date=date, location=cells[2]))
+    return events
+
+
+class _RejectCookiesPolicy(DefaultCookiePolicy):
+    def set_ok(self, cookie: Cookie, request: Request) -> bool:
+        return False
+
+
+def create_http_client(proxy: Optional[str] = None, max_connections: int = 20) -> httpx.AsyncClient:
+    """Create a pooled HTTP client for the browserless tracking backend.
+
+    The client never stores cookies, so concurrent tracking requests sharing it don't share a session
+    on the tracking website.
+
+    Args:
+        proxy (Optional[str]): Proxy URL to send the requests through. Defaults to None.
+        max_connections (int): Maximum number of concurrent connections. Defaults to 20.
+
+    Returns:
+        httpx.AsyncClient: The HTTP client.
+    """
+    return httpx.AsyncClient(
+        proxy=proxy,
+        cookies=CookieJar(policy=_RejectCookiesPolicy()),
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        follow_redirects=True,
+    )
+
+
+class Tracker(Protocol):
+    """
+    Interface of the parcel trackers, implemented by `ParcelTracker` and by pools of tracking worker processes.
+    """
+
+    async def track_as_text(self, tracking_number: str, timeout: Optional[float] = None) -> list[TrackingRecord]: ...
+
+    async def track_as_image(self, tracking_number: str, timeout: Optional[float] = None) -> bytes: ...
+
+    async def track_as_text_and_image(self, tracking_number: str, timeout: Optional[float] = None) -> TrackingSnapshot: ...
+
+
 class ParcelTracker:
     """
     A class to track parcels using the Iran Post Tracking website. Provides methods
@@ -40,94 +187,205 @@ class ParcelTracker:
     Args:
         normalizer (Optional[Callable[[str], str]]): A function to normalize the extracted text data. Defaults to None.
         proxy (Optional[ProxySettings]): Proxy settings for web scraping requests. Defaults to None.
+        proxy_pool (Optional[ProxyPool]): A pool of proxies to spread the requests over, instead of `proxy`. A browser
+            pool picks the proxies of its pages from its own proxy pool. Defaults to None.
+        browser_pool (Optional[BrowserPool]): A started pool of warm browsers to open the tracking website in.
+            If not provided, a new browser is launched for every request. Defaults to None.
+        http_client (Optional[httpx.AsyncClient | Mapping[str, httpx.AsyncClient]]): An HTTP client used to fetch
+            text results without a browser, falling back to the browser when it fails, or one client per proxy URL
+            of the proxy pool. See `create_http_client`. Defaults to None.
+        base_url (str): URL of the tracking website. Defaults to "https://tracking.post.ir/".
+        text_resources (Optional[ResourcePolicy]): The requests the tracking website may make when fetching text
+            results; the others are aborted. If None, nothing is blocked. Defaults to first-party documents,
+            scripts and XHRs.
+        image_resources (Optional[ResourcePolicy]): The requests the tracking website may make when taking a
+            screenshot. If None, nothing is blocked. Defaults to first-party documents, scripts, XHRs,
+            stylesheets, images and fonts.
+        screenshot_options (ScreenshotOptions): Rendering and encoding options of screenshots. The device scale
+            factor applies to browsers launched by the tracker; a browser pool has its own. Defaults to JPEG
+            screenshots of a 1280 pixels wide page, within 500 KiB.
+        user_agents (Optional[UserAgentPool]): The user agents to pick the user agent of a request from. Defaults to
+            a pool of all the user agents of `fake_useragent`, shared by the trackers.
+        on_screenshot (Optional[Callable[[str, bytes], None]]): A function called with the tracking number and the
+            screenshot of the tracking result after a text lookup made with the browser, e.g. to cache the screenshot.
+            The screenshot is taken from the loaded page and encoded in the background, and the text lookups load
+            the resources of `image_resources` so that it renders as the image lookups do. Defaults to None.
     """
 
-    def __init__(self, normalizer: Optional[Callable[[str], str]] = None, proxy: Optional[ProxySettings] = None) -> None:
+    def __init__(
+        self,
+        normalizer: Optional[Callable[[str], str]] = None,
+        proxy: Optional["ProxySettings"] = None,
+        proxy_pool: Optional[ProxyPool] = None,
+        browser_pool: Optional[BrowserPool] = None,
+        http_client: Optional[httpx.AsyncClient | Mapping[str, httpx.AsyncClient]] = None,
+        base_url: str = TRACKING_BASE_URL,
+        text_resources: Optional[ResourcePolicy] = ResourcePolicy.create(TEXT_RESOURCE_TYPES),
+        image_resources: Optional[ResourcePolicy] = ResourcePolicy.create(SCREENSHOT_RESOURCE_TYPES),
+        screenshot_options: ScreenshotOptions = ScreenshotOptions(),
+        user_agents: Optional[UserAgentPool] = None,
+        on_screenshot: Optional[Callable[[str, bytes], None]] = None,
+    ) -> None:
         self.normalizer = normalizer
         self.proxy = proxy
-        self._sep = " | "
+        self.proxy_pool = proxy_pool
+        self.browser_pool = browser_pool
+        self.http_client = http_client
+        self.base_url = base_url
+        self.text_resources = text_resources
+        self.image_resources = image_resources
+        self.screenshot_options = screenshot_options
+        self.user_agents = user_agents if user_agents is not None else _default_user_agents
+        self.on_screenshot = on_screenshot
+
+    def _tracking_url(self, tracking_number: str) -> str:
+        return urljoin(self.base_url, f"?id={tracking_number}")
 
     @asynccontextmanager
-    async def _open_tracking_page(self, tracking_number: str, timeout: Optional[float]) -> AsyncGenerator[Page, None]:
+    async def _open_tracking_page(
+        self, tracking_number: str, timeout: Optional[float], resources: Optional[ResourcePolicy]
+    ) -> AsyncGenerator["Page", None]:
         timeout_ms = timeout * 1000 if timeout else None
-        async with async_playwright() as playwright:
-            browser = await playwright.chromium.launch(args=["--no-sandbox", "--disable-setuid-sandbox"], headless=True)
+        monitor = ResourceMonitor(self.base_url, resources)
+
+        async with AsyncExitStack() as stack:
+            with timed("browser"):
+                if self.browser_pool is not None:
+                    page = await stack.enter_async_context(
+                        self.browser_pool.page(proxy=self.proxy, user_agent=self.user_agents.random())
+                    )
+                else:
+                    proxy = self.proxy
+                    if self.proxy_pool is not None:
+                        proxy = self.proxy_pool.browser_proxy(stack.enter_context(self.proxy_pool.use()))
+                    from playwright.async_api import async_playwright
+
+                    playwright = await stack.enter_async_context(async_playwright())
+                    browser = await playwright.chromium.launch(args=LAUNCH_ARGS, headless=True)
+                    stack.push_async_callback(browser.close)
+                    context = await browser.new_context(
+                        user_agent=self.user_agents.random(),
+                        proxy=proxy,
+                        device_scale_factor=self.screenshot_options.device_scale_factor,
+                    )
+                    page = await context.new_page()
+
             try:
-                context = await browser.new_context(user_agent=UserAgent().random, proxy=self.proxy)
-                page = await context.new_page()
-                await page.goto(f"https://tracking.post.ir/?id={tracking_number}", wait_until="load", timeout=timeout_ms)
-            except Exception:
-                await browser.close()
-                raise
-            yield page
-            await browser.close()
+                await monitor.attach(page)
+                with timed("goto"):
+                    await page.goto(self._tracking_url(tracking_number), wait_until="domcontentloaded", timeout=timeout_ms)
+                    await page.wait_for_selector("#btnSearch", timeout=timeout_ms)
+                yield page
+            finally:
+                logger.info(f"Resources loaded for {tracking_number}: {await monitor.summary()}")
 
     @staticmethod
-    async def _extract_tracking_rows(page: Page) -> list[ElementHandle]:
-        await page.click("#btnSearch")
-        await page.wait_for_selector("#pnlMain")
+    async def _extract_tracking_rows(page: "Page") -> list[list[Optional[str]]]:
+        with timed("search"):
+            await page.click("#btnSearch")
+            await page.wait_for_selector("#pnlMain")
 
-        all_row_divs = await page.query_selector_all("#pnlResult div.row")
+        # Collect the cells of all rows (or the alert text) in a single round-trip to the browser
+        with timed("extract"):
+            extracted: dict[str, Any] = await page.evaluate(_EXTRACT_ROWS_SCRIPT)
+        rows: list[list[Optional[str]]] = extracted["rows"]
 
-        if not all_row_divs:
-            alert_divs = await page.query_selector_all("#pnlResult div.alert")
-            if alert_divs:
-                raise TrackingError(await alert_divs[0].text_content())
+        if not rows and extracted["alert"] is not None:
+            raise TrackingError(extracted["alert"])
 
-        return all_row_divs
+        return rows
 
     @staticmethod
-    def _parse_tracking_result(result: list[str], sep: str) -> list[TrackingRecord]:
-        items: list[TrackingRecord] = []
-
-        date: Optional[str] = None
-
-        for item in result:
-            if "موقعیت" in item and "ساعت" in item:
-                date = item.split(sep)[0]
-                continue
-
-            parts = [part.strip() for part in item.split(sep)]
-
-            if len(parts) == 3:
-                record = TrackingRecord(
-                    id=int(parts[0]),
-                    time=parts[2],
-                    description=parts[1],
-                )
-            elif len(parts) == 4:
-                record = TrackingRecord(
-                    id=int(parts[0]),
-                    time=parts[3],
-                    location=parts[2],
-                    description=parts[1],
-                )
-
-            if date:
-                record.date = date
-
-            items.append(record)
-
-        return items
-
-    async def _extract_tracking_records(self, tracking_rows: list[ElementHandle]) -> list[TrackingRecord]:
-        result: list[str] = []
-        for div in tracking_rows:
-            columns = await div.query_selector_all("div.newtddata")
-            if not columns:
-                columns = await div.query_selector_all("div.newtdheader")
-            row_data = [await column.text_content() for column in columns]
-            if not row_data:
+    def _postback_form_data(form: LexborNode, tracking_number: str) -> dict[str, str]:
+        data: dict[str, str] = {}
+        text_inputs: list[str] = []
+        for node in form.css("input, select, textarea"):
+            name = node.attributes.get("name")
+            if not name:
                 continue
-            result.append(self._sep.join(value.strip() for value in row_data if value))
+            if node.tag == "select":
+                option = node.css_first("option[selected]") or node.css_first("option")
+                data[name] = (option.attributes.get("value") or option.text()) if option else ""
+            elif node.tag == "textarea":
+                data[name] = node.text()
+            else:
+                input_type = (node.attributes.get("type") or "text").lower()
+                if input_type in ("submit", "button", "image", "reset", "file"):
+                    continue
+                if input_type in ("checkbox", "radio") and "checked" not in node.attributes:
+                    continue
+                if input_type in ("text", "search", "tel", "number"):
+                    text_inputs.append(name)
+                data[name] = node.attributes.get("value") or ""
+
+        if text_inputs and tracking_number not in data.values():
+            data[text_inputs[0]] = tracking_number
+
+        button = form.css_first("#btnSearch")
+        if button is None:
+            raise ValueError("Search button not found in the tracking form.")
+        if match := _POSTBACK_PATTERN.search(button.attributes.get("href") or button.attributes.get("onclick") or ""):
+            data["__EVENTTARGET"], data["__EVENTARGUMENT"] = match.groups()
+        elif name := button.attributes.get("name"):
+            data[name] = button.attributes.get("value") or ""
+        else:
+            raise ValueError("Unable to submit the tracking form.")
+
+        return data
 
-        if not result:
-            return []
+    @staticmethod
+    def _parse_tracking_html(html: str) -> list[list[Optional[str]]]:
+        tree = LexborHTMLParser(html)
+        if tree.css_first("#pnlMain") is None:
+            raise ValueError("Tracking result panel not found.")
 
-        if self.normalizer:
-            result = [self.normalizer(item) for item in result]
+        all_row_divs = tree.css("#pnlResult div.row")
 
-        return self._parse_tracking_result(result, self._sep)
+        if not all_row_divs:
+            if alert_div := tree.css_first("#pnlResult div.alert"):
+                raise TrackingError(alert_div.text().strip())
+
+        rows: list[list[Optional[str]]] = []
+        for div in all_row_divs:
+            columns = div.css("div.newtddata") or div.css("div.newtdheader")
+            rows.append([column.text() for column in columns])
+        return rows
+
+    async def _fetch_tracking_rows(self, tracking_number: str, timeout: Optional[float]) -> list[list[Optional[str]]]:
+        if self.http_client is None:
+            raise RuntimeError("HTTP client is not configured.")
+        if isinstance(self.http_client, httpx.AsyncClient):
+            return await self._post_tracking_form(self.http_client, tracking_number, timeout)
+        if self.proxy_pool is None:
+            raise RuntimeError("Proxy pool is not configured.")
+        with self.proxy_pool.use() as url:
+            return await self._post_tracking_form(self.http_client[url], tracking_number, timeout)
+
+    async def _post_tracking_form(
+        self, client: httpx.AsyncClient, tracking_number: str, timeout: Optional[float]
+    ) -> list[list[Optional[str]]]:
+        with timed("http"):
+            headers = {"User-Agent": self.user_agents.random()}
+            response = await client.get(self._tracking_url(tracking_number), headers=headers, timeout=timeout)
+            response.raise_for_status()
+
+            form = LexborHTMLParser(response.text).css_first("form")
+            if form is None:
+                raise ValueError("Tracking form not found.")
+            data = self._postback_form_data(form, tracking_number)
+
+            if response.cookies:
+                headers["Cookie"] = "; ".join(f"{name}={value}" for name, value in response.cookies.items())
+            action = urljoin(str(response.url), form.attributes.get("action") or "")
+            response = await client.post(action, data=data, headers=headers, timeout=timeout)
+            response.raise_for_status()
+
+        with timed("extract"):
+            return self._parse_tracking_html(response.text)
+
+    def _extract_tracking_records(self, rows: list[list[Optional[str]]]) -> list[TrackingRecord]:
+        with timed("normalize"):
+            return [event.to_record() for event in parse_tracking_rows(rows, self.normalizer)]
 
     async def track_as_text(self, tracking_number: str, timeout: Optional[float] = None) -> list[TrackingRecord]:
         """Fetch tracking details as structured text records.
@@ -142,9 +400,64 @@ class ParcelTracker:
         Raises:
             TrackingError: Raised when the tracking service returns an error. The exception message provides the tracking error message.
         """
-        async with self._open_tracking_page(tracking_number, timeout) as page:
+        if self.http_client is not None:
+            try:
+                rows = await self._fetch_tracking_rows(tracking_number, timeout)
+            except TrackingError:
+                raise
+            except Exception as e:
+                logger.warning(f"HTTP tracking failed for {tracking_number}, falling back to the browser: {e!r}")
+            else:
+                return self._extract_tracking_records(rows)
+
+        if self.on_screenshot is None:
+            async with self._open_tracking_page(tracking_number, timeout, self.text_resources) as page:
+                tracking_rows = await self._extract_tracking_rows(page)
+                return self._extract_tracking_records(tracking_rows)
+
+        async with self._open_tracking_page(tracking_number, timeout, self.image_resources) as page:
             tracking_rows = await self._extract_tracking_rows(page)
-            return await self._extract_tracking_records(tracking_rows)
+            png = await self._take_screenshot(page, timeout)
+        self._encode_in_background(tracking_number, tracking_rows, png, self.on_screenshot)
+        return self._extract_tracking_records(tracking_rows)
+
+    async def _take_screenshot(self, page: "Page", timeout: Optional[float]) -> bytes:
+        with timed("screenshot"):
+            with suppress(Exception):
+                await page.wait_for_load_state("load", timeout=timeout * 1000 if timeout else None)
+            await page.set_viewport_size({"width": self.screenshot_options.width, "height": 1080})
+            if result_panel := await page.query_selector("#pnlResult"):
+                return await result_panel.screenshot(type="png")
+            return await page.screenshot(type="png", full_page=True)
+
+    async def _encode_screenshot(self, tracking_number: str, rows: list[list[Optional[str]]], png: bytes) -> Screenshot:
+        started_at = time.perf_counter()
+        with timed("encode"):
+            screenshot = await asyncio.to_thread(encode_screenshot, png, self.screenshot_options)
+        logger.info(
+            f"Screenshot of {tracking_number}: {len(screenshot) / 1024:.1f} KiB {self.screenshot_options.format} "
+            f"(raw PNG {len(png) / 1024:.1f} KiB), encoded in {(time.perf_counter() - started_at) * 1000:.0f} ms"
+        )
+        return Screenshot(screenshot, self._state_key(tracking_number, rows))
+
+    def _state_key(self, tracking_number: str, rows: list[list[Optional[str]]]) -> str:
+        # The rendering options are part of the key, so that the screenshots are uploaded again once they change
+        return content_hash(json.dumps([tracking_number, rows, self.screenshot_options], ensure_ascii=False).encode())
+
+    def _encode_in_background(
+        self, tracking_number: str, rows: list[list[Optional[str]]], png: bytes, on_screenshot: Callable[[str, bytes], None]
+    ) -> None:
+        async def encode() -> None:
+            on_screenshot(tracking_number, await self._encode_screenshot(tracking_number, rows, png))
+
+        def forget(task: "asyncio.Task[None]") -> None:
+            _background_tasks.discard(task)
+            if not task.cancelled() and (exc := task.exception()) is not None:
+                logger.warning(f"Failed to encode the screenshot of {tracking_number}: {exc!r}")
+
+        task = asyncio.create_task(encode())
+        _background_tasks.add(task)
+        task.add_done_callback(forget)
 
     async def track_as_image(self, tracking_number: str, timeout: Optional[float] = None) -> bytes:
         """Fetch tracking details as a screenshot image.
@@ -154,18 +467,41 @@ class ParcelTracker:
             timeout (Optional[float]): Timeout for loading the tracking website, in seconds. Defaults to None.
 
         Returns:
-            bytes: The screenshot of the tracking website in PNG format.
+            bytes: The screenshot of the tracking result, in the format of the screenshot options. A `Screenshot`, keyed
+                by the tracking state it shows.
 
         Raises:
             TrackingError: Raised when the tracking service returns an error. The exception message provides the tracking error message.
         """
-        async with self._open_tracking_page(tracking_number, timeout) as page:
-            await self._extract_tracking_rows(page)
-            content_height = 2000
-            with suppress(Exception):
-                content_height = await page.evaluate("document.documentElement.scrollHeight")
-            await page.set_viewport_size(ViewportSize(width=1920, height=content_height))
-            return await page.screenshot(type="png")
+        async with self._open_tracking_page(tracking_number, timeout, self.image_resources) as page:
+            tracking_rows = await self._extract_tracking_rows(page)
+            png = await self._take_screenshot(page, timeout)
+        return await self._encode_screenshot(tracking_number, tracking_rows, png)
+
+    async def track_as_text_and_image(self, tracking_number: str, timeout: Optional[float] = None) -> TrackingSnapshot:
+        """Fetch tracking details as structured text records and as a screenshot image, from a single page load.
+
+        Args:
+            tracking_number (str): The tracking number of the parcel.
+            timeout (Optional[float]): Timeout for loading the tracking website, in seconds. Defaults to None.
+
+        Returns:
+            TrackingSnapshot: The `TrackingRecord` items and the screenshot of the tracking result.
+
+        Raises:
+            TrackingError: Raised when the tracking service returns an error. The exception message provides the tracking error message.
+        """
+        async with self._open_tracking_page(tracking_number, timeout, self.image_resources) as page:
+            tracking_rows = await self._extract_tracking_rows(page)
+            png = await self._take_screenshot(page, timeout)
+        # The page is closed before parsing and encoding, so that the browser is leased as briefly as possible
+        records = self._extract_tracking_records(tracking_rows)
+        return TrackingSnapshot(records, await self._encode_screenshot(tracking_number, tracking_rows, png))
 
     def __repr__(self) -> str:
-        return f"ParcelTracker<(normalizer={self.normalizer}, proxy={self.proxy})>"
+        return (
+            f"ParcelTracker<(normalizer={self.normalizer}, proxy={self.proxy}, proxy_pool={self.proxy_pool}, "
+            f"browser_pool={self.browser_pool}, http_client={self.http_client}, "
+            f"text_resources={self.text_resources}, image_resources={self.image_resources}, "
+            f"screenshot_options={self.screenshot_options})>"
+        )
@@ -0,0 +1,82 @@
+import bisect
+import logging
+import random
+import threading
+from typing import Optional, Sequence
+
+__all__ = ("FALLBACK_USER_AGENT", "UserAgentPool")
+
+logger = logging.getLogger(__name__)
+
+FALLBACK_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36"
+)
+
+
+class UserAgentPool:
+    """
+    A pool of real-world user agents to pick from at random, weighted by their usage share. The user agent dataset
+    of `fake_useragent` is loaded once, on first use or with `load`, and kept as a compact list of strings and
+    cumulative weights, so that picking a user agent is a binary search instead of a scan of the whole dataset.
+
+    Args:
+        browsers (Optional[Sequence[str]]): Browsers to keep, e.g. ["Chrome", "Edge"]. If None, all browsers are
+            kept. Defaults to None.
+        platforms (Optional[Sequence[str]]): Platforms to keep, e.g. ["desktop"]. If None, all platforms are kept.
+            Defaults to None.
+    """
+
+    def __init__(self, browsers: Optional[Sequence[str]] = None, platforms: Optional[Sequence[str]] = None) -> None:
+        self.browsers = browsers
+        self.platforms = platforms
+        self._user_agents: Optional[list[str]] = None
+        self._cum_weights: list[float] = []
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._user_agents is not None
+
+    def __len__(self) -> int:
+        return len(self._user_agents or ())
+
+    def load(self) -> None:
+        """Load the user agent dataset, if not loaded yet. Safe to call from several threads."""
+        with self._lock:
+            if self._user_agents is not None:
+                return
+            user_agents: list[str] = []
+            cum_weights: list[float] = []
+            try:
+                from fake_useragent import UserAgent
+
+                data = UserAgent().data_browsers
+            except Exception as e:
+                logger.warning(f"Failed to load user agents, using a fallback user agent: {e}")
+                data = []
+
+            total = 0.0
+            for entry in data:
+                if self.browsers is not None and entry.get("browser") not in self.browsers:
+                    continue
+                if self.platforms is not None and entry.get("type") not in self.platforms:
+                    continue
+                total += max(float(entry.get("percent") or 0.0), 1e-6)
+                user_agents.append(entry["useragent"])
+                cum_weights.append(total)
+
+            if not user_agents:
+                user_agents, cum_weights = [FALLBACK_USER_AGENT], [1.0]
+            self._cum_weights = cum_weights
+            self._user_agents = user_agents
+
+    def random(self) -> str:
+        """Pick a user agent at random, weighted by usage share."""
+        if self._user_agents is None:
+            self.load()
+        assert self._user_agents is not None
+        index = bisect.bisect(self._cum_weights, random.random() * self._cum_weights[-1])
+        return self._user_agents[min(index, len(self._user_agents) - 1)]
+
+    def __repr__(self) -> str:
+        return f"UserAgentPool<(browsers={self.browsers}, platforms={self.platforms}, size={len(self)})>"
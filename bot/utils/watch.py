@@ -0,0 +1,143 @@
+import sqlite3
+import time
+from typing import NamedTuple, Optional
+
+from .sqlite import SQLiteStore
+
+__all__ = ("WATCH_USER_ID", "WatchedParcel", "WatchStore")
+
+WATCH_USER_ID = "watch"
+"""The user the checks of the watched parcels are queued as in the tracking scheduler."""
+
+
+class WatchedParcel(NamedTuple):
+    tracking_number: str
+    checked_at: Optional[float]
+    interval: float
+    delivered: bool
+
+
+class WatchStore(SQLiteStore):
+    """
+    A SQLite store of parcel watch subscriptions and the check schedule of every watched parcel. A parcel watched by
+    several chats is stored (and checked) once. The events of the parcels are kept in the tracking history store.
+
+    Args:
+        path (str): Path to the SQLite database file.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS watches (
+            chat_id INTEGER NOT NULL,
+            tracking_number TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (chat_id, tracking_number)
+        );
+        CREATE INDEX IF NOT EXISTS watches_tracking_number ON watches (tracking_number);
+        CREATE TABLE IF NOT EXISTS watched_parcels (
+            tracking_number TEXT PRIMARY KEY,
+            checked_at REAL,
+            interval REAL NOT NULL,
+            next_check_at REAL NOT NULL,
+            delivered INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS watched_parcels_next_check_at ON watched_parcels (next_check_at);
+    """
+
+    def _migrate(self, connection: sqlite3.Connection) -> None:
+        # The last known events of a parcel used to be stored in the table instead of its last check time
+        columns = {row[1] for row in connection.execute("PRAGMA table_info(watched_parcels)")}
+        if "checked_at" not in columns:
+            connection.execute("ALTER TABLE watched_parcels ADD COLUMN checked_at REAL")
+
+    def add(self, chat_id: int, tracking_number: str, interval: float) -> bool:
+        """Subscribe a chat to a parcel. Returns False if the chat already watches the parcel."""
+        now = time.time()
+        with self._lock, self.connection as connection:
+            cursor = connection.execute(
+                "INSERT OR IGNORE INTO watches (chat_id, tracking_number, created_at) VALUES (?, ?, ?)",
+                (chat_id, tracking_number, now),
+            )
+            connection.execute(
+                "INSERT OR IGNORE INTO watched_parcels (tracking_number, interval, next_check_at) VALUES (?, ?, ?)",
+                (tracking_number, interval, now),
+            )
+            return cursor.rowcount > 0
+
+    def remove(self, chat_id: int, tracking_number: str) -> bool:
+        """Unsubscribe a chat from a parcel. Returns False if the chat doesn't watch the parcel."""
+        with self._lock, self.connection as connection:
+            cursor = connection.execute(
+                "DELETE FROM watches WHERE chat_id = ? AND tracking_number = ?", (chat_id, tracking_number)
+            )
+            connection.execute(
+                "DELETE FROM watched_parcels WHERE tracking_number = ? "
+                "AND NOT EXISTS (SELECT 1 FROM watches WHERE watches.tracking_number = watched_parcels.tracking_number)",
+                (tracking_number,),
+            )
+            return cursor.rowcount > 0
+
+    def watched_by(self, chat_id: int) -> list[str]:
+        """Get the tracking numbers watched by a chat, oldest first."""
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT tracking_number FROM watches WHERE chat_id = ? ORDER BY created_at", (chat_id,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def watched(self) -> list[str]:
+        """Get the tracking numbers of all the watched parcels."""
+        with self._lock:
+            rows = self.connection.execute("SELECT tracking_number FROM watched_parcels").fetchall()
+        return [row[0] for row in rows]
+
+    def due(self, now: float, limit: int) -> list[WatchedParcel]:
+        """Get up to `limit` watched parcels due for a check, most overdue first."""
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT tracking_number, checked_at, interval, delivered FROM watched_parcels "
+                "WHERE next_check_at <= ? ORDER BY next_check_at LIMIT ?",
+                (now, limit),
+            ).fetchall()
+        return [
+            WatchedParcel(
+                tracking_number=tracking_number,
+                checked_at=checked_at,
+                interval=interval,
+                delivered=bool(delivered),
+            )
+            for tracking_number, checked_at, interval, delivered in rows
+        ]
+
+    def subscribers(self, tracking_numbers: list[str]) -> dict[str, list[int]]:
+        """Get the chats watching each of the given parcels."""
+        if not tracking_numbers:
+            return {}
+        placeholders = ", ".join("?" * len(tracking_numbers))
+        with self._lock:
+            rows = self.connection.execute(
+                f"SELECT tracking_number, chat_id FROM watches WHERE tracking_number IN ({placeholders})",
+                tracking_numbers,
+            ).fetchall()
+        result: dict[str, list[int]] = {}
+        for tracking_number, chat_id in rows:
+            result.setdefault(tracking_number, []).append(chat_id)
+        return result
+
+    def update(self, parcels: list[tuple[WatchedParcel, float]]) -> None:
+        """Store the last check time, the status and the next check time of a batch of watched parcels."""
+        with self._lock, self.connection as connection:
+            connection.executemany(
+                "UPDATE watched_parcels SET checked_at = ?, interval = ?, next_check_at = ?, delivered = ? "
+                "WHERE tracking_number = ?",
+                [
+                    (
+                        parcel.checked_at,
+                        parcel.interval,
+                        next_check_at,
+                        int(parcel.delivered),
+                        parcel.tracking_number,
+                    )
+                    for parcel, next_check_at in parcels
+                ],
+            )
@@ -0,0 +1,264 @@
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import pickle
+import signal
+from contextlib import AbstractAsyncContextManager, suppress
+from multiprocessing.connection import Connection
+from multiprocessing.process import BaseProcess
+from typing import Any, Callable, Optional
+
+from bot.models import TrackingRecord, TrackingSnapshot
+
+from .browser import _read_rss_mb
+from .exceptions import WorkerCrashedError
+from .metrics import RequestTrace, observe_stage, recording
+from .tracking import Tracker
+
+__all__ = ("TrackerSetup", "TrackingWorkerPool")
+
+logger = logging.getLogger(__name__)
+
+TrackerSetup = Callable[[], AbstractAsyncContextManager[Tracker]]
+"""A module-level function returning a context manager that runs the tracker of a worker process."""
+
+MONITOR_INTERVAL = 1.0
+STOP_TIMEOUT = 10.0
+
+
+def _picklable_error(error: BaseException) -> BaseException:
+    try:
+        pickle.dumps(error)
+    except Exception:
+        return RuntimeError(repr(error))
+    return error
+
+
+async def _serve(connection: Connection, setup: TrackerSetup) -> None:
+    loop = asyncio.get_running_loop()
+    requests: asyncio.Queue[Optional[tuple[int, str, tuple[Any, ...]]]] = asyncio.Queue()
+
+    def receive() -> None:
+        try:
+            while connection.poll():
+                requests.put_nowait(connection.recv())
+        except (EOFError, OSError):
+            # The dispatcher is gone
+            loop.remove_reader(connection.fileno())
+            requests.put_nowait(None)
+
+    async def run(tracker: Tracker, job_id: int, method: str, args: tuple[Any, ...]) -> None:
+        # The stage timings of the job are sent back with its result, the dispatcher exposes the metrics
+        with recording(RequestTrace(method)) as trace:
+            try:
+                result = await getattr(tracker, method)(*args)
+            except Exception as e:
+                response = (job_id, False, _picklable_error(e), trace.stages)
+            else:
+                response = (job_id, True, result, trace.stages)
+        with suppress(OSError):
+            connection.send(response)
+
+    jobs: set[asyncio.Task[None]] = set()
+    async with setup() as tracker:
+        loop.add_reader(connection.fileno(), receive)
+        while (request := await requests.get()) is not None:
+            task = asyncio.create_task(run(tracker, *request))
+            jobs.add(task)
+            task.add_done_callback(jobs.discard)
+        if jobs:
+            await asyncio.wait(jobs)
+
+
+def _worker_main(connection: Connection, setup: TrackerSetup) -> None:
+    # The dispatcher handles Ctrl+C and stops the workers gracefully
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
+    asyncio.run(_serve(connection, setup))
+    connection.close()
+
+
+class _Worker:
+    def __init__(self, process: BaseProcess, connection: Connection) -> None:
+        self.process = process
+        self.connection = connection
+        self.inflight: dict[int, asyncio.Future[tuple[bool, Any, dict[str, float]]]] = {}
+        self.jobs = 0
+        self.draining = False
+
+
+class TrackingWorkerPool:
+    """
+    A pool of worker processes running tracking jobs, so that browser control, parsing and image encoding
+    don't compete with the Telegram dispatcher for its event loop. Jobs are sent to the worker with the
+    fewest jobs in flight over a pipe, and the dispatcher only awaits their results. A worker that crashes
+    is replaced, and a worker is drained and replaced after a number of jobs or when its memory usage
+    exceeds a ceiling. The pool implements the `Tracker` interface.
+
+    Args:
+        setup (TrackerSetup): A module-level function (workers are spawned, so it must be importable) returning a
+            context manager that runs the tracker of a worker process.
+        processes (int): Number of worker processes. Defaults to 2.
+        max_jobs (Optional[int]): Number of jobs after which a worker is replaced. Defaults to 1000.
+        max_memory_mb (Optional[float]): Resident memory ceiling of a worker process, in megabytes, above which it
+            is replaced. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        setup: TrackerSetup,
+        processes: int = 2,
+        max_jobs: Optional[int] = 1000,
+        max_memory_mb: Optional[float] = None,
+    ) -> None:
+        if processes < 1:
+            raise ValueError("Number of worker processes must be at least 1.")
+        self.setup = setup
+        self.processes = processes
+        self.max_jobs = max_jobs
+        self.max_memory_mb = max_memory_mb
+        self._context = multiprocessing.get_context("spawn")
+        self._workers: list[_Worker] = []
+        self._job_ids = itertools.count()
+        self._monitor: Optional[asyncio.Task[None]] = None
+
+    @property
+    def started(self) -> bool:
+        return self._monitor is not None
+
+    def _spawn(self) -> None:
+        connection, child_connection = self._context.Pipe()
+        process = self._context.Process(target=_worker_main, args=(child_connection, self.setup), daemon=True)
+        process.start()
+        child_connection.close()
+
+        worker = _Worker(process, connection)
+        self._workers.append(worker)
+        asyncio.get_running_loop().add_reader(connection.fileno(), self._receive, worker)
+
+    def _receive(self, worker: _Worker) -> None:
+        try:
+            while worker.connection.poll():
+                job_id, ok, payload, stages = worker.connection.recv()
+                future = worker.inflight.pop(job_id, None)
+                if future is not None and not future.done():
+                    future.set_result((ok, payload, stages))
+        except (EOFError, OSError):
+            self._remove(worker)
+            return
+        if worker.draining and not worker.inflight:
+            self._shutdown(worker)
+
+    def _shutdown(self, worker: _Worker) -> None:
+        with suppress(OSError):
+            worker.connection.send(None)
+
+    def _remove(self, worker: _Worker) -> None:
+        if worker not in self._workers:
+            return
+        self._workers.remove(worker)
+        with suppress(Exception):
+            asyncio.get_running_loop().remove_reader(worker.connection.fileno())
+        worker.connection.close()
+
+        if worker.inflight:
+            logger.warning(f"Tracking worker {worker.process.pid} exited with {len(worker.inflight)} jobs in flight")
+        for future in worker.inflight.values():
+            if not future.done():
+                future.set_exception(WorkerCrashedError(f"Tracking worker {worker.process.pid} exited."))
+        worker.inflight.clear()
+
+    def _drain(self, worker: _Worker, reason: str) -> None:
+        logger.info(f"Replacing tracking worker {worker.process.pid}: {reason}")
+        worker.draining = True
+        self._spawn()
+        if not worker.inflight:
+            self._shutdown(worker)
+
+    async def _monitor_workers(self) -> None:
+        while True:
+            await asyncio.sleep(MONITOR_INTERVAL)
+            # Replace the workers that exited, at most once per interval in case they keep crashing on startup
+            for _ in range(self.processes - sum(not worker.draining for worker in self._workers)):
+                self._spawn()
+            for worker in list(self._workers):
+                if not worker.process.is_alive():
+                    self._remove(worker)
+                elif worker.draining:
+                    continue
+                elif self.max_jobs is not None and worker.jobs >= self.max_jobs:
+                    self._drain(worker, f"{worker.jobs} jobs run")
+                elif self.max_memory_mb is not None and worker.process.pid is not None:
+                    rss_mb = await asyncio.to_thread(_read_rss_mb, worker.process.pid)
+                    if rss_mb > self.max_memory_mb:
+                        self._drain(worker, f"{rss_mb:.0f} MB resident memory")
+
+    async def start(self) -> None:
+        """Spawn the worker processes."""
+        if self._monitor is not None:
+            return
+        for _ in range(self.processes):
+            self._spawn()
+        self._monitor = asyncio.create_task(self._monitor_workers())
+
+    async def stop(self) -> None:
+        """Stop the worker processes, after they finish the jobs in flight."""
+        if self._monitor is None:
+            return
+        self._monitor.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._monitor
+        self._monitor = None
+
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            self._shutdown(worker)
+        for worker in workers:
+            await asyncio.to_thread(worker.process.join, STOP_TIMEOUT)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            with suppress(Exception):
+                asyncio.get_running_loop().remove_reader(worker.connection.fileno())
+            worker.connection.close()
+
+    async def _submit(self, method: str, *args: Any) -> Any:
+        workers = [worker for worker in self._workers if not worker.draining]
+        if not workers:
+            raise RuntimeError("Tracking worker pool is not started.")
+        worker = min(workers, key=lambda worker: len(worker.inflight))
+
+        job_id = next(self._job_ids)
+        future: asyncio.Future[tuple[bool, Any, dict[str, float]]] = asyncio.get_running_loop().create_future()
+        worker.inflight[job_id] = future
+        worker.jobs += 1
+        try:
+            worker.connection.send((job_id, method, args))
+        except OSError as e:
+            worker.inflight.pop(job_id, None)
+            raise WorkerCrashedError(f"Tracking worker {worker.process.pid} exited.") from e
+
+        ok, payload, stages = await future
+        for stage, seconds in stages.items():
+            observe_stage(stage, seconds)
+        if not ok:
+            raise payload
+        return payload
+
+    async def track_as_text(self, tracking_number: str, timeout: Optional[float] = None) -> list[TrackingRecord]:
+        """Fetch tracking details as structured text records in a worker process. See `ParcelTracker.track_as_text`."""
+        result: list[TrackingRecord] = await self._submit("track_as_text", tracking_number, timeout)
+        return result
+
+    async def track_as_image(self, tracking_number: str, timeout: Optional[float] = None) -> bytes:
+        """Fetch tracking details as a screenshot image in a worker process. See `ParcelTracker.track_as_image`."""
+        result: bytes = await self._submit("track_as_image", tracking_number, timeout)
+        return result
+
+    async def track_as_text_and_image(self, tracking_number: str, timeout: Optional[float] = None) -> TrackingSnapshot:
+        """Fetch text records and a screenshot in a worker process. See `ParcelTracker.track_as_text_and_image`."""
+        result: TrackingSnapshot = await self._submit("track_as_text_and_image", tracking_number, timeout)
+        return result
+
+    def __repr__(self) -> str:
+        return f"TrackingWorkerPool<(processes={self.processes}, max_jobs={self.max_jobs}, max_memory_mb={self.max_memory_mb})>"
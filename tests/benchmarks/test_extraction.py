@@ -0,0 +1,112 @@
+"""
+Microbenchmark of the DOM extraction of tracking rows.
+
+The fake page below answers every call after a fixed delay, standing in for one CDP round-trip to the
+browser, and counts the calls. The per-element extraction that `ParcelTracker` used before is kept here
+as the baseline.
+"""
+
+import asyncio
+from typing import Any, Optional
+
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from bot.utils.text import normalize_text
+from bot.utils.tracking import ParcelTracker
+
+ROUND_TRIP_DELAY = 0.0002
+EVENT_COUNT = 30
+
+HEADER_ROW = ["سه شنبه 1403/10/11", "شرح", "موقعیت", "ساعت"]
+EVENT_ROWS = [
+    [str(i), f"مرسوله در مرکز مبادلات{i}پردازش شد (مشاهده جزئیات)", "تهران،مرکز مبادلات", f"{i % 24:02d}:30"]
+    for i in range(1, EVENT_COUNT + 1)
+]
+
+
+class FakeElement:
+    def __init__(self, page: "FakePage", cells: list[str], header: bool) -> None:
+        self.page = page
+        self.cells = cells
+        self.header = header
+
+    async def query_selector_all(self, selector: str) -> list["FakeElement"]:
+        await self.page.round_trip()
+        if (selector == "div.newtdheader") == self.header:
+            return [FakeElement(self.page, [cell], self.header) for cell in self.cells]
+        return []
+
+    async def text_content(self) -> Optional[str]:
+        await self.page.round_trip()
+        return self.cells[0]
+
+
+class FakePage:
+    def __init__(self, rows: list[list[str]]) -> None:
+        self.rows = rows
+        self.calls = 0
+
+    async def round_trip(self) -> None:
+        self.calls += 1
+        await asyncio.sleep(ROUND_TRIP_DELAY)
+
+    async def click(self, selector: str) -> None:
+        await self.round_trip()
+
+    async def wait_for_selector(self, selector: str) -> None:
+        await self.round_trip()
+
+    async def query_selector_all(self, selector: str) -> list[FakeElement]:
+        await self.round_trip()
+        return [FakeElement(self, row, header=row is HEADER_ROW) for row in self.rows]
+
+    async def evaluate(self, expression: str) -> dict[str, Any]:
+        await self.round_trip()
+        return {"rows": [list(row) for row in self.rows], "alert": None}
+
+
+async def _legacy_extract_rows(page: FakePage) -> list[list[Optional[str]]]:
+    await page.click("#btnSearch")
+    await page.wait_for_selector("#pnlMain")
+    rows: list[list[Optional[str]]] = []
+    for div in await page.query_selector_all("#pnlResult div.row"):
+        columns = await div.query_selector_all("div.newtddata")
+        if not columns:
+            columns = await div.query_selector_all("div.newtdheader")
+        rows.append([await column.text_content() for column in columns])
+    return rows
+
+
+def _run(tracker: ParcelTracker, page: FakePage, legacy: bool) -> int:
+    async def extract() -> None:
+        rows = await (_legacy_extract_rows(page) if legacy else tracker._extract_tracking_rows(page))  # type: ignore[arg-type]
+        tracker._extract_tracking_records(rows)
+
+    page.calls = 0
+    asyncio.run(extract())
+    return page.calls
+
+
+def test_extract_legacy_per_element(benchmark: BenchmarkFixture) -> None:
+    tracker = ParcelTracker(normalizer=normalize_text)
+    page = FakePage([HEADER_ROW, *EVENT_ROWS])
+    calls = benchmark(_run, tracker, page, True)
+    benchmark.extra_info["round_trips"] = calls
+    assert calls > 4 * EVENT_COUNT
+
+
+def test_extract_single_round_trip(benchmark: BenchmarkFixture) -> None:
+    tracker = ParcelTracker(normalizer=normalize_text)
+    page = FakePage([HEADER_ROW, *EVENT_ROWS])
+    calls = benchmark(_run, tracker, page, False)
+    benchmark.extra_info["round_trips"] = calls
+    assert calls == 3
+
+
+def test_extraction_matches_legacy() -> None:
+    tracker = ParcelTracker(normalizer=normalize_text)
+    page = FakePage([HEADER_ROW, *EVENT_ROWS])
+    legacy_rows = asyncio.run(_legacy_extract_rows(page))
+    rows = asyncio.run(tracker._extract_tracking_rows(page))  # type: ignore[arg-type]
+    assert tracker._extract_tracking_records(rows) == tracker._extract_tracking_records(legacy_rows)
+    assert len(tracker._extract_tracking_records(rows)) == EVENT_COUNT
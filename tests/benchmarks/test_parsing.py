@@ -0,0 +1,102 @@
+"""
+Microbenchmark of the normalization and parsing of tracking histories, as in the watcher and bulk tracking paths.
+
+The corpus is the cells of the recorded tracking result pages (see _bot/loadtest/pages_), repeated to a few
+thousand histories. The normalizer and parser that `ParcelTracker` used before, which joined the cells of a row,
+normalized the line with three regular expressions, split it again and validated a `TrackingRecord` per event,
+are kept here as the baseline.
+"""
+
+import re
+from typing import Optional
+
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from bot.loadtest.site import PAGES_DIR, SCENARIOS
+from bot.models import TrackingRecord
+from bot.utils.text import normalize_text
+from bot.utils.tracking import ParcelTracker, parse_tracking_rows
+
+from .utils import record_latency_percentiles
+
+HISTORIES = 3000
+SEP = " | "
+
+Rows = list[list[Optional[str]]]
+
+
+def _legacy_normalize_text(text: str) -> str:
+    text = text.strip()
+    text = re.sub(r"\s*\(مشاهده.*?\)", "", text)
+    text = re.sub(r"،(?!\s)", "، ", text)
+    text = re.sub(r"(?<=[؀-ۿ])(\d+)(?=[؀-ۿ])", r" \1 ", text)
+    return text
+
+
+def _legacy_parse_rows(rows: Rows) -> list[TrackingRecord]:
+    lines = [_legacy_normalize_text(SEP.join(value.strip() for value in row if value)) for row in rows if row]
+    records: list[TrackingRecord] = []
+    date: Optional[str] = None
+    for line in lines:
+        if "موقعیت" in line and "ساعت" in line:
+            date = line.split(SEP)[0]
+            continue
+        parts = [part.strip() for part in line.split(SEP)]
+        if len(parts) == 3:
+            record = TrackingRecord(id=int(parts[0]), time=parts[2], description=parts[1])
+        else:
+            record = TrackingRecord(id=int(parts[0]), time=parts[3], location=parts[2], description=parts[1])
+        if date:
+            record.date = date
+        records.append(record)
+    return records
+
+
+def _parse_rows(rows: Rows) -> list[TrackingRecord]:
+    return [event.to_record() for event in parse_tracking_rows(rows, normalize_text)]
+
+
+@pytest.fixture(scope="module")
+def corpus() -> list[Rows]:
+    histories = []
+    for scenario in sorted(set(SCENARIOS.values())):
+        html = (PAGES_DIR / f"{scenario}.html").read_text(encoding="utf-8")
+        histories.append(ParcelTracker._parse_tracking_html(html))
+    return [histories[index % len(histories)] for index in range(HISTORIES)]
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "مرسوله در مرکز مبادلات12پردازش شد (مشاهده جزئیات)",
+        "تهران،مرکز مبادلات",
+        "تهران، مرکز مبادلات",
+        "شهر،5کیلومتر",
+        "ناحیه12،اصفهان",
+        "  قبول مرسوله در باجه 2 تهران  ",
+        "شنبه 1403/10/08",
+    ],
+)
+def test_normalize_text_matches_legacy(text: str) -> None:
+    assert normalize_text(text) == _legacy_normalize_text(text)
+
+
+def test_parse_matches_legacy(corpus: list[Rows]) -> None:
+    for rows in corpus[:10]:
+        assert _parse_rows(rows) == _legacy_parse_rows(rows)
+
+
+def test_parse_legacy(benchmark: BenchmarkFixture, corpus: list[Rows]) -> None:
+    benchmark(lambda: [_legacy_parse_rows(rows) for rows in corpus])
+    record_latency_percentiles(benchmark, operations_per_round=len(corpus))
+
+
+def test_parse_compiled(benchmark: BenchmarkFixture, corpus: list[Rows]) -> None:
+    benchmark(lambda: [_parse_rows(rows) for rows in corpus])
+    record_latency_percentiles(benchmark, operations_per_round=len(corpus))
+
+
+def test_parse_events_only(benchmark: BenchmarkFixture, corpus: list[Rows]) -> None:
+    benchmark(lambda: [parse_tracking_rows(rows, normalize_text) for rows in corpus])
+    record_latency_percentiles(benchmark, operations_per_round=len(corpus))
@@ -0,0 +1,94 @@
+"""
+Startup benchmarks of the bot process, with a time budget.
+
+The import benchmark runs `import bot.__main__` in a fresh interpreter and checks that the heavy dependencies
+only needed to scrape the tracking website aren't imported. The first update benchmark runs the bot against a
+local stand-in of the Bot API that delivers a /start message, and measures the time from spawning the process
+to the reply.
+"""
+
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Iterator, Optional
+
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from bot.loadtest.botapi import FakeBotAPIServer, message_update
+
+from .utils import record_latency_percentiles
+
+IMPORT_TIME_BUDGET = 2.0
+FIRST_UPDATE_BUDGET = 5.0
+LAZY_MODULES = ("playwright", "PIL", "fake_useragent")
+TOKEN = "123456:startup-benchmark"
+ROUNDS = 3
+
+
+@pytest.fixture
+def bot_api() -> Iterator[FakeBotAPIServer]:
+    with FakeBotAPIServer() as server:
+        yield server
+
+
+def _environment(**variables: str) -> dict[str, str]:
+    return {**os.environ, "TELEGRAM_TOKEN": TOKEN, **variables}
+
+
+def test_import_time(benchmark: BenchmarkFixture) -> None:
+    script = f"import sys, bot.__main__; print(sorted(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    imported: list[str] = []
+    durations: list[float] = []
+
+    def run() -> None:
+        started_at = time.perf_counter()
+        output = subprocess.run([sys.executable, "-c", script], env=_environment(), capture_output=True, text=True, check=True)
+        durations.append(time.perf_counter() - started_at)
+        imported[:] = json.loads(output.stdout.strip().replace("'", '"'))
+
+    benchmark.pedantic(run, rounds=ROUNDS * 2, warmup_rounds=1)  # type: ignore[no-untyped-call]
+    record_latency_percentiles(benchmark)
+
+    assert imported == []
+    # Timed here rather than read from the benchmark stats, which aren't collected with `--benchmark-disable`
+    measured = sorted(durations[-ROUNDS * 2 :])
+    import_time = measured[len(measured) // 2]
+    benchmark.extra_info["import_time_s"] = round(import_time, 3)
+    assert import_time < IMPORT_TIME_BUDGET
+
+
+def test_time_to_first_update(benchmark: BenchmarkFixture, bot_api: FakeBotAPIServer, tmp_path: Path) -> None:
+    environment = _environment(
+        TELEGRAM_BASE_URL=bot_api.base_url,
+        DATABASE_PATH=str(tmp_path / "rahgiri.db"),
+        BROWSER_POOL_SIZE="1",
+    )
+    durations: list[float] = []
+
+    def run() -> None:
+        bot_api.reset()
+        bot_api.push_update(message_update(1, 1, "/start"))
+        started_at = time.perf_counter()
+        process = subprocess.Popen([sys.executable, "-m", "bot"], env=environment, stderr=subprocess.DEVNULL)
+        try:
+            replied_at = bot_api.wait_for("sendMessage", FIRST_UPDATE_BUDGET * 4)
+        finally:
+            process.send_signal(signal.SIGINT)
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        assert replied_at is not None, "The bot didn't reply to the /start message."
+        durations.append(replied_at - started_at)
+
+    benchmark.pedantic(run, rounds=ROUNDS, warmup_rounds=0)  # type: ignore[no-untyped-call]
+
+    first_update: Optional[float] = sorted(durations)[len(durations) // 2] if durations else None
+    assert first_update is not None
+    benchmark.extra_info["time_to_first_update_s"] = round(first_update, 3)
+    assert first_update < FIRST_UPDATE_BUDGET
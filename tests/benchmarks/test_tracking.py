@@ -0,0 +1,95 @@
+"""
+End-to-end benchmarks of `ParcelTracker` against the local tracking website stand-in.
+
+Each benchmark records the p50/p95 latency of a round, the throughput, and the peak RSS of the process
+tree (including Chromium) in the extra info of the benchmark, see `--benchmark-json`.
+"""
+
+import asyncio
+from typing import Iterator
+
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from bot.loadtest.site import TRACKING_NUMBER_MULTIPLE_DATES, TrackingSiteServer
+from bot.utils.browser import BrowserPool
+from bot.utils.text import normalize_text
+from bot.utils.tracking import ParcelTracker, create_http_client
+
+from .utils import PeakRSS, record_latency_percentiles
+
+ROUNDS = 30
+CONCURRENCY = 10
+
+
+@pytest.fixture
+def loop() -> Iterator[asyncio.AbstractEventLoop]:
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+def _benchmark_text(
+    benchmark: BenchmarkFixture, loop: asyncio.AbstractEventLoop, tracking_site: TrackingSiteServer, concurrency: int
+) -> None:
+    client = create_http_client(max_connections=concurrency)
+    tracker = ParcelTracker(normalizer=normalize_text, http_client=client, base_url=tracking_site.base_url)
+
+    async def track() -> None:
+        await asyncio.gather(*(tracker.track_as_text(TRACKING_NUMBER_MULTIPLE_DATES, timeout=10) for _ in range(concurrency)))
+
+    try:
+        with PeakRSS() as rss:
+            benchmark.pedantic(lambda: loop.run_until_complete(track()), rounds=ROUNDS, warmup_rounds=1)  # type: ignore[no-untyped-call]
+    finally:
+        loop.run_until_complete(client.aclose())
+
+    record_latency_percentiles(benchmark, operations_per_round=concurrency)
+    benchmark.extra_info["peak_rss_mb"] = round(rss.peak_mb, 1)
+
+
+def _benchmark_image(
+    benchmark: BenchmarkFixture, loop: asyncio.AbstractEventLoop, tracking_site: TrackingSiteServer, concurrency: int
+) -> None:
+    pool = BrowserPool(size=concurrency)
+
+    with PeakRSS() as rss:
+        loop.run_until_complete(pool.start())
+        tracker = ParcelTracker(browser_pool=pool, base_url=tracking_site.base_url)
+
+        async def track() -> None:
+            await asyncio.gather(
+                *(tracker.track_as_image(TRACKING_NUMBER_MULTIPLE_DATES, timeout=10) for _ in range(concurrency))
+            )
+
+        try:
+            benchmark.pedantic(lambda: loop.run_until_complete(track()), rounds=ROUNDS, warmup_rounds=1)  # type: ignore[no-untyped-call]
+        finally:
+            loop.run_until_complete(pool.stop())
+
+    record_latency_percentiles(benchmark, operations_per_round=concurrency)
+    benchmark.extra_info["peak_rss_mb"] = round(rss.peak_mb, 1)
+
+
+def test_track_as_text_latency(
+    benchmark: BenchmarkFixture, loop: asyncio.AbstractEventLoop, tracking_site: TrackingSiteServer
+) -> None:
+    _benchmark_text(benchmark, loop, tracking_site, concurrency=1)
+
+
+def test_track_as_text_throughput(
+    benchmark: BenchmarkFixture, loop: asyncio.AbstractEventLoop, tracking_site: TrackingSiteServer
+) -> None:
+    _benchmark_text(benchmark, loop, tracking_site, concurrency=CONCURRENCY)
+
+
+def test_track_as_image_latency(
+    benchmark: BenchmarkFixture, loop: asyncio.AbstractEventLoop, tracking_site: TrackingSiteServer, chromium: None
+) -> None:
+    _benchmark_image(benchmark, loop, tracking_site, concurrency=1)
+
+
+def test_track_as_image_throughput(
+    benchmark: BenchmarkFixture, loop: asyncio.AbstractEventLoop, tracking_site: TrackingSiteServer, chromium: None
+) -> None:
+    _benchmark_image(benchmark, loop, tracking_site, concurrency=CONCURRENCY)
@@ -0,0 +1,83 @@
+import os
+import statistics
+import threading
+from typing import Any, Optional
+
+from pytest_benchmark.fixture import BenchmarkFixture
+
+__all__ = ("PeakRSS", "record_latency_percentiles")
+
+
+def _rss_mb(pid: int) -> float:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def _process_tree(root: int) -> set[int]:
+    children: dict[int, list[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    tree, stack = set(), [root]
+    while stack:
+        pid = stack.pop()
+        tree.add(pid)
+        stack.extend(children.get(pid, []))
+    return tree
+
+
+class PeakRSS:
+    """
+    Samples the resident memory of this process and all of its descendants (e.g. the Playwright driver and
+    Chromium) in a background thread and keeps the peak, in megabytes. Only supported on Linux.
+
+    Args:
+        interval (float): Sampling interval, in seconds. Defaults to 0.05.
+    """
+
+    def __init__(self, interval: float = 0.05) -> None:
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self) -> None:
+        while True:
+            self.peak_mb = max(self.peak_mb, sum(_rss_mb(pid) for pid in _process_tree(os.getpid())))
+            if self._stop.wait(self.interval):
+                return
+
+    def __enter__(self) -> "PeakRSS":
+        if os.path.isdir("/proc"):
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+
+def record_latency_percentiles(benchmark: BenchmarkFixture, operations_per_round: int = 1) -> None:
+    """Add the p50/p95 round latency and the throughput to the extra info of a benchmark."""
+    if benchmark.stats is None:
+        return
+    data = sorted(benchmark.stats.stats.data)
+    quantiles = statistics.quantiles(data, n=100, method="inclusive") if len(data) > 1 else data * 99
+    benchmark.extra_info["p50_ms"] = round(quantiles[49] * 1000, 3)
+    benchmark.extra_info["p95_ms"] = round(quantiles[94] * 1000, 3)
+    benchmark.extra_info["throughput_per_s"] = round(operations_per_round / benchmark.stats.stats.mean, 2)
@@ -0,0 +1,65 @@
+import asyncio
+import os
+import tempfile
+from typing import Iterator, Optional, Sequence
+
+import pytest
+from playwright.sync_api import sync_playwright
+
+from bot.loadtest.site import TrackingSiteServer
+from bot.models import TrackingRecord, TrackingSnapshot
+
+# The services of the handlers are configured from the environment when they're first imported
+os.environ.setdefault("TELEGRAM_TOKEN", "123456:test")
+os.environ.setdefault("DATABASE_PATH", os.path.join(tempfile.mkdtemp(), "test.db"))
+
+
+@pytest.fixture(scope="session")
+def tracking_site() -> Iterator[TrackingSiteServer]:
+    with TrackingSiteServer() as server:
+        yield server
+
+
+@pytest.fixture(scope="session")
+def chromium() -> None:
+    with sync_playwright() as playwright:
+        executable_path = playwright.chromium.executable_path
+    if not os.path.exists(executable_path):
+        pytest.skip("Chromium is not installed, run `playwright install chromium`.")
+
+
+class StubTracker:
+    """
+    A parcel tracker returning the given records, or raising the given error, after a delay, without scraping.
+
+    Args:
+        result (Sequence[TrackingRecord] | Exception): The records of the parcels, or the error raised. Defaults to
+            no records.
+        delay (float): Duration of a lookup, in seconds. Defaults to 0.
+        screenshot (bytes): The screenshot of the parcels. Defaults to the start of a JPEG image.
+    """
+
+    def __init__(
+        self, result: Sequence[TrackingRecord] | Exception = (), delay: float = 0, screenshot: bytes = b"\xff\xd8\xff"
+    ) -> None:
+        self.result = result
+        self.delay = delay
+        self.screenshot = screenshot
+        self.calls = 0
+
+    async def _track(self) -> list[TrackingRecord]:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if isinstance(self.result, Exception):
+            raise self.result
+        return list(self.result)
+
+    async def track_as_text(self, tracking_number: str, timeout: Optional[float] = None) -> list[TrackingRecord]:
+        return await self._track()
+
+    async def track_as_image(self, tracking_number: str, timeout: Optional[float] = None) -> bytes:
+        await self._track()
+        return self.screenshot
+
+    async def track_as_text_and_image(self, tracking_number: str, timeout: Optional[float] = None) -> TrackingSnapshot:
+        return TrackingSnapshot(await self._track(), self.screenshot)
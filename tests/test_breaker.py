@@ -0,0 +1,76 @@
+import asyncio
+import time
+from typing import Optional
+
+import pytest
+
+from bot.utils.breaker import CircuitBreaker
+from bot.utils.exceptions import ServiceUnavailableError, TrackingError
+
+
+async def _succeed(timeout: Optional[float]) -> Optional[float]:
+    return timeout
+
+
+async def _fail(timeout: Optional[float]) -> None:
+    raise TimeoutError
+
+
+async def _not_found(timeout: Optional[float]) -> None:
+    raise TrackingError("not found")
+
+
+def test_circuit_breaker_opens_and_recovers() -> None:
+    async def run() -> None:
+        breaker = CircuitBreaker(min_calls=4, failure_rate=0.5, open_duration=0.1)
+        # The states are compared at the end, as mypy narrows the state after a comparison
+        states: list[str] = []
+        await breaker.call("text", _succeed, 10)
+        # A parcel that isn't found is a successful call of the service
+        with pytest.raises(TrackingError):
+            await breaker.call("text", _not_found, 10)
+        for _ in range(2):
+            with pytest.raises(TimeoutError):
+                await breaker.call("text", _fail, 10)
+        states.append(breaker.state)
+        with pytest.raises(TimeoutError):
+            await breaker.call("text", _fail, 10)
+        states.append(breaker.state)
+
+        # Fails fast without calling the service while open
+        with pytest.raises(ServiceUnavailableError):
+            await breaker.call("text", _succeed, 10)
+
+        await asyncio.sleep(0.1)
+        states.append(breaker.state)
+        with pytest.raises(TimeoutError):
+            await breaker.call("text", _fail, 10)
+        states.append(breaker.state)
+
+        await asyncio.sleep(0.1)
+        await breaker.call("text", _succeed, 10)
+        states.append(breaker.state)
+        assert states == ["closed", "open", "half_open", "open", "closed"]
+
+    asyncio.run(run())
+
+
+def test_circuit_breaker_adapts_timeout_to_p95_latency() -> None:
+    async def run() -> None:
+        breaker = CircuitBreaker(min_calls=5, timeout_factor=2, min_timeout=0.01)
+        assert await breaker.call("text", _succeed, 10) == 10
+
+        async def respond(timeout: Optional[float]) -> None:
+            await asyncio.sleep(0.02)
+
+        for _ in range(5):
+            await breaker.call("text", respond, 10)
+        p95 = breaker.p95("text")
+        assert p95 is not None and 0.02 <= p95 < 0.5
+        assert await breaker.call("text", _succeed, 10) == pytest.approx(2 * p95)
+        # Other operations keep their own latencies
+        assert await breaker.call("image", _succeed, 10) == 10
+
+    started_at = time.monotonic()
+    asyncio.run(run())
+    assert time.monotonic() - started_at < 5
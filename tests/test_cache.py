@@ -0,0 +1,203 @@
+import asyncio
+import time
+from functools import partial
+
+import pytest
+
+from bot.models import TrackingRecord, TrackingSnapshot
+from bot.utils.cache import TrackingCache
+from bot.utils.exceptions import TrackingError, UserQueueFullError
+from bot.utils.scheduler import TrackingScheduler
+
+TRACKING_NUMBER = "1" * 24
+RECORDS = [TrackingRecord(id=1, time="07:02", description="قبول مرسوله")]
+SCREENSHOT = b"\xff\xd8\xff screenshot"
+
+
+def test_tracking_cache_splits_text_and_image_results() -> None:
+    cache = TrackingCache(ttl=60, screenshot_ttl=0.1)
+    cache.set(TRACKING_NUMBER, "both", TrackingSnapshot(RECORDS, SCREENSHOT))
+
+    assert cache.get(TRACKING_NUMBER, "text") == RECORDS
+    assert cache.get(TRACKING_NUMBER, "image") == SCREENSHOT
+    assert cache.get(TRACKING_NUMBER, "both") == TrackingSnapshot(RECORDS, SCREENSHOT)
+
+    # Screenshots are kept for less time than the records
+    time.sleep(0.15)
+    assert cache.get(TRACKING_NUMBER, "image") is None
+    assert cache.get(TRACKING_NUMBER, "both") is None
+    assert cache.get(TRACKING_NUMBER, "text") == RECORDS
+
+
+def test_tracking_cache_shares_text_and_image_fetch() -> None:
+    fetches: list[str] = []
+
+    async def fetch_both() -> TrackingSnapshot:
+        fetches.append("both")
+        await asyncio.sleep(0.05)
+        return TrackingSnapshot(RECORDS, SCREENSHOT)
+
+    async def fetch_image() -> bytes:
+        fetches.append("image")
+        return b"another screenshot"
+
+    async def run() -> None:
+        cache = TrackingCache()
+        both = asyncio.create_task(cache.get_or_track(TRACKING_NUMBER, "both", fetch_both))
+        await asyncio.sleep(0)
+        # A lookup of the image while the text and image lookup is in flight waits for it
+        assert await cache.get_or_track(TRACKING_NUMBER, "image", fetch_image) == SCREENSHOT
+        assert await both == TrackingSnapshot(RECORDS, SCREENSHOT)
+        assert await cache.get_or_track(TRACKING_NUMBER, "text", fetch_image) == RECORDS
+
+    asyncio.run(run())
+    assert fetches == ["both"]
+
+
+def test_tracking_cache_queues_every_user_on_their_own() -> None:
+    fetches: list[str] = []
+    positions: dict[str, list[int]] = {"b": [], "c": []}
+
+    async def fetch() -> list[TrackingRecord]:
+        fetches.append("text")
+        return RECORDS
+
+    async def run() -> None:
+        cache = TrackingCache()
+        scheduler = TrackingScheduler(max_workers=1, max_pending_per_user=1)
+        release = asyncio.Event()
+        blocker = asyncio.create_task(scheduler.run("a", release.wait))
+        await asyncio.sleep(0)
+
+        def lookup(user_id: str) -> "asyncio.Task[object]":
+            async def report(position: int) -> None:
+                positions[user_id].append(position)
+
+            queue = partial(scheduler.run, user_id, on_position=report)
+            return asyncio.create_task(cache.get_or_track(TRACKING_NUMBER, "text", fetch, queue=queue))
+
+        lookups = [lookup("b"), lookup("c")]
+        await asyncio.sleep(0)
+        # The user with a job already running is turned down, without failing the lookups of the other users
+        with pytest.raises(UserQueueFullError):
+            await cache.get_or_track(TRACKING_NUMBER, "text", fetch, queue=partial(scheduler.run, "a"))
+
+        release.set()
+        assert await asyncio.gather(*lookups) == [RECORDS, RECORDS]
+        await blocker
+
+        # A cached result doesn't wait in the queue
+        assert await cache.get_or_track(TRACKING_NUMBER, "text", fetch, queue=partial(scheduler.run, "a")) == RECORDS
+
+    asyncio.run(run())
+    assert fetches == ["text"]
+    assert positions == {"b": [1], "c": [2, 1]}
+
+
+def test_tracking_cache_expires_results() -> None:
+    cache = TrackingCache(ttl=0.3, negative_ttl=0.1)
+    cache.set(TRACKING_NUMBER, "text", RECORDS)
+    cache.set("2" * 24, "text", TrackingError("مرسوله یافت نشد"))
+
+    assert cache.get(TRACKING_NUMBER, "text") == RECORDS
+    with pytest.raises(TrackingError):
+        cache.get("2" * 24, "text")
+
+    # Tracking errors expire first
+    time.sleep(0.15)
+    assert cache.get("2" * 24, "text") is None
+    assert cache.get(TRACKING_NUMBER, "text") == RECORDS
+    time.sleep(0.2)
+    assert cache.get(TRACKING_NUMBER, "text") is None
+    assert len(cache) == 0 and cache.size == 0
+
+
+def test_tracking_cache_evicts_least_recently_used() -> None:
+    cache = TrackingCache(max_bytes=2 * len(SCREENSHOT))
+    cache.set("1" * 24, "image", SCREENSHOT)
+    cache.set("2" * 24, "image", SCREENSHOT)
+    assert cache.get("1" * 24, "image") == SCREENSHOT
+    cache.set("3" * 24, "image", SCREENSHOT)
+
+    assert cache.get("2" * 24, "image") is None
+    assert cache.get("1" * 24, "image") == SCREENSHOT
+    assert cache.get("3" * 24, "image") == SCREENSHOT
+    assert cache.size == 2 * len(SCREENSHOT)
+
+    # A result larger than the cache isn't cached
+    cache.set("4" * 24, "image", SCREENSHOT * 3)
+    assert cache.get("4" * 24, "image") is None
+
+
+def test_tracking_cache_coalesces_lookups() -> None:
+    fetches: list[str] = []
+
+    async def fetch() -> list[TrackingRecord]:
+        fetches.append("text")
+        await asyncio.sleep(0.05)
+        return RECORDS
+
+    async def fail() -> list[TrackingRecord]:
+        fetches.append("error")
+        await asyncio.sleep(0.05)
+        raise TrackingError("مرسوله یافت نشد")
+
+    async def run() -> None:
+        cache = TrackingCache()
+        results = await asyncio.gather(*(cache.get_or_track(TRACKING_NUMBER, "text", fetch) for _ in range(3)))
+        assert results == [RECORDS] * 3
+        assert await cache.get_or_track(TRACKING_NUMBER, "text", fetch) == RECORDS
+
+        errors = await asyncio.gather(*(cache.get_or_track("2" * 24, "text", fail) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(error, TrackingError) for error in errors)
+        # The error is cached too
+        with pytest.raises(TrackingError):
+            await cache.get_or_track("2" * 24, "text", fail)
+
+    asyncio.run(run())
+    assert fetches == ["text", "error"]
+
+
+def test_tracking_cache_returns_copies_of_records() -> None:
+    async def fetch() -> list[TrackingRecord]:
+        return list(RECORDS)
+
+    async def run() -> None:
+        cache = TrackingCache()
+        records = await cache.get_or_track(TRACKING_NUMBER, "text", fetch)
+        assert isinstance(records, list)
+        records.clear()
+
+        cached = cache.get(TRACKING_NUMBER, "text")
+        assert cached == RECORDS
+        assert isinstance(cached, list)
+        cached.append(RECORDS[0])
+        assert cache.get(TRACKING_NUMBER, "text") == RECORDS
+
+    asyncio.run(run())
+
+
+def test_tracking_cache_joins_fetches_in_flight_outside_the_queue() -> None:
+    release = asyncio.Event()
+
+    async def fetch() -> list[TrackingRecord]:
+        await release.wait()
+        return RECORDS
+
+    async def run() -> None:
+        cache = TrackingCache()
+        scheduler = TrackingScheduler(max_workers=2)
+        first = asyncio.create_task(cache.get_or_track(TRACKING_NUMBER, "text", fetch, queue=partial(scheduler.run, "a")))
+        await asyncio.sleep(0)
+        joined = asyncio.create_task(cache.get_or_track(TRACKING_NUMBER, "text", fetch, queue=partial(scheduler.run, "b")))
+        other = asyncio.create_task(cache.get_or_track("2" * 24, "text", fetch, queue=partial(scheduler.run, "c")))
+        await asyncio.sleep(0)
+        # The second lookup of the parcel waits for the first one's fetch, without taking the other worker
+        assert scheduler.running == 2 and scheduler.queued == 0
+        assert cache.fetching == 2
+
+        release.set()
+        assert list(await asyncio.gather(first, joined, other)) == [RECORDS] * 3
+        assert cache.fetching == 0
+
+    asyncio.run(run())
@@ -0,0 +1,68 @@
+import asyncio
+import pickle
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+
+from bot.handlers import tracking
+from bot.models import Screenshot
+from bot.utils.files import FileIdStore, content_hash
+
+
+def test_file_id_store_evicts_least_recently_used(tmp_path: Path) -> None:
+    store = FileIdStore(str(tmp_path / "bot.db"), max_entries=2)
+    try:
+        store.set(content_hash(b"a"), "file-a")
+        store.set(content_hash(b"b"), "file-b")
+        assert store.get(content_hash(b"a")) == "file-a"
+        store.set(content_hash(b"c"), "file-c")
+
+        assert store.get(content_hash(b"b")) is None
+        assert store.get(content_hash(b"a")) == "file-a"
+        assert store.get(content_hash(b"c")) == "file-c"
+    finally:
+        store.close()
+
+
+def test_file_id_store_persists(tmp_path: Path) -> None:
+    path = str(tmp_path / "bot.db")
+    store = FileIdStore(path)
+    store.set(content_hash(b"a"), "file-a")
+    store.close()
+
+    store = FileIdStore(path)
+    try:
+        assert store.get(content_hash(b"a")) == "file-a"
+    finally:
+        store.close()
+
+
+class StubBot:
+    def __init__(self) -> None:
+        self.sent: list[object] = []
+
+    async def send_photo(self, chat_id: int, photo: object, **kwargs: Any) -> SimpleNamespace:
+        self.sent.append(photo)
+        return SimpleNamespace(photo=[SimpleNamespace(file_id=f"file-{len(self.sent)}")])
+
+
+def test_send_photo_reuses_the_upload_of_the_same_tracking_state(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    store = FileIdStore(str(tmp_path / "bot.db"))
+    monkeypatch.setattr(tracking, "file_id_store", store)
+    bot = StubBot()
+    context = SimpleNamespace(bot=bot)
+    # Two renders of the same tracking state, e.g. encoded with different antialiasing
+    first, second = Screenshot(b"\xff\xd8\xff first", "state"), Screenshot(b"\xff\xd8\xff second", "state")
+
+    async def send() -> None:
+        await tracking._send_photo(context, 1, first, caption="")  # type: ignore[arg-type]
+        await tracking._send_photo(context, 1, pickle.loads(pickle.dumps(second)), caption="")  # type: ignore[arg-type]
+        await tracking._send_photo(context, 1, Screenshot(b"\xff\xd8\xff other", "other state"), caption="")  # type: ignore[arg-type]
+
+    try:
+        asyncio.run(send())
+    finally:
+        store.close()
+    assert bot.sent == [first, "file-1", b"\xff\xd8\xff other"]
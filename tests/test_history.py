@@ -0,0 +1,105 @@
+import asyncio
+import sqlite3
+from pathlib import Path
+
+from bot.models import TrackingEvent
+from bot.utils.history import HistoryStore, HistoryTracker
+from bot.utils.watch import WatchStore
+
+from .conftest import StubTracker
+
+TRACKING_NUMBER = "123456789012345678901234"
+
+EVENTS = [
+    TrackingEvent(id=1, time="07:02", description="قبول مرسوله", date="شنبه 1403/10/08", location="تهران"),
+    TrackingEvent(id=2, time="08:15", description="ورود به مرکز مبادلات", date="شنبه 1403/10/08", location="تهران"),
+]
+
+
+def test_history_store_appends_new_events(tmp_path: Path) -> None:
+    store = HistoryStore(str(tmp_path / "bot.db"))
+    try:
+        assert store.append(TRACKING_NUMBER, EVENTS[:1], seen_at=10) == EVENTS[:1]
+        assert store.append(TRACKING_NUMBER, EVENTS, seen_at=20) == EVENTS[1:]
+        assert store.append(TRACKING_NUMBER, EVENTS, seen_at=30) == []
+
+        # An event whose details changed is stored again
+        changed = TrackingEvent(id=2, time="08:15", description="خروج از مرکز مبادلات", date="شنبه 1403/10/08")
+        assert store.append(TRACKING_NUMBER, [EVENTS[0], changed], seen_at=40) == [changed]
+
+        assert [(item.event, item.first_seen_at) for item in store.events_since(TRACKING_NUMBER)] == [
+            (EVENTS[0], 10),
+            (changed, 40),
+        ]
+        assert [item.event for item in store.events_since(TRACKING_NUMBER, 10)] == [changed]
+        assert store.events_since(TRACKING_NUMBER, 10, until=30) == []
+        assert store.events_since("000000000000000000000000") == []
+    finally:
+        store.close()
+
+
+def test_history_store_compacts(tmp_path: Path) -> None:
+    store = HistoryStore(str(tmp_path / "bot.db"))
+    try:
+        store.append("1" * 24, EVENTS, seen_at=0)
+        store.append("2" * 24, EVENTS)
+        store.append("3" * 24, EVENTS)
+        store.append("3" * 24, EVENTS)
+
+        assert store.compact(max_age=3600) == 1
+        assert store.events_since("1" * 24) == []
+        assert store.compact(max_age=3600, max_parcels=1) == 1
+        assert store.events_since("2" * 24) == []
+        assert len(store.events_since("3" * 24)) == 2
+        assert store.compact(max_age=3600, max_parcels=1) == 0
+    finally:
+        store.close()
+
+
+def test_history_store_keeps_histories_when_compacting(tmp_path: Path) -> None:
+    store = HistoryStore(str(tmp_path / "bot.db"))
+    try:
+        store.append("1" * 24, EVENTS, seen_at=10)
+        store.append("2" * 24, EVENTS, seen_at=20)
+        store.append("3" * 24, EVENTS)
+
+        assert store.compact(max_age=3600, max_parcels=1, keep=["1" * 24, "3" * 24]) == 1
+        assert len(store.events_since("1" * 24)) == 2
+        assert store.events_since("2" * 24) == []
+        # A watched parcel checked again doesn't find its events new
+        assert store.append("1" * 24, EVENTS) == []
+    finally:
+        store.close()
+
+
+def test_history_tracker_stores_records(tmp_path: Path) -> None:
+    records = [event.to_record() for event in EVENTS]
+
+    store = HistoryStore(str(tmp_path / "bot.db"))
+    try:
+        tracker = HistoryTracker(StubTracker(records), store)
+        assert asyncio.run(tracker.track_as_text(TRACKING_NUMBER)) == records
+        assert [item.event for item in store.events_since(TRACKING_NUMBER)] == EVENTS
+    finally:
+        store.close()
+
+
+def test_watch_store_migrates_event_keys(tmp_path: Path) -> None:
+    path = str(tmp_path / "bot.db")
+    with sqlite3.connect(path) as connection:
+        connection.execute(
+            "CREATE TABLE watched_parcels (tracking_number TEXT PRIMARY KEY, event_keys TEXT, interval REAL NOT NULL, "
+            "next_check_at REAL NOT NULL, delivered INTEGER NOT NULL DEFAULT 0)"
+        )
+        connection.execute("INSERT INTO watched_parcels VALUES (?, '[]', 60, 0, 0)", (TRACKING_NUMBER,))
+    connection.close()
+
+    store = WatchStore(path)
+    try:
+        [parcel] = store.due(now=1, limit=10)
+        assert parcel.checked_at is None
+        store.update([(parcel._replace(checked_at=1), 100)])
+        assert store.due(now=1, limit=10) == []
+        assert store.due(now=100, limit=10)[0].checked_at == 1
+    finally:
+        store.close()
@@ -0,0 +1,31 @@
+import io
+
+import pytest
+from PIL import Image
+
+from bot.utils.image import ScreenshotFormat, ScreenshotOptions, encode_screenshot
+
+
+@pytest.fixture(scope="module")
+def screenshot() -> bytes:
+    # Noise compresses poorly, so every format has to be downscaled to fit a small budget
+    image = Image.merge("RGB", [Image.effect_noise((1920, 2400), sigma) for sigma in (32, 64, 96)])
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("image_format", ["jpeg", "webp", "png"])
+def test_encode_screenshot_within_budget(screenshot: bytes, image_format: ScreenshotFormat) -> None:
+    max_bytes = 300 * 1024
+    encoded = encode_screenshot(screenshot, ScreenshotOptions(format=image_format, max_bytes=max_bytes))
+
+    assert len(encoded) <= max_bytes
+    with Image.open(io.BytesIO(encoded)) as image:
+        assert image.format == image_format.upper()
+        assert image.width < 1920
+
+
+def test_encode_screenshot_without_budget(screenshot: bytes) -> None:
+    with Image.open(io.BytesIO(encode_screenshot(screenshot, ScreenshotOptions(max_bytes=None)))) as image:
+        assert image.size == (1920, 2400)
@@ -0,0 +1,157 @@
+import asyncio
+import itertools
+from types import SimpleNamespace
+from typing import Any, Sequence
+
+import pytest
+from telegram import InlineQueryResultArticle, InputTextMessageContent
+
+from bot.config import settings
+from bot.handlers import inline
+from bot.models import TrackingRecord
+from bot.utils.cache import TrackingCache
+from bot.utils.exceptions import TrackingError
+from bot.utils.scheduler import TrackingScheduler
+
+from .conftest import StubTracker
+
+TRACKING_NUMBER = "1" * 24
+RECORDS = [TrackingRecord(id=1, time="07:02", description="قبول مرسوله")]
+INLINE_WAIT = 0.2
+
+_query_ids = itertools.count(1)
+
+
+class FakeInlineQuery:
+    def __init__(self, text: str, user_id: int = 1) -> None:
+        self.id = str(next(_query_ids))
+        self.query = text
+        self.from_user = SimpleNamespace(id=user_id)
+        self.answers: list[tuple[Sequence[InlineQueryResultArticle], int, dict[str, Any]]] = []
+
+    async def answer(self, results: Sequence[InlineQueryResultArticle], cache_time: int, **kwargs: Any) -> None:
+        self.answers.append((results, cache_time, kwargs))
+
+
+@pytest.fixture
+def cache(monkeypatch: pytest.MonkeyPatch) -> TrackingCache:
+    cache = TrackingCache()
+    monkeypatch.setattr(inline, "tracking_cache", cache)
+    monkeypatch.setattr(inline, "tracking_scheduler", TrackingScheduler())
+    monkeypatch.setattr(inline, "settings", settings.model_copy(update={"inline_debounce": 0.05, "inline_wait": INLINE_WAIT}))
+    return cache
+
+
+def _use_tracker(monkeypatch: pytest.MonkeyPatch, tracker: StubTracker) -> None:
+    monkeypatch.setattr(inline, "create_tracker", lambda: tracker)
+
+
+async def _handle(query: FakeInlineQuery) -> None:
+    await inline.handle_inline_query(SimpleNamespace(inline_query=query), None)  # type: ignore[arg-type]
+
+
+def _answered_ids(query: FakeInlineQuery) -> list[list[str]]:
+    return [[result.id for result in results] for results, _, _ in query.answers]
+
+
+def _answered_text(query: FakeInlineQuery) -> str:
+    content = query.answers[0][0][0].input_message_content
+    assert isinstance(content, InputTextMessageContent)
+    return content.message_text
+
+
+def test_inline_query_answers_cached_results_right_away(cache: TrackingCache, monkeypatch: pytest.MonkeyPatch) -> None:
+    tracker = StubTracker(RECORDS)
+    _use_tracker(monkeypatch, tracker)
+    cache.set(TRACKING_NUMBER, "text", RECORDS)
+    cache.set("2" * 24, "text", TrackingError("مرسوله یافت نشد"))
+    found, not_found = FakeInlineQuery(TRACKING_NUMBER), FakeInlineQuery("2" * 24)
+
+    async def run() -> None:
+        # Answered before the debounce delay
+        await asyncio.wait_for(asyncio.gather(_handle(found), _handle(not_found)), settings.inline_debounce / 2)
+
+    asyncio.run(run())
+    assert found.answers[0][1] == settings.inline_cache_time
+    assert RECORDS[0].description in _answered_text(found)
+    assert not_found.answers[0][1] == settings.cache_negative_ttl
+    assert "مرسوله یافت نشد" in _answered_text(not_found)
+    assert tracker.calls == 0
+
+
+def test_inline_query_debounces_typing(cache: TrackingCache, monkeypatch: pytest.MonkeyPatch) -> None:
+    tracker = StubTracker(RECORDS)
+    _use_tracker(monkeypatch, tracker)
+    typing, typed, hint = FakeInlineQuery(TRACKING_NUMBER[:-1]), FakeInlineQuery(TRACKING_NUMBER), FakeInlineQuery("abc", 2)
+
+    async def run() -> None:
+        first = asyncio.create_task(_handle(typing))
+        await asyncio.sleep(0)
+        await asyncio.gather(first, _handle(typed), _handle(hint))
+
+    asyncio.run(run())
+    # The superseded query isn't answered
+    assert typing.answers == []
+    assert _answered_ids(typed) == [[TRACKING_NUMBER]]
+    assert hint.answers[0][0] == [] and hint.answers[0][2]["button"] is not None
+    assert tracker.calls == 1
+
+
+def test_inline_query_answers_a_placeholder_for_slow_scrapes(cache: TrackingCache, monkeypatch: pytest.MonkeyPatch) -> None:
+    tracker = StubTracker(RECORDS, delay=INLINE_WAIT * 2)
+    _use_tracker(monkeypatch, tracker)
+    slow, retried = FakeInlineQuery(TRACKING_NUMBER), FakeInlineQuery(TRACKING_NUMBER)
+
+    async def run() -> None:
+        await _handle(slow)
+        # The scrape goes on in the background, and its result is cached for the next query
+        await asyncio.sleep(INLINE_WAIT * 2)
+        await _handle(retried)
+
+    asyncio.run(run())
+    assert _answered_ids(slow) == [[f"{TRACKING_NUMBER}-pending"]]
+    assert slow.answers[0][1] == 0
+    assert _answered_ids(retried) == [[TRACKING_NUMBER]]
+    assert tracker.calls == 1
+
+
+@pytest.mark.parametrize(
+    ("error", "result_id", "cache_time"),
+    [
+        (TrackingError("مرسوله یافت نشد"), TRACKING_NUMBER, settings.cache_negative_ttl),
+        (RuntimeError("boom"), TRACKING_NUMBER, 0),
+    ],
+)
+def test_inline_query_answers_errors(
+    cache: TrackingCache, monkeypatch: pytest.MonkeyPatch, error: Exception, result_id: str, cache_time: float
+) -> None:
+    _use_tracker(monkeypatch, StubTracker(error))
+    query = FakeInlineQuery(TRACKING_NUMBER)
+
+    asyncio.run(_handle(query))
+    assert _answered_ids(query) == [[result_id]]
+    assert query.answers[0][1] == int(cache_time)
+
+
+def test_inline_query_answers_a_placeholder_when_the_queue_is_full(
+    cache: TrackingCache, monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture
+) -> None:
+    tracker = StubTracker(RECORDS)
+    _use_tracker(monkeypatch, tracker)
+    scheduler = TrackingScheduler(max_pending_per_user=1)
+    monkeypatch.setattr(inline, "tracking_scheduler", scheduler)
+    query = FakeInlineQuery(TRACKING_NUMBER)
+
+    async def run() -> None:
+        # The user already has a request in the queue
+        release = asyncio.Event()
+        pending = asyncio.create_task(scheduler.run(query.from_user.id, release.wait))
+        await asyncio.sleep(0)
+        await _handle(query)
+        release.set()
+        await pending
+
+    asyncio.run(run())
+    assert _answered_ids(query) == [[f"{TRACKING_NUMBER}-pending"]]
+    assert tracker.calls == 0
+    assert not [record for record in caplog.records if record.name == inline.__name__]
@@ -0,0 +1,15 @@
+import subprocess
+import sys
+
+
+def test_load_test_replays_tracking_sessions() -> None:
+    command = [sys.executable, "-m", "bot.loadtest", "--rate", "5", "--duration", "1", "--site-latency", "0", "--no-rate-limit"]
+    output = subprocess.run(command, capture_output=True, text=True, timeout=120, check=True).stdout
+
+    assert "Sessions: 5 (track), updates: 20" in output
+    assert "timed out: 0" in output
+    handlers = {line.split()[0]: line.split()[1:] for line in output.splitlines() if line.startswith("handle_")}
+    assert set(handlers) == {"handle_start", "handle_tracking_number", "handle_tracking_result_type", "handle_tracking_process"}
+    # Every handler ran once per session, without errors
+    assert all(values[0] == "5" and values[-1] == "0" for values in handlers.values())
+    assert "Event loop lag:" in output
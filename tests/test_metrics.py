@@ -0,0 +1,66 @@
+import asyncio
+import logging
+import socket
+import urllib.request
+
+import pytest
+from prometheus_client import REGISTRY
+
+from bot.utils.cache import TrackingCache
+from bot.utils.metrics import MetricsServer, timed, traced
+
+
+def _sample(name: str, **labels: str) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_traced_request_collects_stages_of_its_tasks(caplog: pytest.LogCaptureFixture) -> None:
+    async def stage(name: str) -> None:
+        with timed(name):
+            await asyncio.sleep(0.01)
+
+    async def run() -> None:
+        with traced("1" * 24, "text", slow_threshold=0) as trace:
+            await asyncio.gather(asyncio.create_task(stage("goto")), stage("search"))
+            await stage("search")
+        assert set(trace.stages) == {"goto", "search"}
+        assert trace.stages["search"] >= 0.02
+
+    requests = _sample("rahgiri_request_duration_seconds_count", output_type="text", outcome="ok")
+    searches = _sample("rahgiri_stage_duration_seconds_count", stage="search")
+    with caplog.at_level(logging.WARNING, logger="bot.utils.metrics"):
+        asyncio.run(run())
+
+    assert _sample("rahgiri_request_duration_seconds_count", output_type="text", outcome="ok") == requests + 1
+    assert _sample("rahgiri_stage_duration_seconds_count", stage="search") == searches + 2
+    assert "Slow text tracking request" in caplog.text and "goto=" in caplog.text
+
+
+def test_cache_lookups_and_metrics_endpoint() -> None:
+    async def fetch() -> bytes:
+        await asyncio.sleep(0.01)
+        return b"image"
+
+    async def run() -> None:
+        cache = TrackingCache()
+        await asyncio.gather(cache.get_or_track("1" * 24, "image", fetch), cache.get_or_track("1" * 24, "image", fetch))
+        await cache.get_or_track("1" * 24, "image", fetch)
+
+    lookups = {result: _sample("rahgiri_cache_lookups_total", result=result) for result in ("hit", "miss", "shared")}
+    asyncio.run(run())
+    assert {result: _sample("rahgiri_cache_lookups_total", result=result) - count for result, count in lookups.items()} == {
+        "hit": 1,
+        "miss": 1,
+        "shared": 1,
+    }
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = MetricsServer(port)
+    server.start()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+            assert b'rahgiri_cache_lookups_total{result="hit"}' in response.read()
+    finally:
+        server.stop()
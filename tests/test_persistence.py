@@ -0,0 +1,47 @@
+import asyncio
+from pathlib import Path
+from typing import Any
+
+from bot.utils.persistence import BotPersistence, SQLiteStateStore, StateBatch
+
+
+class _CountingStore(SQLiteStateStore):
+    def __init__(self, path: str) -> None:
+        super().__init__(path)
+        self.batches: list[StateBatch] = []
+
+    def write(self, batch: StateBatch) -> None:
+        self.batches.append(batch)
+        super().write(batch)
+
+
+def test_persistence_batches_writes_and_loads_lazily(tmp_path: Path) -> None:
+    path = str(tmp_path / "bot.db")
+
+    async def write() -> list[StateBatch]:
+        store = _CountingStore(path)
+        persistence = BotPersistence(store)
+        await persistence.get_conversations("tracking")
+        # The application hands over the changes of a run concurrently
+        await asyncio.gather(
+            persistence.update_user_data(1, {"tracking_number": "1" * 24}),
+            persistence.update_user_data(2, {"last_message_id": 10}),
+            persistence.update_conversation("tracking", (1, 1), 1),
+            persistence.update_conversation("tracking", (2, 2), 0),
+        )
+        await persistence.update_conversation("tracking", (2, 2), None)
+        await persistence.flush()
+        return store.batches
+
+    async def read() -> tuple[Any, ...]:
+        persistence = BotPersistence(SQLiteStateStore(path))
+        user_data: dict[str, Any] = {}
+        await persistence.refresh_user_data(1, user_data)
+        assert await persistence.get_user_data() == {}
+        conversations = await persistence.get_conversations("tracking")
+        await persistence.flush()
+        return user_data, conversations
+
+    batches = asyncio.run(write())
+    assert len(batches) == 2
+    assert asyncio.run(read()) == ({"tracking_number": "1" * 24}, {(1, 1): 1})
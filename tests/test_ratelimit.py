@@ -0,0 +1,89 @@
+import asyncio
+import time
+from typing import Any
+
+import pytest
+from telegram.error import RetryAfter
+
+from bot.utils.ratelimit import ChatRateLimiter
+
+
+def _process(limiter: ChatRateLimiter, callback: Any, data: dict[str, Any]) -> Any:
+    return limiter.process_request(callback, (), {}, "sendMessage", data, None)
+
+
+def test_chat_rate_limiter_limits_each_chat() -> None:
+    sent: list[tuple[int, float]] = []
+
+    async def run() -> None:
+        limiter = ChatRateLimiter(overall_max_rate=100, chat_max_rate=2, chat_time_period=0.5)
+        started_at = time.monotonic()
+
+        async def send(chat_id: int) -> bool:
+            sent.append((chat_id, time.monotonic() - started_at))
+            return True
+
+        await asyncio.gather(
+            *(_process(limiter, lambda chat_id=chat_id: send(chat_id), {"chat_id": chat_id}) for chat_id in (1, 1, 1, 2, 2))
+        )
+
+    asyncio.run(run())
+    # The third message to the first chat waits, while the other chat isn't held by it
+    delays = {chat_id: sorted(delay for sent_chat_id, delay in sent if sent_chat_id == chat_id) for chat_id in (1, 2)}
+    assert delays[1][2] >= 0.2
+    assert delays[2][1] < 0.1
+
+
+def test_chat_rate_limiter_doesnt_limit_requests_without_chat() -> None:
+    calls = 0
+
+    async def answer() -> bool:
+        nonlocal calls
+        calls += 1
+        return True
+
+    async def run() -> None:
+        limiter = ChatRateLimiter(overall_max_rate=1, overall_time_period=10)
+        await asyncio.wait_for(asyncio.gather(*(_process(limiter, answer, {"callback_query_id": "1"}) for _ in range(10))), 1)
+
+    asyncio.run(run())
+    assert calls == 10
+
+
+def test_chat_rate_limiter_retries_after_flood_wait() -> None:
+    calls: list[int] = []
+
+    async def run() -> None:
+        limiter = ChatRateLimiter(max_retries=1)
+
+        async def send(chat_id: int) -> bool:
+            calls.append(chat_id)
+            if calls.count(1) == 1 and chat_id == 1:
+                raise RetryAfter(1)
+            return True
+
+        started_at = time.monotonic()
+        assert await _process(limiter, lambda: send(1), {"chat_id": 1}) is True
+        assert time.monotonic() - started_at >= 1
+        # Other chats aren't paused by the flood wait of a chat
+        await asyncio.wait_for(_process(limiter, lambda: send(2), {"chat_id": 2}), 0.5)
+
+    asyncio.run(run())
+    assert calls == [1, 1, 2]
+
+
+def test_chat_rate_limiter_gives_up_after_max_retries() -> None:
+    calls = 0
+
+    async def send() -> bool:
+        nonlocal calls
+        calls += 1
+        raise RetryAfter(0)
+
+    async def run() -> None:
+        limiter = ChatRateLimiter(max_retries=2)
+        with pytest.raises(RetryAfter):
+            await _process(limiter, send, {"chat_id": 1})
+
+    asyncio.run(run())
+    assert calls == 3
@@ -0,0 +1,53 @@
+import asyncio
+
+from bot.utils.reporting import ErrorReporter, error_fingerprint
+
+
+def _raise(error: Exception) -> Exception:
+    try:
+        raise error
+    except Exception as e:
+        return e
+
+
+def _raise_elsewhere(error: Exception) -> Exception:
+    try:
+        raise error
+    except Exception as e:
+        return e
+
+
+def test_error_fingerprint() -> None:
+    assert error_fingerprint(_raise(TimeoutError("a"))) == error_fingerprint(_raise(TimeoutError("b")))
+    assert error_fingerprint(_raise(TimeoutError())) != error_fingerprint(_raise(ValueError()))
+    assert error_fingerprint(_raise(TimeoutError())) != error_fingerprint(_raise_elsewhere(TimeoutError()))
+
+
+def test_error_reporter_groups_repeated_errors() -> None:
+    messages: list[str] = []
+
+    async def send(text: str) -> None:
+        messages.append(text)
+
+    async def run() -> None:
+        reporter = ErrorReporter(summary_interval=0.2, max_queue_size=30, send_interval=0)
+        reporter.start(send)
+        for index in range(20):
+            reporter.report(_raise(TimeoutError(f"request {index}")), lambda: "<pre>details</pre>")
+        reporter.report(_raise(ValueError("<bad value>")))
+        await asyncio.sleep(0.05)
+        # Only the first occurrence of each error is sent, with its details
+        assert len(messages) == 2
+        assert "details" in messages[0] and "TimeoutError: request 0" in messages[0]
+        assert "ValueError: &lt;bad value&gt;" in messages[1]
+
+        await asyncio.sleep(0.25)
+        assert len(messages) == 3 and "<b>19×</b>" in messages[2] and "TimeoutError: request 0" in messages[2]
+
+        # Errors reported while the queue is full are counted in the next summary
+        for _ in range(40):
+            reporter.report(_raise(TimeoutError()))
+        await reporter.stop()
+        assert len(messages) == 4 and "<b>30×</b>" in messages[3] and "<b>10</b>" in messages[3]
+
+    asyncio.run(run())
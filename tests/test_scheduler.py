@@ -0,0 +1,202 @@
+import asyncio
+from functools import partial
+from typing import Hashable
+
+import pytest
+
+from bot.utils.exceptions import QueueFullError, UserQueueFullError
+from bot.utils.scheduler import TrackingScheduler
+
+
+async def _hold(release: asyncio.Event) -> None:
+    await release.wait()
+
+
+def test_tracking_scheduler_interleaves_users() -> None:
+    started: list[str] = []
+
+    async def run() -> None:
+        scheduler = TrackingScheduler(max_workers=1, per_user_limit=1, max_pending_per_user=3)
+        release = asyncio.Event()
+        blocker = asyncio.create_task(scheduler.run("blocker", lambda: _hold(release)))
+        await asyncio.sleep(0)
+
+        async def job(name: str) -> None:
+            started.append(name)
+
+        jobs = [
+            asyncio.create_task(scheduler.run(user_id, partial(job, f"{user_id}{index}")))
+            for user_id, index in [("a", 1), ("a", 2), ("a", 3), ("b", 1), ("b", 2)]
+        ]
+        await asyncio.sleep(0)
+        assert scheduler.running == 1
+        assert scheduler.queued == 5
+
+        release.set()
+        await asyncio.gather(blocker, *jobs)
+        assert scheduler.running == 0
+        assert scheduler.queued == 0
+
+    asyncio.run(run())
+    assert started == ["a1", "b1", "a2", "b2", "a3"]
+
+
+def test_tracking_scheduler_limits_queue() -> None:
+    async def run() -> None:
+        scheduler = TrackingScheduler(max_workers=1, max_queue_size=1, per_user_limit=1, max_pending_per_user=1)
+        release = asyncio.Event()
+        running = asyncio.create_task(scheduler.run("a", lambda: _hold(release)))
+        await asyncio.sleep(0)
+        with pytest.raises(UserQueueFullError):
+            await scheduler.run("a", lambda: _hold(release))
+
+        waiting = asyncio.create_task(scheduler.run("b", lambda: _hold(release)))
+        await asyncio.sleep(0)
+        with pytest.raises(QueueFullError) as e:
+            await scheduler.run("c", lambda: _hold(release))
+        assert not isinstance(e.value, UserQueueFullError)
+
+        release.set()
+        await asyncio.gather(running, waiting)
+
+    asyncio.run(run())
+
+
+def test_tracking_scheduler_reports_queue_positions() -> None:
+    positions: dict[Hashable, list[int]] = {"a": [], "b": [], "c": []}
+
+    async def run() -> None:
+        scheduler = TrackingScheduler(max_workers=1)
+        releases = {user_id: asyncio.Event() for user_id in ["blocker", *positions]}
+        blocker = asyncio.create_task(scheduler.run("blocker", lambda: _hold(releases["blocker"])))
+        await asyncio.sleep(0)
+
+        async def report(user_id: Hashable, position: int) -> None:
+            positions[user_id].append(position)
+
+        jobs = []
+        for user_id in positions:
+            jobs.append(
+                asyncio.create_task(
+                    scheduler.run(
+                        user_id,
+                        partial(_hold, releases[user_id]),
+                        on_position=partial(report, user_id),
+                    )
+                )
+            )
+            await asyncio.sleep(0)
+
+        for user_id in releases:
+            releases[user_id].set()
+            await asyncio.sleep(0.01)
+        await asyncio.gather(blocker, *jobs)
+
+    asyncio.run(run())
+    assert positions == {"a": [1], "b": [2, 1], "c": [3, 2, 1]}
+
+
+def test_tracking_scheduler_releases_cancelled_jobs() -> None:
+    async def run() -> None:
+        scheduler = TrackingScheduler(max_workers=1, per_user_limit=1, max_pending_per_user=1)
+        release = asyncio.Event()
+        blocker = asyncio.create_task(scheduler.run("blocker", lambda: _hold(release)))
+        waiting = asyncio.create_task(scheduler.run("a", lambda: _hold(release)))
+        await asyncio.sleep(0)
+        assert scheduler.queued == 1
+
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert scheduler.queued == 0
+
+        release.set()
+        await blocker
+        assert scheduler.running == 0
+        # The user of the cancelled job can queue another one, which gets the free worker
+        assert await asyncio.wait_for(scheduler.run("a", lambda: asyncio.sleep(0, "done")), 1) == "done"
+        assert scheduler.running == 0
+
+    asyncio.run(run())
+
+
+def test_tracking_scheduler_waits_for_a_user_slot() -> None:
+    async def run() -> None:
+        scheduler = TrackingScheduler(max_workers=2, max_pending_per_user=1)
+        release = asyncio.Event()
+        running = asyncio.create_task(scheduler.run("a", partial(_hold, release)))
+        await asyncio.sleep(0)
+
+        async def job() -> str:
+            return "done"
+
+        with pytest.raises(UserQueueFullError):
+            await scheduler.run("a", job)
+        waiting = asyncio.create_task(scheduler.run("a", job, wait=True))
+        cancelled = asyncio.create_task(scheduler.run("a", job, wait=True))
+        await asyncio.sleep(0)
+        assert not waiting.done() and scheduler.queued == 0
+
+        cancelled.cancel()
+        release.set()
+        await running
+        assert await waiting == "done"
+        assert scheduler.running == 0
+
+    asyncio.run(run())
+
+
+def test_tracking_scheduler_applies_user_limits() -> None:
+    running: dict[str, int] = {"watch": 0, "a": 0}
+    peaks: dict[str, int] = {"watch": 0, "a": 0}
+
+    async def job(user_id: str, release: asyncio.Event) -> None:
+        running[user_id] += 1
+        peaks[user_id] = max(peaks[user_id], running[user_id])
+        await release.wait()
+        running[user_id] -= 1
+
+    async def run() -> None:
+        scheduler = TrackingScheduler(max_workers=4, per_user_limit=1, max_pending_per_user=2, user_limits={"watch": 3})
+        release = asyncio.Event()
+        jobs = [asyncio.create_task(scheduler.run("watch", partial(job, "watch", release))) for _ in range(3)]
+        jobs += [asyncio.create_task(scheduler.run("a", partial(job, "a", release))) for _ in range(2)]
+        await asyncio.sleep(0)
+        assert scheduler.running == 4 and scheduler.queued == 1
+        # The user with a higher limit may have as many jobs pending
+        with pytest.raises(UserQueueFullError):
+            await scheduler.run("watch", partial(job, "watch", release))
+
+        release.set()
+        await asyncio.gather(*jobs)
+
+    asyncio.run(run())
+    assert peaks == {"watch": 3, "a": 1}
+
+
+def test_tracking_scheduler_applies_job_limits() -> None:
+    running = 0
+    peak = 0
+
+    async def job(release: asyncio.Event) -> None:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await release.wait()
+        running -= 1
+
+    async def run() -> None:
+        scheduler = TrackingScheduler(max_workers=4, per_user_limit=1, max_pending_per_user=2)
+        release = asyncio.Event()
+        jobs = [asyncio.create_task(scheduler.run("a", partial(job, release), wait=True, limit=3)) for _ in range(5)]
+        await asyncio.sleep(0)
+        assert scheduler.running == 3 and scheduler.queued == 0
+        # The other jobs of the user keep the user's limit
+        with pytest.raises(UserQueueFullError):
+            await scheduler.run("a", partial(job, release))
+
+        release.set()
+        await asyncio.gather(*jobs)
+
+    asyncio.run(run())
+    assert peak == 3
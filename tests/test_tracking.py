@@ -0,0 +1,259 @@
+import asyncio
+from functools import partial
+from typing import Optional
+
+import httpx
+import pytest
+
+from bot.loadtest.site import (
+    TRACKING_NUMBER_MULTIPLE_DATES,
+    TRACKING_NUMBER_NOT_FOUND,
+    TRACKING_NUMBER_SLOW,
+    TRACKING_NUMBER_WITH_DATE,
+    TRACKING_NUMBER_WITHOUT_DATE,
+    TrackingSiteServer,
+)
+from bot.models import Screenshot, TrackingEvent, TrackingRecord, TrackingSnapshot
+from bot.utils.browser import BrowserPool
+from bot.utils.cache import TrackingCache, TrackingResult
+from bot.utils.exceptions import TrackingError
+from bot.utils.image import ScreenshotFormat, ScreenshotOptions
+from bot.utils.proxies import ProxyPool
+from bot.utils.text import normalize_text
+from bot.utils.tracking import (
+    ParcelTracker,
+    create_http_client,
+    extract_tracking_numbers,
+    parse_tracking_rows,
+    validate_tracking_number,
+)
+
+EXPECTED_RECORDS: dict[str, list[TrackingRecord]] = {
+    TRACKING_NUMBER_WITH_DATE: [
+        TrackingRecord(
+            id=3, date="شنبه 1403/10/08", time="12:40", description="تحویل مرسوله به گیرنده", location="شیراز، مرکز شیراز"
+        ),
+        TrackingRecord(id=2, date="شنبه 1403/10/08", time="08:15", description="ورود به مرکز مبادلات", location="شیراز"),
+        TrackingRecord(
+            id=1,
+            date="شنبه 1403/10/08",
+            time="07:02",
+            description="قبول مرسوله در باجه 2 تهران",
+            location="تهران، باجه معاملاتی",
+        ),
+    ],
+    TRACKING_NUMBER_WITHOUT_DATE: [
+        TrackingRecord(id=2, time="22:10", description="ارسال از مرکز مبادلات تهران"),
+        TrackingRecord(id=1, time="18:45", description="قبول مرسوله"),
+    ],
+    TRACKING_NUMBER_MULTIPLE_DATES: [
+        TrackingRecord(
+            id=4, date="یکشنبه 1403/10/09", time="09:30", description="توزیع مرسوله توسط نامه رسان", location="اصفهان، ناحیه 3"
+        ),
+        TrackingRecord(id=3, date="یکشنبه 1403/10/09", time="07:50", description="آماده توزیع"),
+        TrackingRecord(id=2, date="شنبه 1403/10/08", time="23:05", description="ورود به مرکز مبادلات", location="اصفهان"),
+        TrackingRecord(id=1, date="شنبه 1403/10/08", time="16:20", description="قبول مرسوله"),
+    ],
+}
+
+
+def _track_as_text(tracking_site: TrackingSiteServer, tracking_number: str, timeout: Optional[float] = 5) -> list[TrackingRecord]:
+    async def track() -> list[TrackingRecord]:
+        async with create_http_client() as client:
+            tracker = ParcelTracker(normalizer=normalize_text, http_client=client, base_url=tracking_site.base_url)
+            return await tracker.track_as_text(tracking_number, timeout=timeout)
+
+    return asyncio.run(track())
+
+
+@pytest.mark.parametrize("tracking_number", ["1" * 24, " 123456789012345678901234 "])
+def test_validate_tracking_number_valid(tracking_number: str) -> None:
+    assert validate_tracking_number(tracking_number)
+
+
+@pytest.mark.parametrize("tracking_number", ["", "1" * 23, "1" * 25, "12345678901234567890123a"])
+def test_validate_tracking_number_invalid(tracking_number: str) -> None:
+    assert not validate_tracking_number(tracking_number)
+
+
+def test_extract_tracking_numbers() -> None:
+    text = "\n".join(
+        [
+            f"{TRACKING_NUMBER_WITH_DATE}, {TRACKING_NUMBER_WITHOUT_DATE}",
+            f"order 12: {TRACKING_NUMBER_WITH_DATE}",
+            "1" * 25,
+            "۳" * 24,
+        ]
+    )
+    assert extract_tracking_numbers(text) == [TRACKING_NUMBER_WITH_DATE, TRACKING_NUMBER_WITHOUT_DATE, "3" * 24]
+
+
+def test_parse_tracking_rows() -> None:
+    rows: list[list[Optional[str]]] = [
+        ["شنبه 1403/10/08", "شرح", "موقعیت", "ساعت"],
+        ["2", "ورود به مرکز مبادلات12پردازش شد (مشاهده جزئیات)", "تهران،مرکز مبادلات", " 08:15 "],
+        [],
+        ["", None, "  "],
+        ["1", "قبول مرسوله", None, "07:02"],
+    ]
+    assert parse_tracking_rows(rows, normalize_text) == [
+        TrackingEvent(
+            id=2,
+            time="08:15",
+            description="ورود به مرکز مبادلات 12 پردازش شد",
+            date="شنبه 1403/10/08",
+            location="تهران، مرکز مبادلات",
+        ),
+        TrackingEvent(id=1, time="07:02", description="قبول مرسوله", date="شنبه 1403/10/08"),
+    ]
+
+
+@pytest.mark.parametrize("tracking_number", list(EXPECTED_RECORDS))
+def test_track_as_text_http(tracking_site: TrackingSiteServer, tracking_number: str) -> None:
+    assert _track_as_text(tracking_site, tracking_number) == EXPECTED_RECORDS[tracking_number]
+
+
+def test_track_as_text_http_not_found(tracking_site: TrackingSiteServer) -> None:
+    with pytest.raises(TrackingError, match="مرسوله ای با این شماره یافت نشد."):
+        _track_as_text(tracking_site, TRACKING_NUMBER_NOT_FOUND)
+
+
+def test_fetch_tracking_rows_slow_response_times_out(tracking_site: TrackingSiteServer) -> None:
+    async def fetch() -> None:
+        async with create_http_client() as client:
+            tracker = ParcelTracker(http_client=client, base_url=tracking_site.base_url)
+            await tracker._fetch_tracking_rows(TRACKING_NUMBER_SLOW, timeout=0.2)
+
+    with pytest.raises(httpx.TimeoutException):
+        asyncio.run(fetch())
+
+
+def test_track_as_text_http_through_proxy_pool(tracking_site: TrackingSiteServer) -> None:
+    working, failing = "http://10.0.0.1:8080", "http://10.0.0.2:8080"
+    pool = ProxyPool([working, failing], max_failures=1)
+    pool.record(working, 1.0, failed=True)
+
+    async def track() -> list[TrackingRecord]:
+        # Stand-ins for the clients of two proxies, one of which can't reach the tracking website
+        async with (
+            create_http_client() as client,
+            httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(502))) as failing_client,
+        ):
+            tracker = ParcelTracker(
+                normalizer=normalize_text,
+                proxy_pool=pool,
+                http_client={working: client, failing: failing_client},
+                base_url=tracking_site.base_url,
+            )
+            with pytest.raises(httpx.HTTPStatusError):
+                await tracker._fetch_tracking_rows(TRACKING_NUMBER_WITH_DATE, timeout=5)
+            # Both proxies are ejected now, so the one ejected first is tried again
+            return await tracker.track_as_text(TRACKING_NUMBER_WITH_DATE, timeout=5)
+
+    assert asyncio.run(track()) == EXPECTED_RECORDS[TRACKING_NUMBER_WITH_DATE]
+    assert pool.available(working) and not pool.available(failing)
+
+
+@pytest.mark.parametrize("tracking_number", list(EXPECTED_RECORDS))
+def test_track_as_text_browser(tracking_site: TrackingSiteServer, chromium: None, tracking_number: str) -> None:
+    async def track() -> list[TrackingRecord]:
+        pool = BrowserPool(size=1)
+        await pool.start()
+        try:
+            tracker = ParcelTracker(normalizer=normalize_text, browser_pool=pool, base_url=tracking_site.base_url)
+            return await tracker.track_as_text(tracking_number, timeout=5)
+        finally:
+            await pool.stop()
+
+    assert asyncio.run(track()) == EXPECTED_RECORDS[tracking_number]
+
+
+def test_track_as_text_falls_back_to_browser(tracking_site: TrackingSiteServer, chromium: None) -> None:
+    async def track() -> list[TrackingRecord]:
+        async with httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(503))) as client:
+            tracker = ParcelTracker(normalizer=normalize_text, http_client=client, base_url=tracking_site.base_url)
+            return await tracker.track_as_text(TRACKING_NUMBER_WITH_DATE, timeout=5)
+
+    assert asyncio.run(track()) == EXPECTED_RECORDS[TRACKING_NUMBER_WITH_DATE]
+
+
+@pytest.mark.parametrize(("image_format", "signature"), [("jpeg", b"\xff\xd8\xff"), ("webp", b"RIFF"), ("png", b"\x89PNG")])
+def test_track_as_image(
+    tracking_site: TrackingSiteServer, chromium: None, image_format: ScreenshotFormat, signature: bytes
+) -> None:
+    async def track() -> bytes:
+        tracker = ParcelTracker(base_url=tracking_site.base_url, screenshot_options=ScreenshotOptions(format=image_format))
+        return await tracker.track_as_image(TRACKING_NUMBER_WITH_DATE, timeout=5)
+
+    assert asyncio.run(track()).startswith(signature)
+
+
+def test_track_as_image_not_found(tracking_site: TrackingSiteServer, chromium: None) -> None:
+    async def track() -> bytes:
+        tracker = ParcelTracker(base_url=tracking_site.base_url)
+        return await tracker.track_as_image(TRACKING_NUMBER_NOT_FOUND, timeout=5)
+
+    with pytest.raises(TrackingError):
+        asyncio.run(track())
+
+
+def test_track_as_text_and_image(tracking_site: TrackingSiteServer, chromium: None) -> None:
+    async def track() -> TrackingSnapshot:
+        pool = BrowserPool(size=1)
+        await pool.start()
+        try:
+            tracker = ParcelTracker(normalizer=normalize_text, browser_pool=pool, base_url=tracking_site.base_url)
+            return await tracker.track_as_text_and_image(TRACKING_NUMBER_MULTIPLE_DATES, timeout=5)
+        finally:
+            await pool.stop()
+
+    records, screenshot = asyncio.run(track())
+    assert records == EXPECTED_RECORDS[TRACKING_NUMBER_MULTIPLE_DATES]
+    assert screenshot.startswith(b"\xff\xd8\xff")
+    # Keyed by the tracking state, for the file IDs of the uploaded screenshots
+    assert isinstance(screenshot, Screenshot)
+
+
+def test_track_as_text_caches_the_screenshot(tracking_site: TrackingSiteServer, chromium: None) -> None:
+    lookups: list[str] = []
+
+    async def track() -> TrackingResult:
+        cache = TrackingCache()
+        tracker = ParcelTracker(
+            normalizer=normalize_text,
+            base_url=tracking_site.base_url,
+            on_screenshot=lambda tracking_number, screenshot: cache.set(tracking_number, "image", screenshot),
+        )
+
+        async def track_as(output_type: str) -> TrackingResult:
+            lookups.append(output_type)
+            if output_type == "image":
+                return await tracker.track_as_image(TRACKING_NUMBER_WITH_DATE, timeout=5)
+            return await tracker.track_as_text(TRACKING_NUMBER_WITH_DATE, timeout=5)
+
+        assert (
+            await cache.get_or_track(TRACKING_NUMBER_WITH_DATE, "text", partial(track_as, "text"))
+            == (EXPECTED_RECORDS[TRACKING_NUMBER_WITH_DATE])
+        )
+        # The screenshot taken along the text lookup is encoded in the background
+        for _ in range(100):
+            if cache.get(TRACKING_NUMBER_WITH_DATE, "image") is not None:
+                break
+            await asyncio.sleep(0.05)
+        return await cache.get_or_track(TRACKING_NUMBER_WITH_DATE, "image", partial(track_as, "image"))
+
+    screenshot = asyncio.run(track())
+    assert isinstance(screenshot, bytes) and screenshot.startswith(b"\xff\xd8\xff")
+    assert lookups == ["text"]
+
+
+def test_screenshot_state_key_depends_on_the_rendering_options() -> None:
+    rows: list[list[Optional[str]]] = [["1", "شنبه 1403/10/08", "07:02", "قبول مرسوله", "تهران"]]
+    tracker = ParcelTracker()
+    key = tracker._state_key(TRACKING_NUMBER_WITH_DATE, rows)
+
+    assert ParcelTracker()._state_key(TRACKING_NUMBER_WITH_DATE, rows) == key
+    assert tracker._state_key(TRACKING_NUMBER_WITHOUT_DATE, rows) != key
+    assert tracker._state_key(TRACKING_NUMBER_WITH_DATE, rows + [["2", None, "08:15", "ورود", None]]) != key
+    assert ParcelTracker(screenshot_options=ScreenshotOptions(format="webp"))._state_key(TRACKING_NUMBER_WITH_DATE, rows) != key
+    assert ParcelTracker(screenshot_options=ScreenshotOptions(width=800))._state_key(TRACKING_NUMBER_WITH_DATE, rows) != key
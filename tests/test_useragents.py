@@ -0,0 +1,26 @@
+from collections import Counter
+
+from bot.utils.useragents import FALLBACK_USER_AGENT, UserAgentPool
+
+
+def test_user_agent_pool_loads_once() -> None:
+    pool = UserAgentPool(platforms=["desktop"])
+    assert not pool.loaded
+    user_agent = pool.random()
+    assert pool.loaded and len(pool) > 1
+    assert user_agent.startswith("Mozilla/5.0")
+    assert "iPhone" not in user_agent
+
+
+def test_user_agent_pool_weights_by_usage_share() -> None:
+    pool = UserAgentPool()
+    pool._user_agents = ["common", "rare"]
+    pool._cum_weights = [0.9, 1.0]
+    counts = Counter(pool.random() for _ in range(2000))
+    assert counts["common"] > counts["rare"] * 4
+
+
+def test_user_agent_pool_falls_back_when_nothing_matches() -> None:
+    pool = UserAgentPool(browsers=["Netscape Navigator"])
+    assert pool.random() == FALLBACK_USER_AGENT
+    assert len(pool) == 1
@@ -0,0 +1,127 @@
+import asyncio
+from types import SimpleNamespace
+from typing import Any, Iterator
+
+import pytest
+from telegram.error import Forbidden
+
+from bot.config import settings
+from bot.handlers import watch
+from bot.models import TrackingRecord
+from bot.utils.cache import TrackingCache
+from bot.utils.exceptions import TrackingError
+from bot.utils.history import HistoryStore, HistoryTracker
+from bot.utils.scheduler import TrackingScheduler
+from bot.utils.watch import WATCH_USER_ID, WatchedParcel, WatchStore
+
+from .conftest import StubTracker
+
+TRACKING_NUMBER = "1" * 24
+ACCEPTED = TrackingRecord(id=1, time="07:02", description="قبول مرسوله")
+IN_TRANSIT = TrackingRecord(id=2, time="08:15", description="ورود به مرکز مبادلات")
+DELIVERED = TrackingRecord(id=3, time="12:40", description="تحویل مرسوله به گیرنده")
+
+
+class StubBot:
+    def __init__(self) -> None:
+        self.messages: list[tuple[int, str]] = []
+        self.blocked: set[int] = set()
+
+    async def send_message(self, chat_id: int, text: str, **kwargs: Any) -> None:
+        if chat_id in self.blocked:
+            raise Forbidden("Forbidden: bot was blocked by the user")
+        self.messages.append((chat_id, text))
+
+
+@pytest.fixture
+def stores(tmp_path: Any, monkeypatch: pytest.MonkeyPatch) -> Iterator[tuple[WatchStore, StubTracker]]:
+    watch_store = WatchStore(str(tmp_path / "watch.db"))
+    history_store = HistoryStore(str(tmp_path / "watch.db"))
+    tracker = StubTracker([ACCEPTED])
+    monkeypatch.setattr(watch, "watch_store", watch_store)
+    monkeypatch.setattr(watch, "history_store", history_store)
+    monkeypatch.setattr(watch, "tracking_scheduler", TrackingScheduler(user_limits={WATCH_USER_ID: settings.watch_concurrency}))
+    monkeypatch.setattr(watch, "create_tracker", lambda: HistoryTracker(tracker, history_store))
+    yield watch_store, tracker
+    watch_store.close()
+    history_store.close()
+
+
+def _poll(watch_store: WatchStore, bot: StubBot, monkeypatch: pytest.MonkeyPatch) -> WatchedParcel:
+    # Every poll scrapes the parcel again, and the parcel is due right away
+    monkeypatch.setattr(watch, "tracking_cache", TrackingCache())
+    watch_store.update([(parcel, 0) for parcel in watch_store.due(float("inf"), 10)])
+    asyncio.run(watch.poll_watched_parcels(SimpleNamespace(bot=bot)))  # type: ignore[arg-type]
+    (parcel,) = watch_store.due(float("inf"), 10)
+    return parcel
+
+
+def test_poll_watched_parcels_notifies_new_events(
+    stores: tuple[WatchStore, StubTracker], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    watch_store, tracker = stores
+    bot = StubBot()
+    watch_store.add(1, TRACKING_NUMBER, settings.watch_min_interval)
+    watch_store.add(2, TRACKING_NUMBER, settings.watch_min_interval)
+
+    # The first check only records the current status of the parcel
+    parcel = _poll(watch_store, bot, monkeypatch)
+    assert bot.messages == []
+    assert parcel.checked_at is not None
+    assert parcel.interval == settings.watch_min_interval
+
+    tracker.result = [IN_TRANSIT, ACCEPTED]
+    parcel = _poll(watch_store, bot, monkeypatch)
+    assert sorted(chat_id for chat_id, _ in bot.messages) == [1, 2]
+    assert all(IN_TRANSIT.description in text and ACCEPTED.description not in text for _, text in bot.messages)
+    assert parcel.interval == settings.watch_min_interval
+
+
+def test_poll_watched_parcels_backs_off(stores: tuple[WatchStore, StubTracker], monkeypatch: pytest.MonkeyPatch) -> None:
+    watch_store, tracker = stores
+    bot = StubBot()
+    watch_store.add(1, TRACKING_NUMBER, settings.watch_min_interval)
+    _poll(watch_store, bot, monkeypatch)
+
+    # Unchanged statuses and failed checks both grow the interval, up to the maximum interval
+    parcel = _poll(watch_store, bot, monkeypatch)
+    assert parcel.interval == settings.watch_min_interval * settings.watch_backoff_factor
+    tracker.result = TrackingError("خطا")
+    parcel = _poll(watch_store, bot, monkeypatch)
+    assert parcel.interval == settings.watch_min_interval * settings.watch_backoff_factor**2
+    for _ in range(20):
+        parcel = _poll(watch_store, bot, monkeypatch)
+    assert parcel.interval == settings.watch_max_interval
+    assert bot.messages == []
+
+
+def test_poll_watched_parcels_slows_down_delivered_parcels(
+    stores: tuple[WatchStore, StubTracker], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    watch_store, tracker = stores
+    bot = StubBot()
+    watch_store.add(1, TRACKING_NUMBER, settings.watch_min_interval)
+    _poll(watch_store, bot, monkeypatch)
+
+    tracker.result = [DELIVERED, IN_TRANSIT, ACCEPTED]
+    parcel = _poll(watch_store, bot, monkeypatch)
+    assert parcel.delivered
+    assert parcel.interval == settings.watch_delivered_interval
+    assert [chat_id for chat_id, _ in bot.messages] == [1]
+
+
+def test_poll_watched_parcels_unsubscribes_blocked_chats(
+    stores: tuple[WatchStore, StubTracker], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    watch_store, tracker = stores
+    bot = StubBot()
+    bot.blocked.add(2)
+    watch_store.add(1, TRACKING_NUMBER, settings.watch_min_interval)
+    watch_store.add(2, TRACKING_NUMBER, settings.watch_min_interval)
+    _poll(watch_store, bot, monkeypatch)
+
+    tracker.result = [IN_TRANSIT, ACCEPTED]
+    _poll(watch_store, bot, monkeypatch)
+    assert [chat_id for chat_id, _ in bot.messages] == [1]
+    assert watch_store.watched_by(1) == [TRACKING_NUMBER]
+    assert watch_store.watched_by(2) == []
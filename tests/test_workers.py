@@ -0,0 +1,70 @@
+import asyncio
+import os
+import signal
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator
+
+import pytest
+
+from bot.loadtest.site import (
+    TRACKING_NUMBER_NOT_FOUND,
+    TRACKING_NUMBER_SLOW,
+    TRACKING_NUMBER_WITH_DATE,
+    TrackingSiteServer,
+)
+from bot.utils.exceptions import TrackingError, WorkerCrashedError
+from bot.utils.text import normalize_text
+from bot.utils.tracking import ParcelTracker, Tracker, create_http_client
+from bot.utils.workers import TrackingWorkerPool
+from tests.test_tracking import EXPECTED_RECORDS
+
+BASE_URL_VARIABLE = "TEST_TRACKING_BASE_URL"
+
+
+@asynccontextmanager
+async def serve_http_tracker() -> AsyncGenerator[Tracker, None]:
+    async with create_http_client() as client:
+        yield ParcelTracker(normalizer=normalize_text, http_client=client, base_url=os.environ[BASE_URL_VARIABLE])
+
+
+@pytest.fixture
+def worker_pool(tracking_site: TrackingSiteServer, monkeypatch: pytest.MonkeyPatch) -> TrackingWorkerPool:
+    # Spawned workers inherit the environment of the test process
+    monkeypatch.setenv(BASE_URL_VARIABLE, tracking_site.base_url)
+    return TrackingWorkerPool(serve_http_tracker, processes=2)
+
+
+def test_worker_pool_tracks_in_workers(worker_pool: TrackingWorkerPool) -> None:
+    async def track() -> None:
+        await worker_pool.start()
+        try:
+            records = await asyncio.gather(*(worker_pool.track_as_text(TRACKING_NUMBER_WITH_DATE, 5) for _ in range(4)))
+            assert records == [EXPECTED_RECORDS[TRACKING_NUMBER_WITH_DATE]] * 4
+            with pytest.raises(TrackingError):
+                await worker_pool.track_as_text(TRACKING_NUMBER_NOT_FOUND, 5)
+        finally:
+            await worker_pool.stop()
+
+    asyncio.run(track())
+
+
+def test_worker_pool_replaces_crashed_worker(worker_pool: TrackingWorkerPool) -> None:
+    async def track() -> None:
+        await worker_pool.start()
+        try:
+            job = asyncio.create_task(worker_pool.track_as_text(TRACKING_NUMBER_SLOW, 5))
+            await asyncio.sleep(0.5)
+            (worker,) = [worker for worker in worker_pool._workers if worker.inflight]
+            assert worker.process.pid is not None
+            os.kill(worker.process.pid, signal.SIGKILL)
+            with pytest.raises(WorkerCrashedError):
+                await job
+
+            await asyncio.sleep(2)
+            assert len(worker_pool._workers) == 2
+            records = await asyncio.gather(*(worker_pool.track_as_text(TRACKING_NUMBER_WITH_DATE, 5) for _ in range(4)))
+            assert records == [EXPECTED_RECORDS[TRACKING_NUMBER_WITH_DATE]] * 4
+        finally:
+            await worker_pool.stop()
+
+    asyncio.run(track())